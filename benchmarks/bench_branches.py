@@ -0,0 +1,109 @@
+# benchmarks/bench_branches.py
+"""
+Critical path of the branched graph versus the old linear chain
+(guardrail -> extract -> geocode -> route -> attractions -> rank -> build),
+with every backend stubbed out (see stubs.py). Also checks that both
+produce the same attractions, ranking and itinerary. The first line is
+the configured GUARDRAIL_MODE (combined unless set); the other mode
+follows for comparison.
+
+    python -m benchmarks.bench_branches --runs 5
+"""
+import io
+import time
+import asyncio
+import argparse
+import contextlib
+
+from benchmarks.stubs import install_stubs
+from langgraph.graph import StateGraph, END
+from nodes import guardrail, workflow
+from nodes.graph_state import GraphState
+from nodes.workflow import build_graph, _node, decide_next_step
+from nodes.guardrail import input_guardrail_node, ainput_guardrail_node
+from nodes.extractor import extract_locations_node, aextract_locations_node
+from nodes.geocoder import geocode_locations_node, ageocode_locations_node
+from nodes.router import get_route_node, aget_route_node
+from nodes.attractions import get_attractions_node, aget_attractions_node
+from nodes.ranker import rank_attractions_node, arank_attractions_node
+from nodes.itinerary_builder import build_itinerary_node, abuild_itinerary_node
+
+COMPARED_KEYS = ["attractions", "ranked_attractions", "final_itinerary"]
+
+
+def build_linear_graph():
+    """The graph as it was before the branches (minus the plan cache)."""
+    graph = StateGraph(GraphState)
+    steps = [
+        ("guardrail", input_guardrail_node, ainput_guardrail_node),
+        ("extract_locations", extract_locations_node, aextract_locations_node),
+        ("geocode_locations", geocode_locations_node, ageocode_locations_node),
+        ("get_route", get_route_node, aget_route_node),
+        ("get_attractions", get_attractions_node, aget_attractions_node),
+        ("rank_attractions", rank_attractions_node, arank_attractions_node),
+        ("build_itinerary", build_itinerary_node, abuild_itinerary_node),
+    ]
+    for name, func, afunc in steps:
+        graph.add_node(name, _node(func, afunc))
+    graph.set_entry_point("guardrail")
+    graph.add_conditional_edges("guardrail", decide_next_step, {
+        "extract_locations": "extract_locations",
+        "check_plan_cache": "geocode_locations",
+        END: END
+    })
+    for (a, _, _), (b, _, _) in zip(steps[1:], steps[2:]):
+        graph.add_edge(a, b)
+    graph.add_edge("build_itinerary", END)
+    return graph.compile()
+
+
+async def time_graph(graph, queries):
+    timings, outputs = [], []  # one trip at a time: latency, not throughput
+    for query in queries:
+        start = time.perf_counter()
+        outputs.append(await graph.ainvoke({"original_query": query}))
+        timings.append(time.perf_counter() - start)
+    return sum(timings) / len(timings), outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--route-latency", type=float, default=0.4)
+    parser.add_argument("--places-latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    install_stubs(llm_latency=args.llm_latency, geocode_latency=0.1,
+                  route_latency=args.route_latency, places_latency=args.places_latency)
+
+    default_mode = guardrail.GUARDRAIL_MODE
+    other_mode = "separate" if default_mode == "combined" else "combined"
+    for mode in (default_mode, other_mode):
+        guardrail.GUARDRAIL_MODE = workflow.GUARDRAIL_MODE = mode
+        results = {}
+        for label, graph in (("linear", build_linear_graph()), ("branched", build_graph())):
+            # Fresh names per run so the route/geocode caches stay cold.
+            queries = [f"from {mode}{label}a{i} to {mode}{label}b{i}, 2 days"
+                       for i in range(args.runs)]
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[label] = asyncio.run(time_graph(graph, queries))
+
+        linear_s, branched_s = results["linear"][0], results["branched"][0]
+
+        # Same queries through both graphs. The first pass only warms the
+        # route cache, whose polyline rounding would otherwise differ.
+        check = [f"from {mode}town{i} to {mode}city{i}, 2 days" for i in range(args.runs)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(time_graph(build_linear_graph(), check))
+            linear_out = asyncio.run(time_graph(build_linear_graph(), check))[1]
+            branched_out = asyncio.run(time_graph(build_graph(), check))[1]
+        same = all(a.get(k) == b.get(k) for a, b in zip(linear_out, branched_out)
+                   for k in COMPARED_KEYS)
+        tag = "(default)" if mode == default_mode else ""
+        print(f"GUARDRAIL_MODE={mode:8s} {tag:9s} linear {linear_s:5.2f}s  branched {branched_s:5.2f}s  "
+              f"saved {linear_s - branched_s:5.2f}s/trip  same output: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_fanout.py
+"""
+The Geoapify fan-out of one attractions node: fetch_all_points (thread
+pool) and afetch_all_points (event loop) over a route's search points,
+one point at a time ("sequential", GEOAPIFY_MAX_CONCURRENCY=1, which is
+how the node used to fetch them) versus the configured concurrency.
+Runs against the local Geoapify stand-in (stubs.py), which sleeps
+--latency seconds per request, with the tile cache off so every point is
+a request. Also checks that every mode returns the same places in the
+same order.
+
+    python -m benchmarks.bench_fanout --points 10 --latency 0.3
+"""
+import io
+import time
+import asyncio
+import argparse
+import contextlib
+
+from benchmarks.stubs import start_geoapify_server
+from nodes import attractions
+
+
+def search_points(count):
+    """Stopovers along Colombo -> Kandy, then the destination."""
+    points = [{"lat": 6.93 + (7.29 - 6.93) * i / count,
+               "lon": 79.85 + (80.63 - 79.85) * i / count,
+               "tag": f"Stopover {i}"} for i in range(1, count)]
+    return points + [{"lat": 7.29, "lon": 80.63, "tag": "Destination (100% mark)"}]
+
+
+def timed(fn, points, concurrency, runs):
+    attractions.GEOAPIFY_MAX_CONCURRENCY = concurrency
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = fn(points)
+        timings.append(time.perf_counter() - started)
+    return min(timings), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=10,
+                        help="search points (the last one is the destination)")
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per Geoapify request")
+    parser.add_argument("--concurrency", type=int, default=attractions.GEOAPIFY_MAX_CONCURRENCY)
+    parser.add_argument("--runs", type=int, default=3, help="best of")
+    args = parser.parse_args()
+
+    server, attractions.GEOAPIFY_URL = start_geoapify_server(args.latency)
+    attractions.TILE_CACHE_ENABLED = False
+    points = search_points(args.points)
+
+    def afetch_all(points):
+        return asyncio.run(attractions.afetch_all_points(points))
+
+    outputs = []
+    for label, fn in (("threads", attractions.fetch_all_points), ("async", afetch_all)):
+        sequential_s, sequential = timed(fn, points, 1, args.runs)
+        concurrent_s, concurrent = timed(fn, points, args.concurrency, args.runs)
+        outputs += [sequential, concurrent]
+        print(f"{label:7s} {len(points)} points @ {args.latency:.2f}s  "
+              f"sequential {sequential_s:5.2f}s  x{args.concurrency} {concurrent_s:5.2f}s  "
+              f"speedup {sequential_s / concurrent_s:4.1f}x")
+    server.shutdown()
+    # Late or failed points come back as {}: equal, but not a pass.
+    complete = all(result.get("features") for result in outputs[0])
+    print(f"same results: {complete and all(output == outputs[0] for output in outputs)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+# benchmarks/bench_graph.py
+"""
+End-to-end benchmark of the whole graph against recorded provider
+responses (see replay.py). Plans the trips in fixtures/replay/queries.jsonl
+with N concurrent clients, either straight through app_graph.ainvoke()
+("graph") or as POST /plan-trip requests through the FastAPI app
+("api", in-process ASGI, no sockets).
+
+Each (mode, clients) cell runs in a fresh process, so caches start cold and
+memory peaks don't mix; --requests beyond the corpus size replays it again
+with warm geocode/route/tile caches (plan and LLM caches stay off). Per cell
+it reports latency percentiles, throughput, peak RSS and external calls per
+request (counted by the replay server), as well as the new connections
+per request (each one paying the replay server's --connect-latency). Results are written as JSON;
+--compare prints the change against an earlier run.
+
+    python -m benchmarks.bench_graph --clients 1,8,32 --out before.json
+    python -m benchmarks.bench_graph --clients 1,8,32 --out after.json --compare before.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import platform
+import resource
+import argparse
+import contextlib
+import subprocess
+import urllib.request
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.replay import load_queries, parse_latency, QUERIES_PATH, \
+    DEFAULT_CONNECT_LATENCY
+
+MODES = ("graph", "api")
+
+
+def _rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def _replay_stats(replay_url, reset=False):
+    request = urllib.request.Request(f"{replay_url}/_replay/{'reset' if reset else 'stats'}",
+                                     method="POST" if reset else "GET")
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+
+def _summarize(latencies):
+    if not latencies:
+        return None
+    values = np.asarray(latencies)
+    return {
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3),
+        "mean": round(float(values.mean()), 3),
+        "max": round(float(values.max()), 3)
+    }
+
+
+# --- Worker (one cell, in its own process) ---
+
+def worker(mode, clients, requests, warmup, replay_url, queries_path):
+    queries = [item["query"] for item in load_queries(queries_path)]
+    devnull = open(os.devnull, "w")
+    with contextlib.redirect_stdout(devnull):
+        import httpx
+        from main import app, app_graph
+        from nodes.route_store import release_route
+
+    async def plan_graph(query):
+        state = await app_graph.ainvoke({"original_query": query})
+        release_route(state.get("route_handle"))
+        return bool(state.get("final_itinerary"))
+
+    async def run(schedule, concurrency):
+        timings = []
+        pending = iter(schedule)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                     base_url="http://bench", timeout=None) as client:
+            async def plan_api(query):
+                response = await client.post("/plan-trip", json={"query": query})
+                response.raise_for_status()
+                return bool(response.json().get("final_itinerary"))
+
+            plan = plan_graph if mode == "graph" else plan_api
+
+            async def client_loop():
+                for query in pending:  # shared iterator: each request goes to one client
+                    started = time.perf_counter()
+                    try:
+                        itinerary, error = await plan(query), None
+                    except Exception as e:
+                        itinerary, error = False, f"{type(e).__name__}: {e}"
+                    timings.append((time.perf_counter() - started, itinerary, error))
+
+            started = time.perf_counter()
+            await asyncio.gather(*[client_loop() for _ in range(concurrency)])
+            return time.perf_counter() - started, timings
+
+    with contextlib.redirect_stdout(devnull):
+        # Imports, first connections, lazy clients: not what we're measuring.
+        asyncio.run(run([queries[i % len(queries)] for i in range(warmup)], 1))
+        baseline_kb = _rss_kb()
+        _replay_stats(replay_url, reset=True)
+        schedule = [queries[i % len(queries)] for i in range(requests)]
+        wall, timings = asyncio.run(run(schedule, clients))
+    replay = _replay_stats(replay_url)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    ok = [t for t, _, error in timings if error is None]
+    errors = [error for _, _, error in timings if error is not None]
+    return {
+        "mode": mode,
+        "clients": clients,
+        "requests": len(timings),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:3],
+        "itineraries": sum(1 for _, itinerary, _ in timings if itinerary),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(timings) / wall, 3) if wall > 0 else None,
+        "latency_s": _summarize(ok),
+        "memory_mb": {
+            "baseline": round(baseline_kb / 1024, 1),
+            "peak": round(peak_kb / 1024, 1),
+            "growth": round((peak_kb - baseline_kb) / 1024, 1)
+        },
+        "external_calls": replay["calls"],
+        "external_calls_per_request": {
+            provider: round(count / len(timings), 2) for provider, count in replay["calls"].items()},
+        "connections_per_request": {
+            provider: round(count / len(timings), 2)
+            for provider, count in replay["connections"].items()},
+        "fixture_misses": replay["misses"]
+    }
+
+
+# --- Driver ---
+
+@contextlib.contextmanager
+def replay_server(latency, connect_latency, jitter, seed):
+    """Starts `python -m benchmarks.replay --serve` and yields its first line."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.replay", "--serve", "--latency",
+         ",".join(f"{k}={v}" for k, v in latency.items()),
+         "--connect-latency", str(connect_latency), "--jitter", str(jitter), "--seed", str(seed)],
+        stdout=subprocess.PIPE, text=True)
+    try:
+        yield json.loads(process.stdout.readline())
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def _worker_env(endpoints, real_limits):
+    env = dict(os.environ, **endpoints)
+    for name in ("GOOGLE_API_KEY", "ORS_API_KEY", "GEOAPIFY_API_KEY"):
+        env.setdefault(name, "replay")
+    # Every cell starts cold and nothing is answered without the providers.
+    env.update({"CACHE_DB_PATH": "", "PLAN_CACHE": "0", "LLM_CACHE": "0"})
+    if not real_limits:
+        # The stand-ins have no quotas; keep the provider limiters out of the way.
+        for provider in ("GEMINI", "NOMINATIM", "ORS", "GEOAPIFY"):
+            env[f"RATE_LIMIT_{provider}"] = "1000,1000"
+    return env
+
+
+def run_cell(mode, clients, args, replay):
+    command = [sys.executable, "-m", "benchmarks.bench_graph", "--worker", mode,
+               "--clients", str(clients), "--requests", str(args.requests),
+               "--warmup", str(args.warmup), "--replay-url", replay["url"],
+               "--queries", args.queries]
+    result = subprocess.run(command, env=_worker_env(replay["env"], args.real_limits),
+                            stdout=subprocess.PIPE, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, baseline=None):
+    previous = {(c["mode"], c["clients"]): c for c in (baseline or {}).get("cells", [])}
+
+    def delta(new, old):
+        if old in (None, 0) or new is None:
+            return ""
+        return f" ({(new - old) / old * 100:+.0f}%)"
+
+    for cell in report["cells"]:
+        old = previous.get((cell["mode"], cell["clients"]), {})
+        latency, old_latency = cell["latency_s"] or {}, old.get("latency_s") or {}
+        print(f"{cell['mode']:5s} x{cell['clients']:<3d}"
+              + "".join(f" {q}={latency.get(q, 0):.2f}s{delta(latency.get(q), old_latency.get(q))}"
+                        for q in ("p50", "p95", "p99"))
+              + f"  {cell['throughput_rps']:.2f} req/s"
+              + delta(cell["throughput_rps"], old.get("throughput_rps"))
+              + f"  peak {cell['memory_mb']['peak']:.0f} MB"
+              + delta(cell["memory_mb"]["peak"], (old.get("memory_mb") or {}).get("peak"))
+              + f"  errors {cell['errors']}")
+        calls, connections = cell["external_calls_per_request"], cell["connections_per_request"]
+        print("          calls/request: " + ", ".join(f"{k} {v:.2f}" for k, v in calls.items()))
+        print("          new connections/request: "
+              + ", ".join(f"{k} {v:.2f}" for k, v in connections.items())
+              + (f"  (fixture misses: {cell['fixture_misses']})"
+                 if any(cell["fixture_misses"].values()) else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--clients", default="1,8,32", help="concurrent clients, one cell each")
+    parser.add_argument("--requests", type=int, default=48, help="trips planned per cell")
+    parser.add_argument("--warmup", type=int, default=2, help="trips planned first, not measured")
+    parser.add_argument("--latency", default=None, help="per-provider latency (see replay.py)")
+    parser.add_argument("--connect-latency", type=float, default=DEFAULT_CONNECT_LATENCY,
+                        help="handshake cost per new connection (see replay.py)")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--real-limits", action="store_true",
+                        help="keep the production provider rate limits")
+    parser.add_argument("--queries", default=QUERIES_PATH)
+    parser.add_argument("--out", default="bench_graph.json")
+    parser.add_argument("--compare", metavar="JSON", help="an earlier --out to compare with")
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--replay-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        cell = worker(args.worker, int(args.clients), args.requests, args.warmup,
+                      args.replay_url, args.queries)
+        print(json.dumps(cell))
+        return
+
+    latency = parse_latency(args.latency)
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "latency_s": latency,
+            "connect_latency_s": args.connect_latency,
+            "jitter": args.jitter,
+            "seed": args.seed,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "real_limits": args.real_limits,
+            "queries": os.path.relpath(args.queries)
+        },
+        "cells": []
+    }
+    with replay_server(latency, args.connect_latency, args.jitter, args.seed) as replay:
+        report["meta"]["recording"] = replay["recording"]
+        for mode in args.modes.split(","):
+            for clients in (int(c) for c in args.clients.split(",")):
+                report["cells"].append(run_cell(mode, clients, args, replay))
+                print_report({"cells": report["cells"][-1:]})
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\n--- vs {args.compare} ({baseline['meta'].get('commit')}) ---")
+        print_report(report, baseline)
+    print(f"\nWrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_poi_index.py
+"""
+Offline POI index benchmark: builds an index of synthetic POIs spread over
+Sri Lanka, then times radius and corridor queries for a long route.
+
+    python -m benchmarks.bench_poi_index --pois 100000 --route-points 10000
+"""
+import time
+import argparse
+import tempfile
+import numpy as np
+from nodes.poi_index import POIIndex, build_index
+
+# Rough bounding box of the island.
+LAT_RANGE = (5.9, 9.85)
+LON_RANGE = (79.65, 81.9)
+
+
+def synthetic_pois(count, seed=42):
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(*LAT_RANGE, count)
+    lons = rng.uniform(*LON_RANGE, count)
+    kinds = ["tourism.sights", "tourism.attraction", "tourism.sights.place_of_worship"]
+    for i in range(count):
+        yield f"POI {i}", float(lats[i]), float(lons[i]), [kinds[i % len(kinds)]]
+
+
+def synthetic_route(points, seed=7):
+    """A wiggly Galle -> Jaffna style line with `points` vertices."""
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0.0, 1.0, points)
+    lat = 6.03 + t * (9.66 - 6.03) + 0.05 * np.sin(t * 40) + rng.normal(0, 0.001, points)
+    lon = 80.21 + t * (80.02 - 80.21) + 0.08 * np.sin(t * 17) + rng.normal(0, 0.001, points)
+    return np.column_stack([lon, lat])
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pois", type=int, default=100_000)
+    parser.add_argument("--route-points", type=int, default=10_000)
+    parser.add_argument("--corridor-km", type=float, default=5.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        start = time.perf_counter()
+        build_index(synthetic_pois(args.pois), out_dir)
+        print(f"build:    {args.pois} POIs in {time.perf_counter() - start:.2f}s")
+
+        index = POIIndex(out_dir)
+        route = synthetic_route(args.route_points)
+
+        samples = route[np.linspace(0, len(route) - 1, 10).astype(int)]
+        elapsed, _ = timed(lambda: [index.query_radius(lat, lon, 10, limit=15)
+                                    for lon, lat in samples], args.repeat)
+        print(f"radius:   10 x 10km queries in {elapsed * 1000:.2f} ms")
+
+        elapsed, (idx, _) = timed(
+            lambda: index.query_corridor(route, args.corridor_km), args.repeat)
+        print(f"corridor: {len(idx)} POIs within {args.corridor_km} km of a "
+              f"{len(route)}-point route in {elapsed * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
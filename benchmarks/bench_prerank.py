@@ -0,0 +1,111 @@
+# benchmarks/bench_prerank.py
+"""
+Offline pre-ranking benchmark on the fixed fixtures in fixtures/prerank/.
+For each trip it compares the ranking prompt with and without the local
+pre-ranking stage (candidates, characters, ~tokens) and times the scoring.
+
+Every fixture carries a "reference": the picks a judge makes from the full
+candidate list, following the ranking prompt's rules. The checked-in ones
+are hand-curated ("source": "curated"); --record replaces them with
+Gemini's own picks ("source": "gemini"). reference_kept is the share of
+those picks that survive the shortlist. Recording needs a real
+GOOGLE_API_KEY; it also times both prompts live:
+
+    python -m benchmarks.bench_prerank
+    python -m benchmarks.bench_prerank --record
+"""
+import os
+import io
+import json
+import glob
+import time
+import argparse
+import contextlib
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "prerank")
+
+
+def load_fixtures(pattern):
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, pattern + ".json"))):
+        with open(path, encoding="utf-8") as f:
+            fixtures[path] = json.load(f)
+    return fixtures
+
+
+def quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def timed_llm(runnable, prompt):
+    start = time.perf_counter()
+    response = runnable.invoke(prompt)
+    return time.perf_counter() - start, [a.name for a in response.top_attractions]
+
+
+def overlap(reference, candidates):
+    """Share of `reference` names that also appear in `candidates`."""
+    if not reference:
+        return None
+    return len(set(reference) & set(candidates)) / len(set(reference))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fixtures", default="*", help="glob over fixture names")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--record", action="store_true",
+                        help="call Gemini on both prompts and store the full-list picks")
+    args = parser.parse_args()
+
+    # Importing the ranker builds every client in nodes.tools; only the
+    # Gemini one is ever called, and only with --record.
+    if not args.record:
+        os.environ.setdefault("GOOGLE_API_KEY", "offline")
+    os.environ.setdefault("ORS_API_KEY", "offline")
+    os.environ.setdefault("LLM_CACHE", "0")
+    from nodes.ranker import _build_prompt
+    from nodes.prerank import prerank
+
+    for path, state in load_fixtures(args.fixtures).items():
+        name = os.path.splitext(os.path.basename(path))[0]
+        days = state.get("trip_duration_days")
+        full_prompt = quiet(_build_prompt, state, use_prerank=False)
+        short_prompt = quiet(_build_prompt, state, use_prerank=True)
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            shortlist = prerank(state["attractions"], days)
+        prerank_ms = (time.perf_counter() - start) / args.repeat * 1000
+        short_names = [p["name"] for p in shortlist]
+
+        report = {
+            "candidates": f"{len(state['attractions'])} -> {len(shortlist)}",
+            "prompt_chars": f"{len(full_prompt)} -> {len(short_prompt)}",
+            "prompt_tokens~": f"{len(full_prompt) // 4} -> {len(short_prompt) // 4}",
+            "prerank_ms": round(prerank_ms, 3)
+        }
+
+        if args.record:
+            from nodes.tools import ranking_llm
+            full_s, full_picks = quiet(timed_llm, ranking_llm, full_prompt)
+            short_s, short_picks = quiet(timed_llm, ranking_llm, short_prompt)
+            state["reference"] = {"ranked": full_picks, "source": "gemini",
+                                  "latency_s": round(full_s, 2)}
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=1, ensure_ascii=False)
+                f.write("\n")
+            report["llm_latency_s"] = f"{full_s:.2f} -> {short_s:.2f}"
+            report["same_picks"] = round(overlap(full_picks, short_picks), 2)
+
+        reference = state.get("reference") or {}
+        if reference.get("ranked"):
+            kept = overlap(reference["ranked"], short_names)
+            report["reference_kept"] = f"{kept:.2f} ({reference.get('source', 'gemini')})"
+
+        print(f"{name:20s} " + "  ".join(f"{k}={v}" for k, v in report.items()))
+
+
+if __name__ == "__main__":
+    main()
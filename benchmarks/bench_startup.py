@@ -0,0 +1,94 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start cost of the API process: how long `import main` takes in a
+fresh interpreter (what uvicorn waits for before it opens the port), and
+what is left for first use or the background warm-up: compiling the graph
+(main.get_graph()) and building the provider clients (tools.warm_up()).
+"eager" is all three back to back, which is what importing main used to
+cost. Also lists the slowest imports from `python -X importtime`.
+
+    python -m benchmarks.bench_startup --runs 5 --out startup.json
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# Runs in the fresh interpreter; prints the stage timings as JSON.
+_PROBE = """
+import json, time
+t0 = time.perf_counter()
+import {module} as target
+t1 = time.perf_counter()
+graph = getattr(target, "get_graph", None)
+if graph:
+    graph()
+t2 = time.perf_counter()
+from nodes import tools
+tools.warm_up()
+t3 = time.perf_counter()
+print(json.dumps({{"import_s": t1 - t0, "graph_s": t2 - t1, "providers_s": t3 - t2}}))
+"""
+
+
+def _env():
+    env = dict(os.environ)
+    # Construction needs keys, not network access.
+    for name in ("GOOGLE_API_KEY", "ORS_API_KEY", "GEOAPIFY_API_KEY"):
+        env.setdefault(name, "startup")
+    env["PROVIDER_WARMUP"] = "0"
+    return env
+
+
+def probe(module):
+    result = subprocess.run([sys.executable, "-c", _PROBE.format(module=module)],
+                            env=_env(), capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module, top):
+    """(cumulative seconds, module) for the `top` slowest imports."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            env=_env(), capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative) / 1e6, name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="what the process imports first")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--out", default=None, help="also write the report as JSON")
+    args = parser.parse_args()
+
+    runs = [probe(args.module) for _ in range(args.runs)]
+    stages = {stage: round(statistics.median(run[stage] for run in runs), 3)
+              for stage in ("import_s", "graph_s", "providers_s")}
+    stages["eager_s"] = round(sum(stages.values()), 3)
+    report = {"module": args.module, "runs": args.runs, "median": stages,
+              "slowest_imports": [{"module": name.strip(), "cumulative_s": round(s, 3)}
+                                  for s, name in slowest_imports(args.module, args.top)]}
+
+    print(f"import {args.module:12s} {stages['import_s']:6.3f}s   (port opens after this)")
+    print(f"get_graph()         {stages['graph_s']:6.3f}s   (first trip or warm-up)")
+    print(f"tools.warm_up()     {stages['providers_s']:6.3f}s   (first trip or warm-up)")
+    print(f"eager total         {stages['eager_s']:6.3f}s")
+    print("\nslowest imports (cumulative):")
+    for row in report["slowest_imports"]:
+        print(f"  {row['cumulative_s']:6.3f}s  {row['module']}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_state_memory.py
+"""
+Peak RSS of concurrent long cross-island trips (think Jaffna -> Galle,
+tens of thousands of ORS points each) with every backend stubbed out.
+
+"handle" is the graph as it is: the route lives once in the route store as
+a float32 array and the state carries its handle. "lists" puts the ORS
+[[lon, lat], ...] lists back into the state, which is what route_geojson /
+route_path_coords used to hold for the whole request. Each mode runs in
+its own process so the peaks don't mix.
+
+    python -m benchmarks.bench_state_memory --trips 20 --points 40000
+"""
+import io
+import sys
+import json
+import time
+import asyncio
+import resource
+import argparse
+import contextlib
+import subprocess
+
+
+def _rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def child(mode, trips, points):
+    from benchmarks.stubs import install_stubs
+    from nodes import tools, router, attractions
+    from nodes.workflow import build_graph
+
+    install_stubs(llm_latency=0.3, geocode_latency=0.05, route_latency=0.05,
+                  places_latency=0.05)
+    tools.ors_client.points = points
+    if mode == "lists":
+        # The "handle" is the list itself, like the old route_path_coords.
+        router.put_route = lambda path: path
+        attractions.get_route = lambda path: path
+    graph = build_graph()
+
+    async def run(tag, n):
+        queries = [f"from {tag}north{i} to {tag}south{i}, 3 days" for i in range(n)]
+        return await asyncio.gather(*[graph.ainvoke({"original_query": q}) for q in queries])
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(run("warm", 1))
+        baseline_kb = _rss_kb()
+        start = time.perf_counter()
+        results = asyncio.run(run("trip", trips))
+        elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "mode": mode,
+        "baseline_mb": round(baseline_kb / 1024, 1),
+        "peak_mb": round(peak_kb / 1024, 1),
+        "growth_mb": round((peak_kb - baseline_kb) / 1024, 1),
+        "elapsed_s": round(elapsed, 2),
+        "itineraries": sum(1 for r in results if r.get("final_itinerary"))
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trips", type=int, default=20, help="concurrent trips")
+    parser.add_argument("--points", type=int, default=40000, help="ORS points per route")
+    parser.add_argument("--child", choices=["lists", "handle"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.trips, args.points)
+        return
+
+    reports = {}
+    for mode in ("lists", "handle"):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_state_memory", "--child", mode,
+             "--trips", str(args.trips), "--points", str(args.points)],
+            check=True, capture_output=True, text=True).stdout
+        reports[mode] = json.loads(out.strip().splitlines()[-1])
+        r = reports[mode]
+        print(f"{mode:7s} {args.trips} trips x {args.points} points: peak {r['peak_mb']:7.1f} MB "
+              f"(+{r['growth_mb']:6.1f} MB over baseline) in {r['elapsed_s']:.2f}s, "
+              f"{r['itineraries']} itineraries")
+
+    saved = reports["lists"]["growth_mb"] - reports["handle"]["growth_mb"]
+    print(f"peak growth saved: {saved:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# benchmarks/load_test.py
+"""
+Concurrent trips per worker, with every backend stubbed out (see stubs.py).
+Runs N trips at once on one event loop, the way a single uvicorn worker
+would, first with the old blocking invoke() and then with ainvoke().
+
+    python -m benchmarks.load_test --trips 20
+"""
+import time
+import asyncio
+import argparse
+import contextlib
+import io
+
+from benchmarks.stubs import install_stubs
+from nodes.workflow import build_graph
+
+
+async def run_trips(graph, queries, use_async):
+    async def plan(query):
+        inputs = {"original_query": query}
+        if use_async:
+            return await graph.ainvoke(inputs)
+        return graph.invoke(inputs)  # what /plan-trip did before
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[plan(q) for q in queries])
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trips", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--http-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    install_stubs(llm_latency=args.llm_latency, geocode_latency=args.http_latency,
+                  route_latency=args.http_latency, places_latency=args.http_latency)
+    graph = build_graph()
+
+    for label, use_async in (("blocking invoke", False), ("ainvoke", True)):
+        # Fresh place names each round so caches don't hide the latency.
+        queries = [f"from {label[:4]}town{i} to {label[:4]}city{i}, 2 days"
+                   for i in range(args.trips)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed, results = asyncio.run(run_trips(graph, queries, use_async))
+        ok = sum(1 for r in results if r.get("final_itinerary"))
+        print(f"{label:16s} {args.trips} trips in {elapsed:6.2f}s "
+              f"-> {args.trips / elapsed:5.2f} trips/s ({ok} itineraries)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+# benchmarks/replay.py
+"""
+One local HTTP server standing in for Gemini, Nominatim, ORS and Geoapify,
+answering from recorded responses (fixtures/replay/recorded.json.gz) after
+an injected latency. The app talks to it over real HTTP through the normal
+clients; endpoint_env() gives the settings that point them at it:
+
+    /gemini/v1beta/models/...:generateContent   (and :streamGenerateContent)
+    /nominatim/search
+    /ors/v2/directions/{profile}/geojson
+    /geoapify/v2/places
+
+The first request on each new connection also waits --connect-latency,
+standing in for the TCP + TLS handshakes of a real HTTPS connection.
+GET /_replay/stats counts the calls and new connections per provider (and
+fixture misses); POST /_replay/reset zeroes them. A request with no
+recording is answered by benchmarks/synthetic.py (--on-miss synthetic,
+counted as a miss) or gets a 404 (--on-miss error).
+
+    python -m benchmarks.replay --serve --latency gemini=0.8,ors=0.3
+    python -m benchmarks.replay --record synthetic     # re-record, no keys needed
+    python -m benchmarks.replay --record live          # real APIs, keys from .env
+
+Recording plans every trip in fixtures/replay/queries.jsonl once per
+GUARDRAIL_MODE with the default settings; other settings (e.g. no tile
+cache) send requests that were never recorded.
+"""
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import random
+import hashlib
+import asyncio
+import argparse
+import threading
+import contextlib
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "replay")
+RECORDING_PATH = os.path.join(FIXTURE_DIR, "recorded.json.gz")
+QUERIES_PATH = os.path.join(FIXTURE_DIR, "queries.jsonl")
+
+PROVIDERS = ("gemini", "nominatim", "ors", "geoapify")
+# Seconds per call; roughly what the real services take from Colombo.
+DEFAULT_LATENCY = {"gemini": 0.8, "nominatim": 0.15, "ors": 0.3, "geoapify": 0.2}
+# TCP + TLS 1.2 handshakes: about three round trips at ~30 ms.
+DEFAULT_CONNECT_LATENCY = 0.1
+LIVE_URLS = {
+    "gemini": "https://generativelanguage.googleapis.com",
+    "nominatim": "https://nominatim.openstreetmap.org",
+    "ors": "https://api.openrouteservice.org",
+    "geoapify": "https://api.geoapify.com"
+}
+
+_QUERY_RE = re.compile(r'(?:USER INPUT|Query|User Request): "(.*)"')
+_ROUTE_RE = re.compile(r"Route: (.+) to (.+)\n\s*- Duration: (\d+)")
+_STREAM_WORDS = 8
+
+
+def parse_latency(spec):
+    """'0.2' (every provider) or 'gemini=0.8,ors=0.3' (the rest keep the defaults)."""
+    latency = dict(DEFAULT_LATENCY)
+    if not spec:
+        return latency
+    if "=" not in spec:
+        return {provider: float(spec) for provider in PROVIDERS}
+    for part in spec.split(","):
+        provider, value = part.split("=")
+        if provider not in PROVIDERS:
+            raise ValueError(f"unknown provider {provider!r}")
+        latency[provider] = float(value)
+    return latency
+
+
+def load_queries(path=QUERIES_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def endpoint_env(base_url):
+    """Settings that point nodes/tools.py and nodes/attractions.py at the server."""
+    netloc = urlparse(base_url).netloc
+    return {
+        "GEMINI_BASE_URL": f"{base_url}/gemini",
+        "NOMINATIM_DOMAIN": f"{netloc}/nominatim",
+        "NOMINATIM_SCHEME": "http",
+        "ORS_BASE_URL": f"{base_url}/ors",
+        "GEOAPIFY_URL": f"{base_url}/geoapify/v2/places"
+    }
+
+
+# --- Request Keys ---
+
+def _prompt(body):
+    return "\n".join(part.get("text", "") for content in body.get("contents", [])
+                     for part in content.get("parts", []))
+
+
+def _gemini_key(body):
+    """
+    Output schema plus the trip the prompt is about (the user's query, or
+    the route and length for the itinerary), so a replay still matches when
+    a candidate list differs slightly from the recorded one.
+    """
+    schema = ((body.get("generationConfig") or {}).get("responseJsonSchema") or {}).get("title")
+    prompt = _prompt(body)
+    match = _QUERY_RE.search(prompt)
+    if match:
+        anchor = f"query:{match.group(1)}"
+    else:
+        match = _ROUTE_RE.search(prompt)
+        anchor = "route:" + "|".join(match.groups()) if match else \
+            "prompt:" + hashlib.sha1(prompt.encode()).hexdigest()
+    return f"{schema or 'text'}|{anchor}"
+
+
+def request_key(provider, path, params, body):
+    """The recording key for one request (API keys and formatting ignored)."""
+    if provider == "nominatim":
+        return " ".join(params.get("q", "").lower().split())
+    if provider == "geoapify":
+        return f"{params.get('categories')}|{params.get('filter')}|{params.get('limit')}"
+    if provider == "ors":
+        profile = path.strip("/").split("/")[2]
+        coords = ";".join(f"{lon:.5f},{lat:.5f}" for lon, lat in body["coordinates"])
+        return f"{profile}|{coords}"
+    return _gemini_key(body)
+
+
+# --- Recording ---
+
+class Recording:
+    """Recorded response bodies, by provider and request key."""
+
+    def __init__(self, responses=None, meta=None):
+        self.responses = {p: dict((responses or {}).get(p, {})) for p in PROVIDERS}
+        self.meta = meta or {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=RECORDING_PATH):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["responses"], data.get("meta"))
+
+    def save(self, path=RECORDING_PATH):
+        with self._lock:
+            data = {"meta": self.meta, "responses": self.responses}
+        # mtime=0 keeps the file byte-identical across identical recordings.
+        with open(path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+            f.write(json.dumps(data, sort_keys=True, separators=(",", ":")).encode())
+
+    def get(self, provider, key):
+        with self._lock:
+            return self.responses[provider].get(key)
+
+    def put(self, provider, key, body):
+        with self._lock:
+            self.responses[provider][key] = body
+
+    def counts(self):
+        with self._lock:
+            return {provider: len(entries) for provider, entries in self.responses.items()}
+
+
+# --- Upstreams (what answers a request that has no recording) ---
+
+def synthetic_upstream(provider, path, params, body, headers):
+    from benchmarks import synthetic
+    if provider == "nominatim":
+        return synthetic.nominatim_search(params)
+    if provider == "geoapify":
+        return synthetic.geoapify_places(params)
+    if provider == "ors":
+        return synthetic.ors_directions(path.strip("/").split("/")[2], body)
+    return synthetic.gemini_generate(body)
+
+
+def live_upstream(provider, path, params, body, headers):
+    import requests
+    # Streams are recorded as one generateContent answer and re-chunked on replay.
+    path = path.replace(":streamGenerateContent", ":generateContent")
+    params = {k: v for k, v in params.items() if not (provider == "gemini" and k == "alt")}
+    forwarded = {k: v for k, v in headers.items()
+                 if k.lower() in ("authorization", "x-goog-api-key", "user-agent", "content-type")}
+    if body is None:
+        response = requests.get(LIVE_URLS[provider] + path, params=params,
+                                headers=forwarded, timeout=60)
+    else:
+        response = requests.post(LIVE_URLS[provider] + path, params=params,
+                                 headers=forwarded, json=body, timeout=60)
+    response.raise_for_status()
+    return response.json()
+
+
+UPSTREAMS = {"synthetic": synthetic_upstream, "live": live_upstream}
+
+
+# --- Server ---
+
+class ReplayServer:
+    """
+    Serves `recording` on 127.0.0.1. Misses go to `upstream` (and are kept
+    when `record` is set) or, without one, get a 404.
+    """
+
+    def __init__(self, recording, latency=None, jitter=0.0, seed=0, upstream=None,
+                 record=False, port=0, connect_latency=DEFAULT_CONNECT_LATENCY):
+        self.recording = recording
+        self.latency = latency if latency is not None else dict(DEFAULT_LATENCY)
+        self.connect_latency = connect_latency
+        self.jitter = jitter
+        self.upstream = upstream
+        self.record = record
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._calls = dict.fromkeys(PROVIDERS, 0)
+        self._misses = dict.fromkeys(PROVIDERS, 0)
+        self._connections = dict.fromkeys(PROVIDERS, 0)
+        self._server = _Server(("127.0.0.1", port), _Handler)
+        self._server.replay = self
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {"calls": dict(self._calls), "connections": dict(self._connections),
+                    "misses": dict(self._misses)}
+
+    def reset(self):
+        with self._lock:
+            self._calls = dict.fromkeys(PROVIDERS, 0)
+            self._misses = dict.fromkeys(PROVIDERS, 0)
+            self._connections = dict.fromkeys(PROVIDERS, 0)
+
+    def connected(self, provider):
+        """Counts a new client connection; returns how long its handshake takes."""
+        with self._lock:
+            self._connections[provider] += 1
+        return self.connect_latency
+
+    def delay(self, provider):
+        """The injected latency for one call, jittered by +-jitter (a fraction)."""
+        base = self.latency.get(provider, 0.0)
+        with self._lock:
+            factor = 1 + self.jitter * (2 * self._random.random() - 1) if self.jitter else 1
+        return max(0.0, base * factor)
+
+    def answer(self, provider, path, params, body, headers):
+        """The response body for a request, or None when it can't be answered."""
+        key = request_key(provider, path, params, body)
+        with self._lock:
+            self._calls[provider] += 1
+        recorded = self.recording.get(provider, key)
+        if recorded is not None:
+            return recorded
+        if not self.record:
+            with self._lock:
+                self._misses[provider] += 1
+        if self.upstream is None:
+            return None
+        answer = self.upstream(provider, path, params, body, headers)
+        if self.record:
+            self.recording.put(provider, key, answer)
+        return answer
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # a whole benchmark's clients connect at once
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real services
+
+    def setup(self):
+        super().setup()
+        self.requests_served = 0
+
+    def do_GET(self):
+        self._dispatch(None)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self._dispatch(json.loads(self.rfile.read(length) or b"{}"))
+
+    def _dispatch(self, body):
+        replay = self.server.replay
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        provider, _, path = url.path.lstrip("/").partition("/")
+        path = "/" + path
+
+        if provider == "_replay":
+            if path == "/reset":
+                replay.reset()
+            return self._send_json(200, replay.stats())
+        if provider not in PROVIDERS:
+            return self._send_json(404, {"error": f"unknown provider {provider!r}"})
+
+        self.requests_served += 1
+        if self.requests_served == 1:
+            time.sleep(replay.connected(provider))
+        started = time.perf_counter()
+        delay = replay.delay(provider)
+        try:
+            answer = replay.answer(provider, path, params, body, dict(self.headers))
+        except Exception as e:
+            return self._send_json(502, {"error": f"upstream failed: {e}"})
+        if answer is None:
+            return self._send_json(404, {"error": "no recording for this request"})
+
+        if ":streamGenerateContent" in path:
+            return self._send_stream(answer, delay)
+        time.sleep(max(0.0, delay - (time.perf_counter() - started)))
+        self._send_json(200, answer)
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self._write(data)
+
+    def _send_stream(self, answer, delay):
+        """A recorded generateContent answer as server-sent events, a few words each."""
+        candidate = answer["candidates"][0]
+        words = candidate["content"]["parts"][0]["text"].split(" ")
+        pieces = [" ".join(words[i:i + _STREAM_WORDS]) + " "
+                  for i in range(0, len(words), _STREAM_WORDS)]
+        pieces[-1] = pieces[-1][:-1]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, piece in enumerate(pieces):
+            event = {"candidates": [{"content": {"role": "model", "parts": [{"text": piece}]},
+                                     "index": 0}]}
+            if i == len(pieces) - 1:
+                event["candidates"][0]["finishReason"] = candidate.get("finishReason", "STOP")
+                event["usageMetadata"] = answer.get("usageMetadata")
+            time.sleep(delay / len(pieces))
+            data = b"data: " + json.dumps(event).encode() + b"\r\n\r\n"
+            if not self._write(b"%x\r\n%s\r\n" % (len(data), data)):
+                return
+        self._write(b"0\r\n\r\n")
+
+    def _write(self, data):
+        try:
+            self.wfile.write(data)
+            self.wfile.flush()
+            return True
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # client gave up (deadline, discarded speculation)
+            return False
+
+    def log_message(self, *args):
+        pass
+
+
+# --- Recording Run ---
+
+def record(source, queries_path=QUERIES_PATH, out_path=RECORDING_PATH):
+    """Plans every query through a recording server and saves what it answered."""
+    recording = Recording(meta={
+        "source": source,
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "queries": os.path.relpath(queries_path, os.path.dirname(__file__))
+    })
+    server = ReplayServer(recording, latency=dict.fromkeys(PROVIDERS, 0.0),
+                          upstream=UPSTREAMS[source], record=True, connect_latency=0.0).start()
+
+    os.environ.update(endpoint_env(server.url))
+    # Every call has to reach the server, once.
+    os.environ.update({"CACHE_DB_PATH": "", "PLAN_CACHE": "0", "LLM_CACHE": "0"})
+    if source == "synthetic":
+        for name in ("GOOGLE_API_KEY", "ORS_API_KEY", "GEOAPIFY_API_KEY"):
+            os.environ.setdefault(name, "replay")
+        for provider in PROVIDERS:
+            os.environ.setdefault(f"RATE_LIMIT_{provider.upper()}", "1000,1000")
+
+    from nodes import guardrail
+    from nodes.workflow import build_graph
+    graph = build_graph()
+    queries = load_queries(queries_path)
+
+    async def plan_all():
+        for mode in ("combined", "separate"):
+            guardrail.GUARDRAIL_MODE = mode
+            for item in queries:
+                await graph.ainvoke({"original_query": item["query"]})
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        asyncio.run(plan_all())
+    server.stop()
+
+    recording.meta["responses"] = recording.counts()
+    recording.save(out_path)
+    return recording.meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve", action="store_true", help="serve the recording")
+    parser.add_argument("--record", choices=sorted(UPSTREAMS), help="re-record the fixtures")
+    parser.add_argument("--recording", default=RECORDING_PATH)
+    parser.add_argument("--queries", default=QUERIES_PATH)
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", default=None,
+                        help="seconds per call: '0.2' or 'gemini=0.8,ors=0.3' (default: %s)"
+                             % ",".join(f"{k}={v}" for k, v in DEFAULT_LATENCY.items()))
+    parser.add_argument("--connect-latency", type=float, default=DEFAULT_CONNECT_LATENCY,
+                        help="extra seconds on each new connection's first request")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="latency varies by up to this fraction either way")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--on-miss", choices=["synthetic", "error"], default="synthetic")
+    args = parser.parse_args()
+
+    if args.record:
+        print(json.dumps(record(args.record, args.queries, args.recording)))
+    elif args.serve:
+        server = ReplayServer(Recording.load(args.recording), parse_latency(args.latency),
+                              args.jitter, args.seed,
+                              upstream=synthetic_upstream if args.on_miss == "synthetic" else None,
+                              port=args.port, connect_latency=args.connect_latency)
+        # First line of output: where to point the app (read by bench_graph.py).
+        print(json.dumps({"url": server.url, "env": endpoint_env(server.url),
+                          "recording": server.recording.meta}), flush=True)
+        server.serve_forever()
+    else:
+        parser.print_help(sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
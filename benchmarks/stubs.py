@@ -0,0 +1,164 @@
+# benchmarks/stubs.py
+"""
+Stand-ins for Gemini, Nominatim, ORS and Geoapify that only add latency.
+Import this module BEFORE anything from `nodes` so the settings below
+(no disk cache, no tile, plan or LLM cache, dummy keys) take effect.
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import zlib
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+os.environ.setdefault("GOOGLE_API_KEY", "stub")
+os.environ.setdefault("ORS_API_KEY", "stub")
+os.environ.setdefault("GEOAPIFY_API_KEY", "stub")
+os.environ.setdefault("CACHE_DB_PATH", "")
+os.environ.setdefault("ATTRACTIONS_TILE_CACHE", "0")
+os.environ.setdefault("PLAN_CACHE", "0")
+os.environ.setdefault("LLM_CACHE", "0")
+# The stand-ins have no quotas; keep the provider limiters out of the way.
+for _provider in ("GEMINI", "NOMINATIM", "ORS", "GEOAPIFY"):
+    os.environ.setdefault(f"RATE_LIMIT_{_provider}", "1000,1000")
+
+from langchain_core.messages import AIMessage, AIMessageChunk  # noqa: E402
+from nodes.models import (  # noqa: E402
+    ExtractedLocations, RankedAttractionsList, RankedAttraction, GuardrailOutcome,
+    GuardrailExtraction)
+
+
+def _place_coords(name):
+    """Deterministic pseudo-coordinates on the island for any name."""
+    h = zlib.crc32(name.lower().encode())
+    return 6.0 + (h % 3800) / 1000.0, 79.9 + ((h >> 12) % 1900) / 1000.0
+
+
+class FakeLLM:
+    """Answers like the structured/raw Gemini runnables after `latency` s."""
+
+    def __init__(self, kind, latency):
+        self.kind = kind
+        self.latency = latency
+
+    def _answer(self, prompt):
+        text = prompt if isinstance(prompt, str) else prompt[-1].content
+        if self.kind == "guardrail":
+            return GuardrailOutcome(decision="valid", feedback_message="Planning your trip...")
+        if self.kind == "combined":
+            match = re.search(r"from (\w+) to (\w+)", text)
+            return GuardrailExtraction(decision="valid", feedback_message="Planning your trip...",
+                                       origin=match.group(1), destination=match.group(2),
+                                       duration_days=2)
+        if self.kind == "extract":
+            match = re.search(r"from (\w+) to (\w+)", text)
+            return ExtractedLocations(origin=match.group(1), destination=match.group(2),
+                                      duration_days=2)
+        if self.kind == "rank":
+            names = re.findall(r"^\s*- (.+?) \(Category", text, flags=re.M)[:10]
+            return RankedAttractionsList(top_attractions=[
+                RankedAttraction(name=n, reasoning="Worth a stop.") for n in names])
+        return AIMessage(content="## Day 1: The Journey Begins\n- Drive and explore.")
+
+    def invoke(self, prompt, *args, **kwargs):
+        time.sleep(self.latency)
+        return self._answer(prompt)
+
+    async def ainvoke(self, prompt, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._answer(prompt)
+
+    async def astream(self, prompt, *args, **kwargs):
+        """Raw LLM only: the answer word by word, latency spread across it."""
+        words = self._answer(prompt).content.split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(self.latency / len(words))
+            yield AIMessageChunk(content=word if i == 0 else " " + word)
+
+
+class FakeGeolocator:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def geocode(self, name):
+        time.sleep(self.latency)
+        lat, lon = _place_coords(name)
+        return type("Location", (), {"latitude": lat, "longitude": lon})()
+
+
+class FakeORS:
+    def __init__(self, latency, points=2000):
+        self.latency = latency
+        self.points = points
+
+    def directions(self, coordinates, **kwargs):
+        time.sleep(self.latency)
+        (lon1, lat1), (lon2, lat2) = coordinates
+        n = self.points
+        path = [[lon1 + (lon2 - lon1) * i / (n - 1), lat1 + (lat2 - lat1) * i / (n - 1)]
+                for i in range(n)]
+        return {"features": [{
+            "properties": {"summary": {"distance": 120000.0, "duration": 10800.0}},
+            "geometry": {"type": "LineString", "coordinates": path}
+        }]}
+
+
+def start_geoapify_server(latency):
+    """Local Geoapify stand-in; returns (server, base_url)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            query = parse_qs(urlparse(self.path).query)
+            kind, args = query["filter"][0].split(":", 1)
+            values = [float(v) for v in args.split(",")]
+            lon, lat = (values[0], values[1]) if kind == "circle" else \
+                ((values[0] + values[2]) / 2, (values[1] + values[3]) / 2)
+            limit = int(query.get("limit", ["5"])[0])
+            features = [{"properties": {
+                "name": f"Site {lat + i * 0.001:.3f},{lon:.3f}",
+                "categories": ["tourism", "tourism.sights"],
+                "lat": lat + i * 0.001,
+                "lon": lon
+            }} for i in range(min(limit, 20))]
+            body = json.dumps({"features": features}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client cancelled the request (deadline, discarded speculation)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 256  # the default (5) drops concurrent connects
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v2/places"
+
+
+def install_stubs(llm_latency=0.5, geocode_latency=0.2, route_latency=0.3,
+                  places_latency=0.2):
+    """Swaps every external dependency used by the nodes for a stand-in."""
+    from nodes import tools, attractions
+
+    # The nodes look these up in nodes.tools on every call.
+    tools.guardrail_llm = FakeLLM("guardrail", llm_latency)
+    tools.combined_guardrail_llm = FakeLLM("combined", llm_latency)
+    tools.structured_llm = FakeLLM("extract", llm_latency)
+    tools.ranking_llm = FakeLLM("rank", llm_latency)
+    tools.llm = FakeLLM("itinerary", llm_latency)
+    tools.geolocator = FakeGeolocator(geocode_latency)
+    tools.ors_client = FakeORS(route_latency)
+    server, url = start_geoapify_server(places_latency)
+    attractions.GEOAPIFY_URL = url
+    return server
@@ -0,0 +1,281 @@
+# benchmarks/synthetic.py
+"""
+Deterministic answers shaped like Gemini, Nominatim, ORS and Geoapify
+responses, for recording replay fixtures without API keys (see replay.py).
+
+Place coordinates are the real town centres; everything else is made up
+but stable: the same request always gets the same bytes back. Routes wind
+around the straight line with a point every ~80 m, about the density of
+ORS geometries; tiles hold a few dozen tourism POIs named after the
+nearest town.
+"""
+import re
+import json
+import math
+import zlib
+
+from nodes.geo import haversine_km
+from nodes.preclassifier import GAZETTEER, resolve_place, extract_days
+
+# Real town centres (lat, lon) for the places in fixtures/replay/queries.jsonl
+# and a few more.
+PLACES = {
+    "Colombo": (6.9271, 79.8612),
+    "Kandy": (7.2906, 80.6337),
+    "Galle": (6.0535, 80.2210),
+    "Ella": (6.8667, 81.0466),
+    "Mirissa": (5.9483, 80.4716),
+    "Negombo": (7.2008, 79.8737),
+    "Sigiriya": (7.9570, 80.7603),
+    "Jaffna": (9.6615, 80.0255),
+    "Nuwara Eliya": (6.9497, 80.7891),
+    "Arugam Bay": (6.8400, 81.8360),
+    "Anuradhapura": (8.3114, 80.4037),
+    "Trincomalee": (8.5874, 81.2152),
+    "Dambulla": (7.8742, 80.6511),
+    "Polonnaruwa": (7.9403, 81.0188),
+    "Bentota": (6.4210, 80.0000),
+    "Hikkaduwa": (6.1395, 80.1063),
+    "Yala": (6.3726, 81.5190),
+    "Haputale": (6.7656, 80.9510),
+    "Katunayake": (7.1697, 79.8883),
+    "Unawatuna": (6.0096, 80.2497),
+    "Matara": (5.9549, 80.5550),
+    "Habarana": (8.0372, 80.7499),
+    "Batticaloa": (7.7102, 81.6924),
+    "Ratnapura": (6.6828, 80.3992),
+}
+
+ROUTE_POINT_SPACING_KM = 0.08
+ROUTE_SPEED_KMH = 42
+
+_PLACE_RE = re.compile(r"\b(" + "|".join(
+    re.escape(name.lower()) for name in sorted(
+        [n for canonical, extra in GAZETTEER.items() for n in [canonical, *extra]],
+        key=len, reverse=True)) + r")\b")
+_QUERY_RE = re.compile(r'(?:USER INPUT|Query|User Request): "(.*)"')
+_CANDIDATE_RE = re.compile(r"^\s*- (.+?) \(Category", re.M)
+_ROUTE_RE = re.compile(r"Route: (.+) to (.+)\n\s*- Duration: (\d+)")
+
+_ADJECTIVES = ["Old", "Royal", "Hilltop", "Riverside", "Lotus", "Sacred", "Lakeside", "Golden",
+               "Ancient", "Hidden", "Misty", "Green", "Sunset", "Colonial", "Temple Hill"]
+_KINDS = [
+    ("Raja Maha Viharaya", ["tourism", "tourism.sights", "religion", "religion.place_of_worship",
+                            "religion.place_of_worship.buddhism"]),
+    ("Kovil", ["tourism", "tourism.sights", "religion", "religion.place_of_worship",
+               "religion.place_of_worship.hinduism"]),
+    ("Viewpoint", ["tourism", "tourism.attraction", "tourism.attraction.viewpoint"]),
+    ("Falls", ["tourism", "tourism.sights", "natural", "natural.water"]),
+    ("Fort", ["tourism", "tourism.sights", "tourism.sights.fort", "heritage"]),
+    ("Museum", ["tourism", "entertainment", "entertainment.museum"]),
+    ("Tea Estate", ["tourism", "tourism.attraction", "production"]),
+    ("Botanical Garden", ["tourism", "leisure", "leisure.park", "leisure.park.garden"]),
+    ("Clock Tower", ["tourism", "tourism.sights", "tourism.sights.tower"]),
+    ("Guest House", ["tourism", "accommodation", "accommodation.guest_house"]),
+]
+
+
+def _hash(*parts):
+    return zlib.crc32("|".join(str(p) for p in parts).encode())
+
+
+def _nearest_town(lat, lon):
+    return min(PLACES, key=lambda name: haversine_km(lat, lon, *PLACES[name]))
+
+
+# --- Nominatim ---
+
+def nominatim_search(params):
+    """GET /search -> a list with at most one match."""
+    name = params.get("q", "").split(",")[0]
+    place = resolve_place(name)
+    if place not in PLACES:
+        return []
+    lat, lon = PLACES[place]
+    return [{
+        "place_id": _hash(place) % 10 ** 8,
+        "lat": f"{lat:.7f}",
+        "lon": f"{lon:.7f}",
+        "class": "place",
+        "type": "city",
+        "importance": 0.6,
+        "display_name": f"{place}, Sri Lanka"
+    }]
+
+
+# --- ORS ---
+
+def ors_directions(profile, body):
+    """POST /v2/directions/{profile}/geojson -> a one-route FeatureCollection."""
+    (lon1, lat1), (lon2, lat2) = body["coordinates"][:2]
+    straight_km = haversine_km(lat1, lon1, lat2, lon2)
+    n = max(10, int(straight_km * 1.3 / ROUTE_POINT_SPACING_KM))
+    seed = _hash(profile, round(lon1, 4), round(lat1, 4), round(lon2, 4), round(lat2, 4))
+    # Roads wind: offset the straight line sideways by a few sine waves.
+    waves = [(1 + (seed >> (4 * k)) % 5, 0.01 + ((seed >> (3 * k)) % 7) / 400) for k in range(3)]
+    dx, dy = lon2 - lon1, lat2 - lat1
+    norm = math.hypot(dx, dy) or 1.0
+    px, py = -dy / norm, dx / norm
+    coords = []
+    for i in range(n):
+        t = i / (n - 1)
+        offset = sum(a * math.sin(math.pi * f * t) for f, a in waves) * math.sin(math.pi * t)
+        coords.append([round(lon1 + dx * t + px * offset, 6),
+                       round(lat1 + dy * t + py * offset, 6)])
+    distance_m = sum(haversine_km(a[1], a[0], b[1], b[0])
+                     for a, b in zip(coords, coords[1:])) * 1000
+    duration_s = distance_m / 1000 / ROUTE_SPEED_KMH * 3600
+    lons, lats = [c[0] for c in coords], [c[1] for c in coords]
+    bbox = [min(lons), min(lats), max(lons), max(lats)]
+    return {
+        "type": "FeatureCollection",
+        "bbox": bbox,
+        "features": [{
+            "type": "Feature",
+            "bbox": bbox,
+            "properties": {
+                "summary": {"distance": round(distance_m, 1), "duration": round(duration_s, 1)},
+                "way_points": [0, n - 1]
+            },
+            "geometry": {"type": "LineString", "coordinates": coords}
+        }],
+        "metadata": {"service": "routing", "query": {"profile": profile, "format": "geojson"}}
+    }
+
+
+# --- Geoapify ---
+
+def geoapify_places(params):
+    """GET /v2/places with a rect: or circle: filter -> a FeatureCollection."""
+    kind, args = params["filter"].split(":", 1)
+    values = [float(v) for v in args.split(",")]
+    if kind == "rect":
+        min_lon, min_lat, max_lon, max_lat = values
+    else:
+        lon, lat, radius_m = values
+        d_lat = radius_m / 111_320
+        d_lon = d_lat / max(0.1, math.cos(math.radians(lat)))
+        min_lon, min_lat, max_lon, max_lat = lon - d_lon, lat - d_lat, lon + d_lon, lat + d_lat
+    limit = int(params.get("limit", 20))
+    seed = _hash(params["filter"])
+    town = _nearest_town((min_lat + max_lat) / 2, (min_lon + max_lon) / 2)
+
+    features = []
+    for i in range(min(limit, 15 + seed % 30)):
+        h = _hash(seed, i)
+        lat = min_lat + (h % 10007) / 10007 * (max_lat - min_lat)
+        lon = min_lon + ((h >> 8) % 10009) / 10009 * (max_lon - min_lon)
+        noun, categories = _KINDS[(h >> 4) % len(_KINDS)]
+        name = f"{town} {_ADJECTIVES[(h >> 12) % len(_ADJECTIVES)]} {noun}"
+        features.append({
+            "type": "Feature",
+            "properties": {
+                "name": name,
+                "categories": categories,
+                "lat": round(lat, 7),
+                "lon": round(lon, 7),
+                "formatted": f"{name}, {town}, Sri Lanka",
+                "place_id": f"{h:08x}"
+            },
+            "geometry": {"type": "Point", "coordinates": [round(lon, 7), round(lat, 7)]}
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+# --- Gemini ---
+
+def _places_in(text):
+    found = []
+    for match in _PLACE_RE.finditer(text.lower()):
+        place = resolve_place(match.group(1))
+        if place and (not found or found[-1] != place):
+            found.append(place)
+    return found
+
+
+def _trip(query):
+    places = _places_in(query)
+    origin = places[0] if len(places) >= 2 else None
+    destination = places[-1] if len(places) >= 2 else None
+    return origin, destination, extract_days(" ".join(query.lower().split()))
+
+
+def _structured(schema, prompt):
+    query_match = _QUERY_RE.search(prompt)
+    query = query_match.group(1) if query_match else ""
+    origin, destination, days = _trip(query)
+
+    if schema in ("GuardrailOutcome", "GuardrailExtraction"):
+        if origin and days:
+            answer = {"decision": "valid",
+                      "feedback_message": "That sounds like a wonderful trip! Let me find the best spots for you..."}
+        elif origin or _places_in(query):
+            answer = {"decision": "incomplete",
+                      "feedback_message": "I'd love to plan that for you, but I need to know where "
+                                          "you're starting, where you're headed and how many days you have."}
+        else:
+            answer = {"decision": "unrelated",
+                      "feedback_message": "I'm sorry, I can only help with planning trips around Sri Lanka."}
+        if schema == "GuardrailExtraction":
+            answer.update(origin=origin, destination=destination, duration_days=days)
+        return answer
+    if schema == "ExtractedLocations":
+        return {"origin": origin or "", "destination": destination or "", "duration_days": days}
+    if schema == "RankedAttractionsList":
+        target = 6 if (days or 1) <= 1 else 12 if days <= 3 else 16
+        candidates = [name for name in _CANDIDATE_RE.findall(prompt)
+                      if not name.endswith("Guest House")][:target]
+        return {"top_attractions": [
+            {"name": name, "reasoning": f"A highlight of the route; good for Day {1 + i * (days or 1) // max(1, len(candidates))}."}
+            for i, name in enumerate(candidates)]}
+    raise ValueError(f"no synthetic answer for schema {schema!r}")
+
+
+def _itinerary(prompt):
+    match = _ROUTE_RE.search(prompt)
+    origin, destination, days = (match.group(1), match.group(2), int(match.group(3))) if match \
+        else ("the origin", "the destination", 1)
+    stops = re.findall(r"^\s*\d+\. (.+?) \(", prompt, re.M)
+    per_day = max(1, math.ceil(len(stops) / days)) if stops else 0
+    lines = []
+    for day in range(1, days + 1):
+        title = "The Journey Begins" if day == 1 else f"Exploring {destination}"
+        lines.append(f"## Day {day}: {title}")
+        todays = stops[(day - 1) * per_day:day * per_day]
+        slots = ["Morning", "Afternoon", "Evening"]
+        for i, slot in enumerate(slots):
+            if i < len(todays):
+                lines.append(f"- **{slot}:** Visit {todays[i]}. Best visited early, before the crowds.")
+            elif day == 1 and i == 0:
+                lines.append(f"- **{slot}:** Set off from {origin} after an early breakfast.")
+            else:
+                lines.append(f"- **{slot}:** Enjoy a local rice and curry and relax at the hotel.")
+        for extra in todays[len(slots):]:
+            lines.append(f"- Also worth a stop: {extra}.")
+        lines.append("")
+    lines.append("*Tip: carry water, sunscreen and a light rain jacket. Don't forget your camera!*")
+    return "\n".join(lines)
+
+
+def gemini_generate(body):
+    """POST /v1beta/models/{model}:generateContent -> one candidate with usage."""
+    prompt = "\n".join(part.get("text", "") for content in body.get("contents", [])
+                       for part in content.get("parts", []))
+    schema = (body.get("generationConfig") or {}).get("responseJsonSchema")
+    if schema:
+        text = json.dumps(_structured(schema.get("title"), prompt))
+    else:
+        text = _itinerary(prompt)
+    return {
+        "candidates": [{
+            "content": {"role": "model", "parts": [{"text": text}]},
+            "finishReason": "STOP",
+            "index": 0
+        }],
+        "usageMetadata": {
+            "promptTokenCount": len(prompt) // 4,
+            "candidatesTokenCount": len(text) // 4,
+            "totalTokenCount": (len(prompt) + len(text)) // 4
+        },
+        "modelVersion": "synthetic"
+    }
@@ -1,24 +1,60 @@
 # main.py
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from langgraph.graph import StateGraph, END
+import os
+import json
+import time
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import Optional, List
+from fastapi import FastAPI, HTTPException, Header, Response
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, Field
 import uvicorn
 
-# Import our graph components
-from nodes.graph_state import GraphState
-from nodes.guardrail import input_guardrail_node
-from nodes.extractor import extract_locations_node
-from nodes.geocoder import geocode_locations_node
-from nodes.router import get_route_node
-from nodes.attractions import get_attractions_node
-from nodes.ranker import rank_attractions_node
-from nodes.itinerary_builder import build_itinerary_node  # <-- Added this import
+# Import our graph
+from nodes.retry import request_budget, retry_stats, BudgetExceeded, REQUEST_BUDGET_S
+from nodes.plan_cache import plan_cache_stats
+from nodes.speculation import speculate, speculation_stats
+from nodes.route_store import release_route, encoded_route
+from nodes.response import public_state, route_options, build_response
+from nodes.batch import run_batch, batch_summary, BATCH_MAX_CONCURRENCY
+from nodes.singleflight import singleflight_stats
+from nodes.trip_flight import plan_shared
+from nodes.telemetry import log, trace, render_metrics, TRIP_SECONDS
+from nodes.http_pool import aclose_clients, close_sessions
+from nodes import tools
+
+# Build the graph and the provider clients in the background right after
+# startup, so the port opens at once and the first trip doesn't pay for
+# them either. PROVIDER_WARMUP=0 leaves everything to first use.
+PROVIDER_WARMUP = os.getenv("PROVIDER_WARMUP", "1") == "1"
 
 # --- 1. Initialize FastAPI ---
+
+
+def warm_up():
+    started = time.perf_counter()
+    get_graph()
+    tools.warm_up()
+    log.info(f"   > Warm-up done in {time.perf_counter() - started:.2f}s")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    warming = asyncio.create_task(asyncio.to_thread(warm_up)) if PROVIDER_WARMUP else None
+    yield
+    if warming is not None and not warming.done():
+        warming.cancel()
+    # Close the kept-alive provider connections (nodes/http_pool.py).
+    await aclose_clients()
+    close_sessions()
+
+
 app = FastAPI(
     title="AI Trip Planner API",
     description="Backend API for the Sri Lanka Travel Agent",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # --- 2. Define Request Model ---
@@ -26,78 +62,225 @@ app = FastAPI(
 
 class TripRequest(BaseModel):
     query: str
-
-# --- 3. Build the LangGraph Workflow ---
+    # Skip the plan cache and plan afresh (the new plan replaces the cached one).
+    bypass_cache: bool = False
+    # Also return the route as a simplified Google-encoded polyline, for
+    # drawing the map. route_tolerance_m (metres) or route_zoom (Web
+    # Mercator zoom, one-pixel tolerance) pick the simplification.
+    include_route: bool = False
+    route_tolerance_m: Optional[float] = Field(default=None, ge=0)
+    route_zoom: Optional[int] = Field(default=None, ge=0, le=22)
 
 
-def decide_next_step(state: GraphState):
-    decision = state.get("guardrail_decision")
-    if decision == "valid":
-        return "extract_locations"
-    else:
-        return END
+class BatchTripItem(TripRequest):
+    # Echoed back on the item's result line.
+    id: Optional[str] = None
 
 
-workflow = StateGraph(GraphState)
+class BatchTripRequest(BaseModel):
+    trips: List[BatchTripItem]
+    # Trips planned at once (default BATCH_CONCURRENCY).
+    concurrency: Optional[int] = Field(default=None, ge=1, le=BATCH_MAX_CONCURRENCY)
 
-# Add Nodes
-workflow.add_node("guardrail", input_guardrail_node)
-workflow.add_node("extract_locations", extract_locations_node)
-workflow.add_node("geocode_locations", geocode_locations_node)
-workflow.add_node("get_route", get_route_node)
-workflow.add_node("get_attractions", get_attractions_node)
-workflow.add_node("rank_attractions", rank_attractions_node)
-workflow.add_node("build_itinerary", build_itinerary_node)  # <-- Added Node
+# --- 3. Build the LangGraph Workflow ---
+# Every node has a sync and an async implementation; the endpoint uses
+# ainvoke() so a trip never blocks the event loop. Compiled on first use
+# (or by the warm-up), not at import; so is LangGraph itself.
+_graph = None
+_graph_lock = threading.Lock()
 
-# Define Flow
-workflow.set_entry_point("guardrail")
 
-workflow.add_conditional_edges(
-    "guardrail",
-    decide_next_step,
-    {
-        "extract_locations": "extract_locations",
-        END: END
-    }
-)
+def get_graph():
+    global _graph
+    with _graph_lock:
+        if _graph is None:
+            from nodes.workflow import build_graph
+            _graph = build_graph()
+        return _graph
 
-workflow.add_edge("extract_locations", "geocode_locations")
-workflow.add_edge("geocode_locations", "get_route")
-workflow.add_edge("get_route", "get_attractions")
-workflow.add_edge("get_attractions", "rank_attractions")
-# <-- Connect Ranker to Builder
-workflow.add_edge("rank_attractions", "build_itinerary")
-# <-- End after Builder
-workflow.add_edge("build_itinerary", END)
 
-# Compile the graph
-app_graph = workflow.compile()
+def __getattr__(name):
+    # `from main import app_graph` still works.
+    if name == "app_graph":
+        return get_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# --- 4. Define the API Endpoint ---
+# --- 4. Define the API Endpoints ---
 
 
 @app.post("/plan-trip")
-async def plan_trip(request: TripRequest):
+async def plan_trip(request: TripRequest, response: Response,
+                    x_request_id: Optional[str] = Header(default=None)):
     """
     Main endpoint: Receives query, orchestrates AI agents, returns itinerary.
+    The trace ID (X-Request-ID if given) is sent back as X-Trace-ID and
+    tags every log line of the trip.
+    """
+    started, outcome = time.perf_counter(), "error"
+    with trace(x_request_id) as trace_id:
+        response.headers["X-Trace-ID"] = trace_id
+        log.info(f"📨 Request received: {request.query}")
+        inputs = {"original_query": request.query, "bypass_cache": request.bypass_cache}
+
+        try:
+            # Every trip either finishes or fails within REQUEST_BUDGET_S;
+            # retries inside the graph stop early once the budget is spent.
+            # With SPECULATIVE=1, geocoding/routing start before the guardrail verdict.
+            # Identical trips in flight at once share one run (nodes/trip_flight.py).
+            with request_budget(REQUEST_BUDGET_S):
+                final_state = await asyncio.wait_for(
+                    plan_shared(get_graph(), inputs, speculative=True), timeout=REQUEST_BUDGET_S)
+
+            result = await build_response(final_state, request)
+            release_route(final_state.get("route_handle"))
+            outcome = "ok"
+            return result
+
+        except (asyncio.TimeoutError, BudgetExceeded):
+            outcome = "timeout"
+            log.error(f"❌ Request exceeded its {REQUEST_BUDGET_S}s budget.")
+            raise HTTPException(status_code=504, detail="Trip planning took too long. Please try again.",
+                                headers={"X-Trace-ID": trace_id})
+        except Exception as e:
+            log.exception(f"❌ Critical Error: {e}")
+            raise HTTPException(status_code=500, detail=str(e), headers={"X-Trace-ID": trace_id})
+        finally:
+            TRIP_SECONDS.observe(time.perf_counter() - started, endpoint="plan-trip", outcome=outcome)
+
+
+async def _stream_trip(query, bypass_cache=False, route_options=None, trace_id=None):
+    """
+    Runs the graph and yields NDJSON events as they happen:
+      {"event": "node", "node": ..., "data": {...partial state...}}
+      {"event": "token", "text": ...}      (itinerary, as it is written)
+      {"event": "reset"}                   (discard the tokens so far: the LLM
+                                            failed and the offline itinerary follows)
+      {"event": "route", "route": {...}}   (with route_options, at the end)
+      {"event": "done"} or {"event": "error", "detail": ...}
     """
-    print(f"📨 Request received: {request.query}")
-    inputs = {"original_query": request.query}
+    queue = asyncio.Queue()
+    config = {"configurable": {
+        "token_sink": lambda text: queue.put_nowait({"event": "token", "text": text}),
+        "token_reset": lambda: queue.put_nowait({"event": "reset"})
+    }}
 
+    async def run():
+        async def consume():
+            inputs = {"original_query": query, "bypass_cache": bypass_cache}
+            route_handle = None
+            try:
+                async for update in get_graph().astream(inputs, config=config, stream_mode="updates"):
+                    for node, partial in update.items():
+                        route_handle = (partial or {}).get("route_handle") or route_handle
+                        queue.put_nowait({"event": "node", "node": node,
+                                          "data": public_state(partial or {})})
+                if route_options is not None:
+                    route = await asyncio.to_thread(encoded_route, route_handle, **route_options)
+                    queue.put_nowait({"event": "route", "route": route})
+            finally:
+                release_route(route_handle)
+        started, outcome = time.perf_counter(), "error"
+        try:
+            with trace(trace_id), request_budget(REQUEST_BUDGET_S), speculate(query):
+                await asyncio.wait_for(consume(), timeout=REQUEST_BUDGET_S)
+            outcome = "ok"
+            queue.put_nowait({"event": "done"})
+        except (asyncio.TimeoutError, BudgetExceeded):
+            outcome = "timeout"
+            log.error(f"❌ Request exceeded its {REQUEST_BUDGET_S}s budget.")
+            queue.put_nowait({"event": "error",
+                              "detail": "Trip planning took too long. Please try again."})
+        except Exception as e:
+            log.exception(f"❌ Critical Error: {e}")
+            queue.put_nowait({"event": "error", "detail": str(e)})
+        finally:
+            TRIP_SECONDS.observe(time.perf_counter() - started,
+                                 endpoint="plan-trip/stream", outcome=outcome)
+            queue.put_nowait(None)
+
+    task = asyncio.create_task(run())
     try:
-        final_state = app_graph.invoke(inputs)
+        while (event := await queue.get()) is not None:
+            yield json.dumps(event, default=str) + "\n"
+    finally:
+        # Client went away (or we finished): stop any work still running.
+        task.cancel()
+
+
+@app.post("/plan-trip/stream")
+async def plan_trip_stream(request: TripRequest,
+                           x_request_id: Optional[str] = Header(default=None)):
+    """
+    Streaming variant of /plan-trip: one NDJSON line per finished node,
+    then the itinerary token by token. A {"event": "reset"} line means the
+    tokens received so far are void (the LLM failed midway) and the
+    offline itinerary's tokens follow.
+    """
+    with trace(x_request_id) as trace_id:
+        log.info(f"📨 Streaming request received: {request.query}")
+    return StreamingResponse(_stream_trip(request.query, request.bypass_cache,
+                                          route_options(request), trace_id),
+                             media_type="application/x-ndjson",
+                             headers={"X-Trace-ID": trace_id})
+
+
+async def _stream_batch(request, trace_id):
+    """NDJSON: one line per trip as it finishes, then a closing summary line."""
+    started_at, flights_before = time.monotonic(), singleflight_stats()
+    ok = failed = 0
+    items = (trip.model_dump() for trip in request.trips)
+    async for record in run_batch(get_graph(), items, request.concurrency, trace_id):
+        if record["status"] == "ok":
+            ok += 1
+        else:
+            failed += 1
+        yield json.dumps(record, default=str) + "\n"
+    summary = batch_summary(ok, failed, started_at, flights_before)
+    yield json.dumps({"status": "done", **summary}) + "\n"
+
+
+@app.post("/plan-trips")
+async def plan_trips(request: BatchTripRequest,
+                     x_request_id: Optional[str] = Header(default=None)):
+    """
+    Batch variant of /plan-trip: plans every trip concurrently and streams
+    NDJSON results as they complete. A failed trip gets an error line of
+    its own; the rest carry on. Trip i is traced as "<X-Trace-ID>-<i>".
+    """
+    with trace(x_request_id) as trace_id:
+        log.info(f"📨 Batch request received: {len(request.trips)} trips")
+    return StreamingResponse(_stream_batch(request, trace_id), media_type="application/x-ndjson",
+                             headers={"X-Trace-ID": trace_id})
+
+
+@app.get("/plan-cache/stats")
+async def plan_cache_statistics():
+    """Hit/miss counters and hit rate of the full-plan cache."""
+    return plan_cache_stats()
+
+
+@app.get("/retry/stats")
+async def retry_statistics():
+    """Retries, seconds spent backing off, and calls given up on (all providers)."""
+    return retry_stats()
+
+
+@app.get("/singleflight/stats")
+async def singleflight_statistics():
+    """Calls made, coalesced into one in flight, and abandoned, per group."""
+    return singleflight_stats()
+
 
-        # Clean up heavy data to reduce payload size for the frontend
-        keys_to_remove = ["route_geojson", "route_path_coords", "attractions"]
-        for key in keys_to_remove:
-            if key in final_state:
-                del final_state[key]
+@app.get("/speculation/stats")
+async def speculation_statistics():
+    """Latency saved and external calls wasted by speculative execution."""
+    return speculation_stats()
 
-        return final_state
 
-    except Exception as e:
-        print(f"❌ Critical Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+@app.get("/metrics")
+async def metrics():
+    """Node, external call, cache, retry and token metrics in the Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=7860)
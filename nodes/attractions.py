@@ -1,22 +1,119 @@
 # nodes/attractions.py
-import requests
-import traceback
+import os
+import asyncio
 import math
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
 from .graph_state import GraphState
 from .tools import GEOAPIFY_API_KEY
+from .cache import TTLCache, MISS, CACHE_DB_PATH
+from .geo import haversine_km, bbox_around, sample_route, distance_to_route_km
+from .poi_index import POIIndex
+from .route_store import get_route
+from .ratelimit import get_limiter
+from .singleflight import get_flight
+from .telemetry import external_call, log
+from .http_pool import get_session, get_async_client, request_timeout, async_timeout
 
-GEOAPIFY_URL = "https://api.geoapify.com/v2/places"
+GEOAPIFY_URL = os.getenv("GEOAPIFY_URL", "https://api.geoapify.com/v2/places")
+
+# --- Fan-out Settings ---
+# Max Geoapify calls in flight for a single node run, and the overall
+# deadline (seconds) for all of them. Late points are dropped, not awaited.
+GEOAPIFY_MAX_CONCURRENCY = int(os.getenv("GEOAPIFY_MAX_CONCURRENCY", "10"))
+GEOAPIFY_TIMEOUT_S = float(os.getenv("GEOAPIFY_TIMEOUT_S", "10"))
+ATTRACTIONS_DEADLINE_S = float(os.getenv("ATTRACTIONS_DEADLINE_S", "15"))
+
+SEARCH_RADIUS_KM = 10
+
+# --- Route Sampling ---
+# Stopovers sit at 10%, 20%, ... 90% of the route's length, or every
+# ROUTE_SAMPLE_SPACING_KM km when that is set.
+STOPOVER_FRACTIONS = [i / 10 for i in range(1, 10)]
+ROUTE_SAMPLE_SPACING_KM = float(os.getenv("ROUTE_SAMPLE_SPACING_KM", "0"))
+
+# --- Backend ---
+# "geoapify" queries the live API (through the tile cache below);
+# "local" answers from an offline index built with `python -m nodes.poi_index`.
+ATTRACTIONS_BACKEND = os.getenv("ATTRACTIONS_BACKEND", "geoapify")
+POI_INDEX_PATH = os.getenv("POI_INDEX_PATH", "data/poi_index")
+
+_poi_index = None
+_poi_index_lock = threading.Lock()
+
+# --- Tile Cache ---
+# The map is cut into TILE_DEG x TILE_DEG grid cells. Each cell's tourism
+# features are fetched once (rect filter) and cached; a 10 km circle is
+# then answered locally from the 2-4 cells it overlaps. A cell with
+# TILE_LIMIT or more features (Colombo, Kandy) comes back truncated in no
+# particular order, so it is cached as TRUNCATED instead, and circles
+# touching it go to the live per-point query (nearest first). So do
+# circles touching a cell whose fetch failed: answering from the other
+# cells would silently drop that cell's places.
+TILE_CACHE_ENABLED = os.getenv("ATTRACTIONS_TILE_CACHE", "1") == "1"
+TILE_DEG = float(os.getenv("ATTRACTIONS_TILE_DEG", "0.2"))
+TILE_LIMIT = int(os.getenv("ATTRACTIONS_TILE_LIMIT", "500"))
+TRUNCATED = "truncated"
+
+tile_cache = TTLCache(
+    "places_tiles",
+    maxsize=int(os.getenv("ATTRACTIONS_TILE_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("ATTRACTIONS_TILE_TTL_S", str(24 * 3600))),
+    db_path=CACHE_DB_PATH or None
+)
 
 
 def fetch_places_for_point(lat, lon, limit=5):
     """
-    Helper function to call Geoapify for a specific point.
+    Returns Geoapify-style {"features": [...]} for the 10km circle around
+    a point, nearest first. Served from the tile cache when it is enabled.
+    """
+    if ATTRACTIONS_BACKEND == "local":
+        return _places_from_index(lat, lon, limit)
+    if TILE_CACHE_ENABLED:
+        return _places_from_tiles(lat, lon, limit)
+    return _fetch_places_live(lat, lon, limit)
+
+
+async def afetch_places_for_point(client, lat, lon, limit=5):
+    """Async fetch_places_for_point, sending requests through `client`."""
+    if ATTRACTIONS_BACKEND == "local":
+        return _places_from_index(lat, lon, limit)
+    if TILE_CACHE_ENABLED:
+        return await _aplaces_from_tiles(client, lat, lon, limit)
+    return await _afetch_places_live(client, lat, lon, limit)
+
+
+def get_poi_index():
+    """Opens the offline POI index on first use."""
+    global _poi_index
+    with _poi_index_lock:
+        if _poi_index is None:
+            _poi_index = POIIndex(POI_INDEX_PATH)
+            log.info(f"   > Loaded offline POI index ({len(_poi_index)} places)")
+        return _poi_index
+
+
+def _places_from_index(lat, lon, limit=5):
+    try:
+        index = get_poi_index()
+        idx, _ = index.query_radius(lat, lon, SEARCH_RADIUS_KM, limit=limit)
+        return {"features": index.features(idx)}
+    except Exception as e:
+        log.error(f"   > Offline index error for point {lat},{lon}: {e}")
+        return {}
+
+
+def _point_query(lat, lon, limit):
+    """
+    Helper to build the Geoapify query for a specific point.
     Uses the KNOWN WORKING query structure (V10).
     """
 
     # --- *** THIS IS THE KNOWN-GOOD QUERY *** ---
     # We are using the query structure that we PROVED works.
-    querystring = {
+    return {
         "categories": "tourism",  # Use the broad, single category that works
         "filter": f"circle:{lon},{lat},10000",  # 10km radius
         "bias": f"proximity:{lon},{lat}",      # Keep the bias param
@@ -25,93 +122,494 @@ def fetch_places_for_point(lat, lon, limit=5):
     }
     # --- *** END OF QUERY *** ---
 
+
+def _fetch_places_live(lat, lon, limit=5):
+    """Calls Geoapify for a specific point."""
     try:
-        response = requests.get(GEOAPIFY_URL, params=querystring)
-        response.raise_for_status()
+        get_limiter("geoapify").acquire()
+        with external_call("geoapify"):
+            response = get_session("geoapify").get(
+                GEOAPIFY_URL, params=_point_query(lat, lon, limit),
+                timeout=request_timeout(GEOAPIFY_TIMEOUT_S))
+            response.raise_for_status()
         return response.json()
     except Exception as e:
         # We'll print the error but continue, so one bad call doesn't stop the whole thing
-        print(f"   > API Error for point {lat},{lon}: {e}")
+        log.error(f"   > API Error for point {lat},{lon}: {e}")
         return {}
 
 
-def get_attractions_node(state: GraphState):
+async def _afetch_places_live(client, lat, lon, limit=5):
+    try:
+        await get_limiter("geoapify").aacquire()
+        with external_call("geoapify"):
+            response = await client.get(GEOAPIFY_URL, params=_point_query(lat, lon, limit),
+                                        timeout=async_timeout(GEOAPIFY_TIMEOUT_S))
+            response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        log.error(f"   > API Error for point {lat},{lon}: {e}")
+        return {}
+
+
+def _tiles_for_circle(lat, lon, radius_km):
+    """Grid cells (row, col) overlapping the circle's bounding box."""
+    min_lat, min_lon, max_lat, max_lon = bbox_around(lat, lon, radius_km)
+    rows = range(math.floor(min_lat / TILE_DEG), math.floor(max_lat / TILE_DEG) + 1)
+    cols = range(math.floor(min_lon / TILE_DEG), math.floor(max_lon / TILE_DEG) + 1)
+    return [(row, col) for row in rows for col in cols]
+
+
+def _tile_key(row, col):
+    # v2: entries from before truncation was detected may be incomplete.
+    return f"tourism:v2:{TILE_DEG}:{row}:{col}"
+
+
+def _tile_query(row, col):
+    min_lat, min_lon = row * TILE_DEG, col * TILE_DEG
+    max_lat, max_lon = min_lat + TILE_DEG, min_lon + TILE_DEG
+    return {
+        "categories": "tourism",
+        "filter": f"rect:{min_lon},{min_lat},{max_lon},{max_lat}",
+        "limit": TILE_LIMIT,
+        "apiKey": GEOAPIFY_API_KEY
+    }
+
+
+def _tile_features(data, row, col):
+    """The cell's compact features, or TRUNCATED if Geoapify cut the list short."""
+    if len(data.get("features", [])) >= TILE_LIMIT:
+        log.info(f"   > Tile {row},{col} has {TILE_LIMIT}+ places; using point queries there.")
+        return TRUNCATED
+    return _compact_features(data)
+
+
+def _compact_features(data):
+    """Keep only what process_results and the distance filter need."""
+    features = []
+    for place in data.get("features", []):
+        props = place.get("properties", {})
+        if props.get("lat") is None or props.get("lon") is None:
+            continue
+        features.append({"properties": {
+            "name": props.get("name"),
+            "categories": props.get("categories", []),
+            "lat": props["lat"],
+            "lon": props["lon"]
+        }})
+    return features
+
+
+def _fetch_tile(row, col):
     """
-    Node 4: Fetches attractions using "Route Percentile Sampling" (10% intervals).
-    (Version 17: Correct API query + 10% Sampling)
+    Returns the compact feature list for one grid cell, TRUNCATED if the
+    cell is too dense to fetch whole, or None if the call failed (failures
+    are not cached).
     """
-    print("--- 4. EXECUTING: get_attractions_node (10% ROUTE SAMPLING) ---")
+    key = _tile_key(row, col)
+    cached = tile_cache.get(key)
+    if cached is not MISS:
+        return cached
+    # Neighbouring search points (and concurrent trips) share tiles.
+    return get_flight("tile").do(key, lambda: _fetch_tile_live(row, col, key))
+
+
+def _fetch_tile_live(row, col, key):
+    try:
+        get_limiter("geoapify").acquire()
+        with external_call("geoapify"):
+            response = get_session("geoapify").get(
+                GEOAPIFY_URL, params=_tile_query(row, col),
+                timeout=request_timeout(GEOAPIFY_TIMEOUT_S))
+            response.raise_for_status()
+        features = _tile_features(response.json(), row, col)
+    except Exception as e:
+        log.error(f"   > API Error for tile {row},{col}: {e}")
+        return None
+
+    tile_cache.set(key, features)
+    return features
+
+
+async def _afetch_tile(client, row, col):
+    key = _tile_key(row, col)
+    cached = tile_cache.get(key)
+    if cached is not MISS:
+        return cached
+    return await get_flight("tile").ado(key, lambda: _afetch_tile_live(client, row, col, key))
+
+
+async def _afetch_tile_live(client, row, col, key):
+    try:
+        await get_limiter("geoapify").aacquire()
+        with external_call("geoapify"):
+            response = await client.get(GEOAPIFY_URL, params=_tile_query(row, col),
+                                        timeout=async_timeout(GEOAPIFY_TIMEOUT_S))
+            response.raise_for_status()
+        features = _tile_features(response.json(), row, col)
+    except Exception as e:
+        log.error(f"   > API Error for tile {row},{col}: {e}")
+        return None
+
+    tile_cache.set(key, features)
+    return features
+
+
+def _nearest_in_tiles(lat, lon, limit, tiles):
+    """Exact radius filter over the covering tiles' features, nearest first."""
+    candidates = []
+    seen = set()
+    for features in tiles:
+        for place in features:
+            props = place["properties"]
+            ident = (props["name"], props["lat"], props["lon"])
+            if ident in seen:
+                continue
+            seen.add(ident)
+            distance = haversine_km(lat, lon, props["lat"], props["lon"])
+            if distance <= SEARCH_RADIUS_KM:
+                candidates.append((distance, place))
+
+    # Nearest first, like the proximity bias of the live query.
+    candidates.sort(key=lambda c: c[0])
+    return {"features": [place for _, place in candidates[:limit]]}
+
+
+def _needs_live_query(tiles):
+    return any(features is None or features == TRUNCATED for features in tiles)
+
+
+def _places_from_tiles(lat, lon, limit=5):
+    """
+    Answers a point search from the covering tiles, fetching only the
+    missing ones, then applies the exact radius filter locally. Falls back
+    to the live query if any covering tile is truncated or failed.
+    """
+    tiles = [_fetch_tile(row, col)
+             for row, col in _tiles_for_circle(lat, lon, SEARCH_RADIUS_KM)]
+    if _needs_live_query(tiles):
+        return _fetch_places_live(lat, lon, limit)
+    return _nearest_in_tiles(lat, lon, limit, tiles)
+
+
+async def _aplaces_from_tiles(client, lat, lon, limit=5):
+    tiles = await asyncio.gather(*[
+        _afetch_tile(client, row, col)
+        for row, col in _tiles_for_circle(lat, lon, SEARCH_RADIUS_KM)])
+    if _needs_live_query(tiles):
+        return await _afetch_places_live(client, lat, lon, limit)
+    return _nearest_in_tiles(lat, lon, limit, tiles)
+
+
+def fetch_all_points(search_points):
+    """
+    Calls fetch_places_for_point for every search point through a bounded
+    worker pool. Returns the results in the same order as search_points;
+    points that fail or miss the deadline come back as {}.
+    """
+    if not search_points:
+        return []
+
+    workers = max(1, min(GEOAPIFY_MAX_CONCURRENCY, len(search_points)))
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = []
+    for search_point in search_points:
+        log.info(f"   > Fetching places {search_point['tag']}...")
+        # Get 5 places per stopover, 15 for the (more important) destination
+        limit = 15 if "Destination" in search_point["tag"] else 5
+        # Each worker runs in a copy of our context, keeping the trace and node.
+        futures.append(executor.submit(
+            contextvars.copy_context().run,
+            fetch_places_for_point, search_point["lat"], search_point["lon"], limit=limit))
+
+    done, not_done = wait(futures, timeout=ATTRACTIONS_DEADLINE_S)
+    # Don't block on stragglers; their results are simply discarded.
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    results = []
+    for future, search_point in zip(futures, search_points):
+        if future in not_done:
+            log.info(f"   > Deadline hit, skipping {search_point['tag']}")
+            results.append({})
+        else:
+            results.append(future.result())
+    return results
+
+
+async def afetch_all_points(search_points):
+    """
+    Async fetch_all_points: the shared Geoapify client (nodes/http_pool.py),
+    at most GEOAPIFY_MAX_CONCURRENCY points in flight, same deadline and
+    ordering.
+    """
+    if not search_points:
+        return []
+
+    semaphore = asyncio.Semaphore(max(1, GEOAPIFY_MAX_CONCURRENCY))
+    # Process-wide, not per node run: a tile flight this run leads may
+    # still be awaited by other trips after the run has returned.
+    client = get_async_client("geoapify")
+
+    async def fetch(search_point):
+        # Get 5 places per stopover, 15 for the (more important) destination
+        limit = 15 if "Destination" in search_point["tag"] else 5
+        async with semaphore:
+            return await afetch_places_for_point(
+                client, search_point["lat"], search_point["lon"], limit=limit)
+
+    tasks = []
+    for search_point in search_points:
+        log.info(f"   > Fetching places {search_point['tag']}...")
+        tasks.append(asyncio.create_task(fetch(search_point)))
 
+    _, pending = await asyncio.wait(tasks, timeout=ATTRACTIONS_DEADLINE_S)
+    for task in pending:
+        task.cancel()
+
+    results = []
+    for task, search_point in zip(tasks, search_points):
+        if task in pending:
+            log.info(f"   > Deadline hit, skipping {search_point['tag']}")
+            results.append({})
+        else:
+            results.append(task.result())
+    return results
+
+
+def _destination_point(state):
+    """The destination search point, or None without destination coords."""
     destination_coords = state.get("destination_coords")
-    route_path = state.get("route_path_coords")  # List of [lon, lat]
+    if not destination_coords:
+        return None
+    dest_lat, dest_lon = destination_coords
+    return {
+        "lat": dest_lat,
+        "lon": dest_lon,
+        "tag": "Destination (100% mark)"
+    }
+
 
+def _route_path(state, warn=True):
+    """
+    The stored route as an (N, 2) [lon, lat] array, or just the destination
+    when the route is missing or too short. None without destination coords.
+    """
+    destination_coords = state.get("destination_coords")
     if not destination_coords:
-        return {}
-    if not route_path or len(route_path) < 10:
-        print("   > ERROR: Route path is missing or too short. Defaulting to destination-only search.")
+        return None
+    handle = state.get("route_handle")
+    route_path = get_route(handle)
+    if handle and route_path is None:
+        # A handle is only dropped by release_route() (or the leak sweep), so
+        # this trip's route went away while it was still running: a bug.
+        log.error(f"   > ERROR: Route handle {handle} no longer resolves; "
+                  "measuring from the destination instead.")
+    if route_path is None or len(route_path) < 10:
+        if warn:
+            log.error("   > ERROR: Route path is missing or too short. Defaulting to destination-only search.")
         # Fallback: just search the destination
         route_path = [[destination_coords[1], destination_coords[0]]]
+    return route_path
 
-    all_places_to_search = []
 
-    # 1. Get the 10 sample points
-    path_len = len(route_path)
+def _plan_stopover_points(state):
+    """
+    Returns (route_path, stopover_points), or (None, None) when there is
+    no destination to search around.
+    """
+    route_path = _route_path(state)
+    if route_path is None:
+        return None, None
 
-    # Get 10%, 20%, ..., 90% marks
-    for i in range(1, 10):  # Loops 1, 2, ... 9
-        percent = i * 10
-        idx = int(path_len * (percent / 100.0))
+    stopover_points = []
 
-        # Ensure index is valid
-        if idx >= path_len:
-            idx = path_len - 1
+    # Stopover sample points, spaced by true distance along the route
+    # (ORS points are dense in towns and sparse on highways).
+    if ROUTE_SAMPLE_SPACING_KM > 0:
+        points, distances = sample_route(route_path, spacing_km=ROUTE_SAMPLE_SPACING_KM)
+    else:
+        points, distances = sample_route(route_path, fractions=STOPOVER_FRACTIONS)
 
-        point = route_path[idx]
-        lon, lat = point[0], point[1]
-        all_places_to_search.append({
-            "lat": lat,
-            "lon": lon,
-            "tag": f"Stopover (~{percent}% mark)"
+    for (lon, lat), km in zip(points, distances):
+        stopover_points.append({
+            "lat": float(lat),
+            "lon": float(lon),
+            "tag": f"Stopover (~{km:.0f} km from origin)"
         })
 
+    return route_path, stopover_points
+
+
+def _plan_search_points(state):
+    """
+    Returns (route_path, search_points) for the node, or (None, None) when
+    there is no destination to search around.
+    """
+    route_path, stopover_points = _plan_stopover_points(state)
+    if stopover_points is None:
+        return None, None
     # Add the final destination (100% mark)
-    dest_lat, dest_lon = destination_coords
-    all_places_to_search.append({
-        "lat": dest_lat,
-        "lon": dest_lon,
-        "tag": "Destination (100% mark)"
-    })
+    return route_path, stopover_points + [_destination_point(state)]
+
 
-    # 2. Call the API for all 10 points and merge
+def _merge_places(results, search_points, route_path):
+    """
+    Merges per-point API results in search order (first name wins) and
+    annotates each place with its distance to and position along the route.
+    """
     combined_places = []
-    seen_names = set()
+    seen_names = {}
 
     def process_results(data, tag):
         if "features" in data and isinstance(data["features"], list):
             for place in data["features"]:
                 props = place.get("properties", {})
                 name = props.get("name")
-                if name and name not in seen_names:
-                    seen_names.add(name)
+                if name and name in seen_names:
+                    # Found from several search points: a cheap popularity signal.
+                    seen_names[name]["mentions"] += 1
+                elif name:
                     all_kinds = ", ".join(props.get("categories", ["N/A"]))
-                    combined_places.append({
+                    seen_names[name] = {
                         "name": name,
                         "kinds": all_kinds,
-                        "location_context": tag
-                    })
+                        "location_context": tag,
+                        "lat": props.get("lat"),
+                        "lon": props.get("lon"),
+                        "mentions": 1
+                    }
+                    combined_places.append(seen_names[name])
 
-    # Loop through our 10 search points
-    for search_point in all_places_to_search:
-        print(f"   > Fetching places {search_point['tag']}...")
-        # Get 5 places per stopover, 15 for the (more important) destination
-        limit = 15 if "Destination" in search_point["tag"] else 5
-        api_data = fetch_places_for_point(
-            search_point["lat"], search_point["lon"], limit=limit)
+    for api_data, search_point in zip(results, search_points):
         process_results(api_data, search_point['tag'])
 
-    print(
+    # How far each place is from the route, and how far along it.
+    located = [p for p in combined_places if p["lat"] is not None and p["lon"] is not None]
+    if located:
+        distance, along = distance_to_route_km(
+            [[p["lon"], p["lat"]] for p in located], route_path)
+        for place, d, a in zip(located, distance, along):
+            place["distance_to_route_km"] = round(float(d), 2)
+            place["route_km"] = round(float(a), 1)
+
+    log.info(
         f"   > Found {len(combined_places)} total unique places to be ranked.")
+    if ATTRACTIONS_BACKEND != "local" and TILE_CACHE_ENABLED:
+        stats = tile_cache.stats()
+        log.info(f"   > Tile cache: {stats['hits']} hits, {stats['misses']} misses")
+
+    return combined_places
+
+
+def get_attractions_node(state: GraphState):
+    """
+    Node 4: Fetches attractions using "Route Distance Sampling" (10% intervals
+    of the route's true length, or a fixed km spacing).
+    """
+    log.info("--- 4. EXECUTING: get_attractions_node (ROUTE DISTANCE SAMPLING) ---")
+
+    route_path, search_points = _plan_search_points(state)
+    if search_points is None:
+        return {}
+
+    # Fetch all 10 search points concurrently, then merge in the original
+    # order so the dedup (first name wins) stays the same as before.
+    results = fetch_all_points(search_points)
+
+    return {
+        "attractions": _merge_places(results, search_points, route_path)
+    }
+
+
+async def aget_attractions_node(state: GraphState):
+    """
+    Node 4 (async): same as get_attractions_node over an async HTTP client.
+    """
+    log.info("--- 4. EXECUTING: get_attractions_node (ROUTE DISTANCE SAMPLING, ASYNC) ---")
+
+    route_path, search_points = _plan_search_points(state)
+    if search_points is None:
+        return {}
+
+    results = await afetch_all_points(search_points)
 
     return {
-        "attractions": combined_places
+        "attractions": _merge_places(results, search_points, route_path)
     }
+
+
+# --- Split Nodes (parallel graph) ---
+# The destination only needs destination_coords, so it is searched while
+# the route is still being fetched; stopovers follow once the route is in.
+# merge_attractions_node joins both in the same order as the single node
+# above, so the merged list is identical.
+
+
+def get_destination_attractions_node(state: GraphState):
+    """
+    Node 4a: Fetches attractions around the destination (no route needed).
+    """
+    log.info("--- 4a. EXECUTING: get_destination_attractions_node ---")
+    point = _destination_point(state)
+    if point is None:
+        return {}
+    return {"destination_search": {"points": [point], "results": fetch_all_points([point])}}
+
+
+async def aget_destination_attractions_node(state: GraphState):
+    """
+    Node 4a (async): same as get_destination_attractions_node.
+    """
+    log.info("--- 4a. EXECUTING: get_destination_attractions_node (ASYNC) ---")
+    point = _destination_point(state)
+    if point is None:
+        return {}
+    return {"destination_search": {"points": [point], "results": await afetch_all_points([point])}}
+
+
+def get_stopover_attractions_node(state: GraphState):
+    """
+    Node 4b: Fetches attractions at the route sample points.
+    """
+    log.info("--- 4b. EXECUTING: get_stopover_attractions_node (ROUTE DISTANCE SAMPLING) ---")
+    _, points = _plan_stopover_points(state)
+    if points is None:
+        return {}
+    return {"stopover_search": {"points": points, "results": fetch_all_points(points)}}
+
+
+async def aget_stopover_attractions_node(state: GraphState):
+    """
+    Node 4b (async): same as get_stopover_attractions_node.
+    """
+    log.info("--- 4b. EXECUTING: get_stopover_attractions_node (ROUTE DISTANCE SAMPLING, ASYNC) ---")
+    _, points = _plan_stopover_points(state)
+    if points is None:
+        return {}
+    return {"stopover_search": {"points": points, "results": await afetch_all_points(points)}}
+
+
+def merge_attractions_node(state: GraphState):
+    """
+    Node 4c: Joins the stopover and destination searches into `attractions`.
+    """
+    log.info("--- 4c. EXECUTING: merge_attractions_node ---")
+    stopovers = state.get("stopover_search")
+    destination = state.get("destination_search")
+    if not stopovers or not destination:
+        return {}
+
+    return {
+        "attractions": _merge_places(
+            stopovers["results"] + destination["results"],
+            stopovers["points"] + destination["points"],
+            _route_path(state, warn=False)),
+        # Raw API responses are no longer needed; keep the state small.
+        "stopover_search": None,
+        "destination_search": None
+    }
+
+
+async def amerge_attractions_node(state: GraphState):
+    """Node 4c (async): merging is local, so this just delegates."""
+    return merge_attractions_node(state)
@@ -0,0 +1,118 @@
+# nodes/batch.py
+"""
+Plans many trips at once, for the nightly precompute of popular routes.
+Used by POST /plan-trips and `python run_workflow.py --batch`.
+
+Trips run BATCH_CONCURRENCY at a time on one event loop. They share the
+process-wide provider limiters (nodes/ratelimit.py), the caches, and the
+single-flight groups (nodes/singleflight.py), so a geocode, route,
+attraction tile or LLM prompt wanted by several trips is fetched once for
+the batch, and duplicate trips are planned once.
+Results come out as trips finish, not in input order; each record carries
+the item's index (and id, if it had one). One trip failing never stops
+the rest.
+"""
+import os
+import time
+import asyncio
+from .retry import request_budget, BudgetExceeded, REQUEST_BUDGET_S
+from .route_store import release_route
+from .response import build_response
+from .singleflight import singleflight_stats
+from .trip_flight import plan_shared
+from .telemetry import trace, new_trace_id, TRIP_SECONDS
+
+# --- Batch Settings ---
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+
+
+async def _plan_one(graph, index, item, trace_prefix):
+    """One batch record for `item` (a dict shaped like TripRequest)."""
+    with trace(f"{trace_prefix}-{index}") as trace_id:
+        started = time.perf_counter()
+        record = await _plan_traced(graph, index, item, trace_id)
+        TRIP_SECONDS.observe(time.perf_counter() - started, endpoint="plan-trips",
+                             outcome=record["status"])
+        return record
+
+
+async def _plan_traced(graph, index, item, trace_id):
+    record = {"index": index, "id": item.get("id"), "trace_id": trace_id}
+    query = item.get("query")
+    if not isinstance(query, str) or not query.strip():
+        return {**record, "status": "error", "detail": "Missing 'query'."}
+
+    inputs = {"original_query": query, "bypass_cache": bool(item.get("bypass_cache"))}
+    state = None
+    try:
+        # Each trip gets its own budget, counted from when it starts running;
+        # duplicates in the batch (or in flight elsewhere) share one run.
+        with request_budget(REQUEST_BUDGET_S):
+            state = await asyncio.wait_for(plan_shared(graph, inputs), timeout=REQUEST_BUDGET_S)
+        return {**record, "status": "ok", "result": await build_response(state, item)}
+    except (asyncio.TimeoutError, BudgetExceeded):
+        return {**record, "status": "error",
+                "detail": f"Trip planning took longer than {REQUEST_BUDGET_S}s."}
+    except Exception as e:
+        return {**record, "status": "error", "detail": str(e)}
+    finally:
+        if state is not None:
+            release_route(state.get("route_handle"))
+
+
+async def run_batch(graph, items, concurrency=None, trace_prefix=None):
+    """
+    Async generator of batch records, one per item of `items` (any
+    iterable of dicts, consumed lazily), in completion order:
+
+        {"index": 0, "id": ..., "trace_id": ..., "status": "ok", "result": {...}}
+        {"index": 1, "id": ..., "trace_id": ..., "status": "error", "detail": "..."}
+
+    Memory stays bounded by `concurrency`, whatever the batch size. Trip i
+    is traced as "<trace_prefix>-<i>".
+    """
+    concurrency = max(1, min(concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    trace_prefix = trace_prefix or new_trace_id()
+    pending = enumerate(items)
+    results = asyncio.Queue(maxsize=concurrency)
+
+    async def worker():
+        for index, item in pending:  # shared iterator: each item goes to one worker
+            await results.put(await _plan_one(graph, index, item, trace_prefix))
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    finished = asyncio.gather(*workers)
+    get = None
+    try:
+        while True:
+            get = asyncio.ensure_future(results.get())
+            await asyncio.wait({get, finished}, return_when=asyncio.FIRST_COMPLETED)
+            if get.done():
+                yield get.result()
+                continue
+            finished.result()  # surfaces a worker crash (not a trip failure)
+            while not results.empty():
+                yield results.get_nowait()
+            return
+    finally:
+        # Also runs when the consumer stops early (e.g. the client hung up).
+        if get is not None:
+            get.cancel()
+        for task in workers:
+            task.cancel()
+
+
+def batch_summary(ok, failed, started_at, flights_before):
+    """Closing record: counts, wall time and what single-flight saved."""
+    flights = singleflight_stats()
+    coalesced = {name: stats["coalesced"] - flights_before.get(name, {}).get("coalesced", 0)
+                 for name, stats in flights.items()}
+    elapsed = time.monotonic() - started_at
+    return {
+        "ok": ok,
+        "failed": failed,
+        "elapsed_s": round(elapsed, 2),
+        "trips_per_s": round((ok + failed) / elapsed, 2) if elapsed > 0 else None,
+        "coalesced_calls": coalesced
+    }
@@ -0,0 +1,146 @@
+# nodes/cache.py
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from .telemetry import register_collector, record_cache_lookup, log
+
+# --- Cache Location ---
+# All on-disk caches share one SQLite file, each in its own namespace.
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(
+    os.getenv("XDG_CACHE_HOME", "/tmp"), "tour_agent"))
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(CACHE_DIR, "cache.sqlite"))
+
+# Returned by TTLCache.get() when a key is absent or expired, so that a
+# cached None (a negative entry) can be told apart from a miss.
+MISS = object()
+
+
+# Every TTLCache, for the /metrics collector at the bottom.
+_caches = []
+
+
+class TTLCache:
+    """
+    In-memory LRU with per-entry TTL, optionally backed by a SQLite file.
+    Values must be JSON-serializable when persistence is enabled.
+    """
+
+    def __init__(self, namespace, maxsize=1024, ttl=None, db_path=None):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._db = None
+        _caches.append(self)
+
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS cache ("
+                    " namespace TEXT, key TEXT, value TEXT, expires_at REAL,"
+                    " PRIMARY KEY (namespace, key))")
+                self._db.commit()
+            except sqlite3.Error as e:
+                log.warning(f"   > WARNING: Cache '{namespace}' running without disk ({e})")
+                self._db = None
+
+    def get(self, key):
+        value = self._get(key)
+        record_cache_lookup(self.namespace, value is not MISS)
+        return value
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+            entry = self._load(key, now)
+            if entry is not None:
+                self._remember(key, *entry)
+                self.hits += 1
+                return entry[1]
+
+            self.misses += 1
+            return MISS
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._store(key, expires_at, value)
+
+    def delete(self, key):
+        """Drops `key` from memory (persisted copies are left to expire)."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries)
+            }
+
+    # --- Internals (called with the lock held) ---
+
+    def _remember(self, key, expires_at, value):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _load(self, key, now):
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key)).fetchone()
+        except sqlite3.Error as e:
+            log.warning(f"   > WARNING: Cache read failed: {e}")
+            return None
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= now:
+            return None
+        return expires_at, json.loads(value)
+
+    def _store(self, key, expires_at, value):
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at)"
+                " VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), expires_at))
+            self._db.commit()
+        except sqlite3.Error as e:
+            log.warning(f"   > WARNING: Cache write failed: {e}")
+
+
+@register_collector
+def _cache_metrics():
+    lines = ["# HELP tour_cache_entries Entries held in memory.",
+             "# TYPE tour_cache_entries gauge"]
+    for cache in list(_caches):
+        lines.append(f'tour_cache_entries{{cache="{cache.namespace}"}} {cache.stats()["size"]}')
+    return lines
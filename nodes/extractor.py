@@ -1,16 +1,13 @@
 # nodes/extractor.py
 from .graph_state import GraphState
-from .tools import structured_llm
+from . import tools
+from .preclassifier import preclassify
+from .models import ExtractedLocations
+from .telemetry import log
 
 
-def extract_locations_node(state: GraphState):
-    """
-    Node 1: Extracts origin, destination, AND duration from the user query.
-    """
-    print("--- 1. EXECUTING: extract_locations_node ---")
-    query = state["original_query"]
-
-    prompt = f"""
+def _build_prompt(query):
+    return f"""
     You are an expert at parsing travel queries.
     Extract the origin city, destination city, and trip duration (in days) from the following query:
     
@@ -19,20 +16,65 @@ def extract_locations_node(state: GraphState):
     If no duration is mentioned, return null for days.
     """
 
+
+def _handle_response(response):
+    log.info(
+        f"   > LLM Extracted: {response.origin} -> {response.destination} ({response.duration_days} days)")
+
+    return {
+        "origin_name": response.origin,
+        "destination_name": response.destination,
+        "trip_duration_days": response.duration_days  # Save to state
+    }
+
+
+def _preclassified(query):
+    """Extraction from the local pre-classifier when it is sure, else None."""
+    outcome = preclassify(query)
+    if outcome is None or outcome["decision"] != "valid":
+        return None
+    log.info("   > Pre-classifier extracted the trip (no LLM call).")
+    return _handle_response(ExtractedLocations(
+        origin=outcome["origin"], destination=outcome["destination"],
+        duration_days=outcome["duration_days"]))
+
+
+def _handle_error(e):
+    log.error(f"   > ERROR in LLM extraction: {e}")
+    return {
+        "origin_name": None,
+        "destination_name": None,
+        "trip_duration_days": None
+    }
+
+
+def extract_locations_node(state: GraphState):
+    """
+    Node 1: Extracts origin, destination, AND duration from the user query.
+    """
+    log.info("--- 1. EXECUTING: extract_locations_node ---")
+    fast = _preclassified(state["original_query"])
+    if fast:
+        return fast
+    prompt = _build_prompt(state["original_query"])
+
+    try:
+        return _handle_response(tools.structured_llm.invoke(prompt))
+    except Exception as e:
+        return _handle_error(e)
+
+
+async def aextract_locations_node(state: GraphState):
+    """
+    Node 1 (async): same as extract_locations_node, awaiting the LLM.
+    """
+    log.info("--- 1. EXECUTING: extract_locations_node (ASYNC) ---")
+    fast = _preclassified(state["original_query"])
+    if fast:
+        return fast
+    prompt = _build_prompt(state["original_query"])
+
     try:
-        response = structured_llm.invoke(prompt)
-        print(
-            f"   > LLM Extracted: {response.origin} -> {response.destination} ({response.duration_days} days)")
-
-        return {
-            "origin_name": response.origin,
-            "destination_name": response.destination,
-            "trip_duration_days": response.duration_days  # Save to state
-        }
+        return _handle_response(await tools.structured_llm.ainvoke(prompt))
     except Exception as e:
-        print(f"   > ERROR in LLM extraction: {e}")
-        return {
-            "origin_name": None,
-            "destination_name": None,
-            "trip_duration_days": None
-        }
+        return _handle_error(e)
@@ -0,0 +1,175 @@
+# nodes/geo.py
+import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = 111.32
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two (lat, lon) points in km."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def bbox_around(lat, lon, radius_km):
+    """(min_lat, min_lon, max_lat, max_lon) of a box enclosing the circle."""
+    dlat = radius_km / KM_PER_DEG_LAT
+    dlon = radius_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+
+# --- Route Utilities (NumPy) ---
+# Paths are ORS-style [[lon, lat], ...]; anything array-like works.
+
+def cumulative_distance_km(path):
+    """Haversine distance from the start to every vertex, in one pass."""
+    path = np.asarray(path, dtype=np.float64)
+    if len(path) < 2:
+        return np.zeros(len(path))
+    lon, lat = np.radians(path[:, 0]), np.radians(path[:, 1])
+    a = np.sin(np.diff(lat) / 2) ** 2 + \
+        np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+    steps = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    return np.concatenate([[0.0], np.cumsum(steps)])
+
+
+def sample_at_distances(path, distances_km, cumulative=None):
+    """Points ([lon, lat]) at the given distances along the path."""
+    path = np.asarray(path, dtype=np.float64)
+    cum = cumulative_distance_km(path) if cumulative is None else cumulative
+    distances_km = np.clip(np.asarray(distances_km, dtype=np.float64), 0.0, cum[-1])
+    lon = np.interp(distances_km, cum, path[:, 0])
+    lat = np.interp(distances_km, cum, path[:, 1])
+    return np.column_stack([lon, lat])
+
+
+def sample_route(path, fractions=None, spacing_km=None):
+    """
+    Samples a route by true distance. Either at fractions of the total
+    length (e.g. 0.1 ... 0.9) or every spacing_km, start and end excluded.
+    Returns (points [[lon, lat], ...], distances_km).
+    """
+    cum = cumulative_distance_km(path)
+    total = cum[-1] if len(cum) else 0.0
+    if spacing_km:
+        distances = np.arange(spacing_km, total, spacing_km)
+    else:
+        distances = np.asarray(fractions, dtype=np.float64) * total
+    return sample_at_distances(path, distances, cum), distances
+
+
+def distance_to_route_km(points, path, chunk_size=64):
+    """
+    Batched point-to-segment distance from each [lon, lat] point to the
+    route, in a local equirectangular projection. Returns (distance_km,
+    along_km): how far each point is from the route and how far along
+    the route its closest point lies.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    path = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+    if len(points) == 0 or len(path) == 0:
+        return np.empty(0), np.empty(0)
+
+    kx = KM_PER_DEG_LAT * math.cos(math.radians(float(path[:, 1].mean())))
+    scale = np.array([kx, KM_PER_DEG_LAT])
+    xy = path * scale
+    pts = points * scale
+    if len(path) == 1:
+        return np.hypot(*(pts - xy[0]).T), np.zeros(len(points))
+
+    x, y = xy[:, 0], xy[:, 1]
+    dx, dy = np.diff(x), np.diff(y)
+    seg_len = np.hypot(dx, dy)
+    seg_len2 = np.maximum(seg_len * seg_len, 1e-12)
+    cum = cumulative_distance_km(path)
+    seg_km = np.diff(cum)
+
+    distance = np.empty(len(pts))
+    along = np.empty(len(pts))
+    # Chunk the points so memory stays at chunk_size x n_vertices.
+    for start in range(0, len(pts), chunk_size):
+        px = pts[start:start + chunk_size, 0:1]
+        py = pts[start:start + chunk_size, 1:2]
+        vertex = np.hypot(px - x, py - y)
+        # The nearest vertex bounds the answer from above; a segment can
+        # only beat it if |p - a| - |ab| <= that bound, so only those
+        # (usually a handful) get the exact projection.
+        bound = vertex.min(axis=1, keepdims=True)
+        row, seg = np.nonzero(vertex[:, :-1] - seg_len <= bound)
+        t = np.clip(((px[row, 0] - x[seg]) * dx[seg] +
+                     (py[row, 0] - y[seg]) * dy[seg]) / seg_len2[seg], 0.0, 1.0)
+        d = np.hypot(px[row, 0] - (x[seg] + t * dx[seg]), py[row, 0] - (y[seg] + t * dy[seg]))
+
+        # Pick the closest segment per point: sort by (row, d), take firsts.
+        order = np.lexsort((d, row))
+        first = order[np.r_[True, row[order][1:] != row[order][:-1]]]
+        distance[start + row[first]] = d[first]
+        along[start + row[first]] = cum[seg[first]] + t[first] * seg_km[seg[first]]
+    return distance, along
+
+
+# Web Mercator ground resolution at zoom 0, in metres per 256 px tile pixel.
+METERS_PER_PIXEL_Z0 = 156543.03392
+
+
+def tolerance_for_zoom(zoom, lat, pixels=1.0):
+    """Ground distance (m) covered by `pixels` screen pixels at a map zoom level."""
+    return pixels * METERS_PER_PIXEL_Z0 * math.cos(math.radians(lat)) / (2 ** zoom)
+
+
+def simplify_route(path, tolerance_m):
+    """
+    Douglas-Peucker simplification of a [lon, lat] path in a local
+    equirectangular projection. Returns the indices of the kept vertices
+    (always including both ends). Every span of one recursion level is
+    handled in a single vectorized pass, so the Python loop runs once per
+    level rather than once per span.
+    """
+    path = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+    n = len(path)
+    if n <= 2 or tolerance_m <= 0:
+        return np.arange(n)
+
+    kx = KM_PER_DEG_LAT * math.cos(math.radians(float(path[:, 1].mean())))
+    x = path[:, 0] * kx * 1000.0  # metres
+    y = path[:, 1] * KM_PER_DEG_LAT * 1000.0
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+
+    first, last = np.array([0]), np.array([n - 1])
+    while len(first):
+        inner = last - first - 1
+        first, last, inner = first[inner > 0], last[inner > 0], inner[inner > 0]
+        if not len(first):
+            break
+        # Every inner vertex of every span, grouped by span; per-span
+        # values are computed once and repeated over their vertices.
+        span = np.repeat(np.arange(len(first)), inner)
+        offsets = np.concatenate([[0], np.cumsum(inner)[:-1]])
+        vertex = np.arange(len(span)) + np.repeat(first + 1 - offsets, inner)
+
+        ax, ay = x[first], y[first]
+        abx, aby = x[last] - ax, y[last] - ay
+        ab2 = np.maximum(abx * abx + aby * aby, 1e-12)
+        px = x[vertex] - np.repeat(ax, inner)
+        py = y[vertex] - np.repeat(ay, inner)
+        abx, aby = np.repeat(abx, inner), np.repeat(aby, inner)
+        t = np.clip((px * abx + py * aby) / np.repeat(ab2, inner), 0.0, 1.0)
+        d2 = (px - t * abx) ** 2 + (py - t * aby) ** 2
+
+        # Farthest vertex per span: the first one that reaches the span max.
+        span_max = np.maximum.reduceat(d2, offsets)
+        at_max = np.flatnonzero(d2 == span_max[span])
+        _, first_hit = np.unique(span[at_max], return_index=True)
+        farthest = at_max[first_hit]
+
+        split_spans = span_max > tolerance_m * tolerance_m
+        split = vertex[farthest][split_spans]
+        keep[split] = True
+        first = np.concatenate([first[split_spans], split])
+        last = np.concatenate([split, last[split_spans]])
+    return np.flatnonzero(keep)
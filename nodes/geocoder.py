@@ -1,13 +1,87 @@
+import os
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from geopy.exc import GeocoderTimedOut, GeocoderUnavailable
 from .graph_state import GraphState
-from .tools import geolocator
+from . import tools
+from .cache import TTLCache, MISS, CACHE_DB_PATH
+from .ratelimit import get_limiter
+from .singleflight import get_flight
+from .telemetry import external_call, log
+
+# --- Geocode Cache ---
+# Resolved places are stable, so they live for a month. Names that failed
+# to resolve are cached too (as None), but only for a day.
+GEOCODE_CACHE_TTL_S = float(os.getenv("GEOCODE_CACHE_TTL_S", str(30 * 24 * 3600)))
+GEOCODE_NEGATIVE_TTL_S = float(os.getenv("GEOCODE_NEGATIVE_TTL_S", str(24 * 3600)))
+
+geocode_cache = TTLCache(
+    "geocode",
+    maxsize=int(os.getenv("GEOCODE_CACHE_SIZE", "512")),
+    ttl=GEOCODE_CACHE_TTL_S,
+    db_path=CACHE_DB_PATH or None
+)
+
+
+def _normalize_place(name: str) -> str:
+    """'  Kandy ' and 'kandy' share one cache entry."""
+    return " ".join(name.lower().split())
+
+
+def geocode_place(name):
+    """
+    Returns (lat, lon) for a place name, or None if it can't be resolved.
+    Answers from the cache when possible. Service errors are raised and
+    never cached.
+    """
+    key = _normalize_place(name)
+    cached = geocode_cache.get(key)
+    if cached is not MISS:
+        log.info(f"   > Geocode cache hit for '{name}'")
+        return tuple(cached) if cached else None
+
+    # Concurrent trips asking for the same name share one Nominatim call.
+    return get_flight("geocode").do(key, lambda: _geocode_live(name, key))
+
+
+def _geocode_live(name, key):
+    get_limiter("nominatim").acquire()
+    with external_call("nominatim"):
+        location = tools.geolocator.geocode(name)
+    if location:
+        coords = (location.latitude, location.longitude)
+        geocode_cache.set(key, list(coords))
+        return coords
+
+    geocode_cache.set(key, None, ttl=GEOCODE_NEGATIVE_TTL_S)
+    return None
+
+
+def _report(origin, destination, origin_coords, destination_coords):
+    if origin:
+        if origin_coords:
+            log.info(f"   > Geocoded Origin '{origin}': {origin_coords}")
+        else:
+            log.warning(f"   > WARNING: Could not geocode origin: {origin}")
+
+    if destination:
+        if destination_coords:
+            log.info(
+                f"   > Geocoded Destination '{destination}': {destination_coords}")
+        else:
+            log.warning(
+                f"   > WARNING: Could not geocode destination: {destination}")
+
+    stats = geocode_cache.stats()
+    log.info(f"   > Geocode cache: {stats['hits']} hits, {stats['misses']} misses")
 
 
 def geocode_locations_node(state: GraphState):
     """
     Node 2: Geocodes the origin and destination names.
     """
-    print("--- 2. EXECUTING: geocode_locations_node ---")
+    log.info("--- 2. EXECUTING: geocode_locations_node ---")
     origin = state.get("origin_name")
     destination = state.get("destination_name")
 
@@ -15,26 +89,49 @@ def geocode_locations_node(state: GraphState):
     destination_coords = None
 
     try:
-        if origin:
-            location = geolocator.geocode(origin)
-            if location:
-                origin_coords = (location.latitude, location.longitude)
-                print(f"   > Geocoded Origin '{origin}': {origin_coords}")
-            else:
-                print(f"   > WARNING: Could not geocode origin: {origin}")
-
-        if destination:
-            location = geolocator.geocode(destination)
-            if location:
-                destination_coords = (location.latitude, location.longitude)
-                print(
-                    f"   > Geocoded Destination '{destination}': {destination_coords}")
-            else:
-                print(
-                    f"   > WARNING: Could not geocode destination: {destination}")
+        # Resolve both names side by side; cache hits return immediately.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            # Each in a copy of our context, keeping the trace and node.
+            origin_future = executor.submit(
+                contextvars.copy_context().run, geocode_place, origin) if origin else None
+            destination_future = executor.submit(
+                contextvars.copy_context().run, geocode_place, destination) if destination else None
+            origin_coords = origin_future.result() if origin_future else None
+            destination_coords = destination_future.result() if destination_future else None
+
+    except (GeocoderTimedOut, GeocoderUnavailable) as e:
+        log.error(f"   > ERROR: Geocoding service error: {e}")
 
+    _report(origin, destination, origin_coords, destination_coords)
+
+    return {
+        "origin_coords": origin_coords,
+        "destination_coords": destination_coords
+    }
+
+
+async def ageocode_locations_node(state: GraphState):
+    """
+    Node 2 (async): geocodes both names concurrently off the event loop
+    (geopy's Nominatim client is blocking).
+    """
+    log.info("--- 2. EXECUTING: geocode_locations_node (ASYNC) ---")
+    origin = state.get("origin_name")
+    destination = state.get("destination_name")
+
+    async def resolve(name):
+        return await asyncio.to_thread(geocode_place, name) if name else None
+
+    origin_coords = None
+    destination_coords = None
+
+    try:
+        origin_coords, destination_coords = await asyncio.gather(
+            resolve(origin), resolve(destination))
     except (GeocoderTimedOut, GeocoderUnavailable) as e:
-        print(f"   > ERROR: Geocoding service error: {e}")
+        log.error(f"   > ERROR: Geocoding service error: {e}")
+
+    _report(origin, destination, origin_coords, destination_coords)
 
     return {
         "origin_coords": origin_coords,
@@ -1,26 +1,41 @@
 # nodes/graph_state.py
-from typing import TypedDict, Optional, Any, List
+from typing import TypedDict, Optional, Any, List, Annotated
+
+
+def keep_latest(old, new):
+    """Reducer for keys written by parallel branches: last non-null wins."""
+    return old if new is None else new
+
 
 class GraphState(TypedDict):
     original_query: str
+    bypass_cache: Optional[bool] = None
+    plan_cache_hit: Optional[bool] = None
     guardrail_decision: Optional[str] = None
     final_response: Optional[str] = None
     
-    origin_name: Optional[str] = None
-    destination_name: Optional[str] = None
-    trip_duration_days: Optional[int] = None
+    # Written by both the guardrail and the extractor, which can run in parallel.
+    origin_name: Annotated[Optional[str], keep_latest] = None
+    destination_name: Annotated[Optional[str], keep_latest] = None
+    trip_duration_days: Annotated[Optional[int], keep_latest] = None
     
     origin_coords: Optional[tuple] = None
     destination_coords: Optional[tuple] = None
 
     route_distance_km: Optional[float] = None
     route_duration_str: Optional[str] = None
-    route_geojson: Optional[dict] = None
-    route_path_coords: Optional[List[List[float]]] = None 
+    # Handle into nodes/route_store.py; the geometry is never copied into the state.
+    route_handle: Optional[str] = None
+
+    # Raw per-branch Geoapify results, joined into `attractions`.
+    stopover_search: Optional[dict] = None
+    destination_search: Optional[dict] = None
 
     attractions: Optional[List[dict]] = None 
     ranked_attractions: Optional[List[dict]] = None 
     
  
     final_itinerary: Optional[str] = None
+    # Set when the ranking or the itinerary came from nodes/offline_planner.py.
+    planned_offline: Optional[bool] = None
     
\ No newline at end of file
@@ -1,15 +1,29 @@
 # nodes/guardrail.py
+import os
 from .graph_state import GraphState
-from .tools import guardrail_llm
+from . import tools
+from .preclassifier import preclassify
+from .models import GuardrailExtraction
+from .telemetry import log
 
-def input_guardrail_node(state: GraphState):
-    """
-    Node 0: INTENT CLASSIFIER & SECURITY GATEWAY
+# --- Guardrail Settings ---
+# "combined" classifies the query and extracts origin, destination and
+# duration in the same LLM call, so valid trips skip extract_locations.
+# "separate" keeps the classic classify-then-extract pair of calls.
+# Either way, obvious queries are answered by nodes/preclassifier.py first.
+GUARDRAIL_MODE = os.getenv("GUARDRAIL_MODE", "combined")
+
+_EXTRACTION_INSTRUCTIONS = """
+    -----------------------------------------
+    TRIP DETAILS:
+    Also extract 'origin' (starting city), 'destination' (final city) and
+    'duration_days' (trip length in days) from the input. Use null for
+    anything the user did not mention; never guess.
     """
-    print("--- 0. EXECUTING: input_guardrail_node (POLISHED MODE) ---")
-    query = state["original_query"]
-    
-    prompt = f"""
+
+
+def _build_prompt(query):
+    return f"""
     You are the intelligent, polite, and helpful Gatekeeper for a Travel Agent AI.
     Your job is to classify the user's input and provide a natural, polished response.
 
@@ -49,18 +63,83 @@ def input_guardrail_node(state: GraphState):
     OUTPUT:
     Return the JSON with the 'decision' and your polished 'feedback_message'.
     """
+
+
+def _build_combined_prompt(query):
+    return _build_prompt(query) + _EXTRACTION_INSTRUCTIONS
+
+
+def _handle_result(result):
+    log.info(f"   > Decision: {result.decision.upper()}")
+    
+    update = {
+        "guardrail_decision": result.decision,
+        "final_response": result.feedback_message
+    }
+    # Combined mode: hand the extracted details straight to the graph.
+    origin = getattr(result, "origin", None)
+    destination = getattr(result, "destination", None)
+    if result.decision == "valid" and origin and destination:
+        log.info(f"   > Extracted: {origin} -> {destination} ({result.duration_days} days)")
+        update.update({
+            "origin_name": origin,
+            "destination_name": destination,
+            "trip_duration_days": result.duration_days
+        })
+    return update
+
+
+def _preclassified(query):
+    """State update from the local pre-classifier, or None to ask the LLM."""
+    outcome = preclassify(query)
+    if outcome is None:
+        return None
+    log.info("   > Pre-classifier answered (no LLM call).")
+    return _handle_result(GuardrailExtraction(**outcome))
+
+
+def _guardrail_call(query):
+    """The runnable and prompt for the configured GUARDRAIL_MODE."""
+    if GUARDRAIL_MODE == "combined":
+        return tools.combined_guardrail_llm, _build_combined_prompt(query)
+    return tools.guardrail_llm, _build_prompt(query)
+
+
+def _handle_error(e):
+    log.error(f"   > Guardrail Error: {e}")
+    return {
+        "guardrail_decision": "error", 
+        "final_response": "I'm having a little trouble understanding that. Could you try asking for a specific trip plan?"
+    }
+
+
+def input_guardrail_node(state: GraphState):
+    """
+    Node 0: INTENT CLASSIFIER & SECURITY GATEWAY
+    """
+    log.info("--- 0. EXECUTING: input_guardrail_node (POLISHED MODE) ---")
+    fast = _preclassified(state["original_query"])
+    if fast:
+        return fast
+    runnable, prompt = _guardrail_call(state["original_query"])
+    
+    try:
+        return _handle_result(runnable.invoke(prompt))
+    except Exception as e:
+        return _handle_error(e)
+
+
+async def ainput_guardrail_node(state: GraphState):
+    """
+    Node 0 (async): same as input_guardrail_node, awaiting the LLM.
+    """
+    log.info("--- 0. EXECUTING: input_guardrail_node (POLISHED MODE, ASYNC) ---")
+    fast = _preclassified(state["original_query"])
+    if fast:
+        return fast
+    runnable, prompt = _guardrail_call(state["original_query"])
     
     try:
-        result = guardrail_llm.invoke(prompt)
-        print(f"   > Decision: {result.decision.upper()}")
-        
-        return {
-            "guardrail_decision": result.decision,
-            "final_response": result.feedback_message
-        }
+        return _handle_result(await runnable.ainvoke(prompt))
     except Exception as e:
-        print(f"   > Guardrail Error: {e}")
-        return {
-            "guardrail_decision": "error", 
-            "final_response": "I'm having a little trouble understanding that. Could you try asking for a specific trip plan?"
-        }
\ No newline at end of file
+        return _handle_error(e)
\ No newline at end of file
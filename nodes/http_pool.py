@@ -0,0 +1,115 @@
+# nodes/http_pool.py
+"""
+Shared, pooled HTTP clients for the external services, one per provider:
+a requests.Session for the blocking paths and an httpx.AsyncClient for the
+async ones. Connections are kept alive between calls, so a trip's calls
+(and the next trip's) skip the TCP and TLS handshakes after the first.
+
+Pool size per provider is HTTP_POOL_SIZE, or HTTP_POOL_SIZE_<PROVIDER>
+(e.g. HTTP_POOL_SIZE_GEOAPIFY=64). HTTP2=1 lets the async clients speak
+HTTP/2 where the server offers it (needs the `h2` package).
+"""
+import os
+import weakref
+import functools
+import asyncio
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from .telemetry import log
+
+# --- Pool Settings ---
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+HTTP_CONNECT_TIMEOUT_S = float(os.getenv("HTTP_CONNECT_TIMEOUT_S", "5"))
+HTTP_READ_TIMEOUT_S = float(os.getenv("HTTP_READ_TIMEOUT_S", "30"))
+# Idle connections older than this are closed instead of reused.
+HTTP_KEEPALIVE_S = float(os.getenv("HTTP_KEEPALIVE_S", "60"))
+HTTP2_ENABLED = os.getenv("HTTP2", "0") == "1"
+
+_sessions = {}
+# Event loop -> {provider: AsyncClient}. An httpx client's connections
+# belong to the loop that opened them, so each loop gets its own.
+_async_clients = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def pool_size(provider):
+    override = os.getenv(f"HTTP_POOL_SIZE_{provider.upper()}")
+    return int(override) if override else HTTP_POOL_SIZE
+
+
+def request_timeout(read_s=HTTP_READ_TIMEOUT_S):
+    """(connect, read) timeout for requests."""
+    return HTTP_CONNECT_TIMEOUT_S, read_s
+
+
+def async_timeout(read_s=HTTP_READ_TIMEOUT_S):
+    """The same timeout for httpx."""
+    return httpx.Timeout(read_s, connect=HTTP_CONNECT_TIMEOUT_S)
+
+
+def get_session(provider):
+    """The process-wide requests.Session for a provider, created on first use."""
+    with _lock:
+        session = _sessions.get(provider)
+        if session is None:
+            session = requests.Session()
+            # Retries are nodes/retry.py's job; a full pool opens extra
+            # connections rather than blocking.
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size(provider),
+                                  max_retries=0, pool_block=False)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[provider] = session
+        return session
+
+
+@functools.lru_cache(maxsize=None)
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        log.warning("   > WARNING: HTTP2=1 but the 'h2' package is missing; using HTTP/1.1")
+        return False
+
+
+def get_async_client(provider):
+    """The httpx.AsyncClient for a provider on the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(provider)
+        if client is None or client.is_closed:
+            size = pool_size(provider)
+            client = httpx.AsyncClient(
+                timeout=async_timeout(),
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=size,
+                                    keepalive_expiry=HTTP_KEEPALIVE_S),
+                http2=HTTP2_ENABLED and _http2_available())
+            clients[provider] = client
+        return client
+
+
+def geopy_adapter_factory(provider):
+    """adapter_factory for geopy geocoders: a kept-alive pool sized for `provider`."""
+    from geopy.adapters import RequestsAdapter
+    return functools.partial(RequestsAdapter, pool_connections=1,
+                             pool_maxsize=pool_size(provider), max_retries=0)
+
+
+def close_sessions():
+    with _lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+async def aclose_clients():
+    """Closes the running loop's async clients (e.g. on app shutdown)."""
+    with _lock:
+        clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
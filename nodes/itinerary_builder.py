@@ -1,14 +1,16 @@
 # nodes/itinerary_builder.py
 from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
 from .graph_state import GraphState
-from .tools import llm  # Import the raw LLM object
+from . import tools  # tools.llm is the raw LLM object
+from .offline_planner import build_itinerary_offline, should_plan_offline, fallback_enabled, \
+    llm_step_budget
+from .telemetry import log
 
-def build_itinerary_node(state: GraphState):
-    """
-    Node 6: Generates a day-by-day itinerary using the ranked attractions.
-    """
-    print("--- 6. EXECUTING: build_itinerary_node (STORYTELLER) ---")
-    
+# Returned instead of an itinerary when the LLM fails (never cached).
+ITINERARY_ERROR_MESSAGE = "Sorry, I couldn't generate the detailed itinerary text."
+
+def _build_prompt(state):
     # 1. Gather Context
     origin = state.get("origin_name")
     destination = state.get("destination_name")
@@ -22,7 +24,7 @@ def build_itinerary_node(state: GraphState):
         attractions_text += f"{i}. {place['name']} ({place['reasoning']})\n"
 
     # 3. Construct the Prompt
-    prompt = f"""
+    return f"""
     You are an expert travel agent creating a personalized itinerary for Sri Lanka.
     
     TRIP DETAILS:
@@ -53,17 +55,92 @@ def build_itinerary_node(state: GraphState):
        - If the list of attractions is short, you can suggest generic activities (e.g., "Enjoy a local lunch", "Relax at the hotel") to fill the gaps, but focus primarily on the provided list.
     """
 
+
+def _itinerary_offline(state, token_sink=None):
+    itinerary_text = build_itinerary_offline(state)
+    log.info("   > Itinerary generated offline (no LLM).")
+    if token_sink:
+        token_sink(itinerary_text)
+    return {"final_itinerary": itinerary_text, "planned_offline": True}
+
+
+def build_itinerary_node(state: GraphState):
+    """
+    Node 6: Generates a day-by-day itinerary using the ranked attractions.
+    """
+    log.info("--- 6. EXECUTING: build_itinerary_node (STORYTELLER) ---")
+    if should_plan_offline():
+        return _itinerary_offline(state)
+    prompt = _build_prompt(state)
+
     try:
         # Call the LLM directly
-        response = llm.invoke([HumanMessage(content=prompt)])
+        with llm_step_budget():
+            response = tools.llm.invoke([HumanMessage(content=prompt)])
         itinerary_text = response.content
         
-        print("   > Itinerary generated successfully.")
+        log.info("   > Itinerary generated successfully.")
+        
+        return {
+            "final_itinerary": itinerary_text
+        }
+
+    except Exception as e:
+        log.error(f"   > ERROR: Itinerary generation failed: {e}")
+        if fallback_enabled():
+            return _itinerary_offline(state)
+        return {"final_itinerary": ITINERARY_ERROR_MESSAGE}
+
+
+def _chunk_text(chunk):
+    """Text of a streamed message chunk (Gemini may send content parts)."""
+    if isinstance(chunk.content, str):
+        return chunk.content
+    return "".join(part.get("text", "") if isinstance(part, dict) else str(part)
+                   for part in chunk.content)
+
+
+async def abuild_itinerary_node(state: GraphState, config: RunnableConfig = None):
+    """
+    Node 6 (async): same as build_itinerary_node, awaiting the LLM.
+    If the run was given a `token_sink` callable in config["configurable"],
+    the itinerary is streamed into it token by token as it is written. If
+    the LLM fails midway and the offline planner takes over, `token_reset`
+    (also in config["configurable"]) is called first: the tokens sent so
+    far are not part of the itinerary.
+    """
+    log.info("--- 6. EXECUTING: build_itinerary_node (STORYTELLER, ASYNC) ---")
+    configurable = (config or {}).get("configurable") or {}
+    token_sink, token_reset = configurable.get("token_sink"), configurable.get("token_reset")
+    if should_plan_offline():
+        return _itinerary_offline(state, token_sink)
+    prompt = _build_prompt(state)
+    parts = []
+
+    try:
+        with llm_step_budget():
+            if token_sink:
+                async for chunk in tools.llm.astream([HumanMessage(content=prompt)]):
+                    text = _chunk_text(chunk)
+                    if text:
+                        parts.append(text)
+                        token_sink(text)
+                itinerary_text = "".join(parts)
+            else:
+                response = await tools.llm.ainvoke([HumanMessage(content=prompt)])
+                itinerary_text = response.content
+        
+        log.info("   > Itinerary generated successfully.")
         
         return {
             "final_itinerary": itinerary_text
         }
 
     except Exception as e:
-        print(f"   > ERROR: Itinerary generation failed: {e}")
-        return {"final_itinerary": "Sorry, I couldn't generate the detailed itinerary text."}
\ No newline at end of file
+        log.error(f"   > ERROR: Itinerary generation failed: {e}")
+        if fallback_enabled():
+            # Tell streaming clients to drop the partial text they already got.
+            if token_sink and parts and token_reset:
+                token_reset()
+            return _itinerary_offline(state, token_sink)
+        return {"final_itinerary": ITINERARY_ERROR_MESSAGE}
@@ -0,0 +1,122 @@
+# nodes/llm_cache.py
+import os
+import json
+import hashlib
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from .cache import TTLCache, MISS, CACHE_DB_PATH
+from .singleflight import get_flight
+from .telemetry import log
+
+# --- LLM Memoization Settings ---
+# Identical prompts to the same model/schema/temperature are answered from
+# here instead of Gemini. Calls run at temperature 0, so a stored answer is
+# as good as a fresh one. LLM_CACHE=0 turns it off.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") == "1"
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+
+llm_cache = TTLCache(
+    "llm",
+    maxsize=int(os.getenv("LLM_CACHE_SIZE", "512")),
+    ttl=LLM_CACHE_TTL_S,
+    db_path=(CACHE_DB_PATH or None) if os.getenv("LLM_CACHE_PERSIST", "1") == "1" else None
+)
+
+
+def _prompt_payload(prompt):
+    if isinstance(prompt, str):
+        return prompt
+    if isinstance(prompt, BaseMessage):
+        prompt = [prompt]
+    return [[m.type, m.content] if isinstance(m, BaseMessage) else m for m in prompt]
+
+
+def llm_cache_key(model, temperature, schema, prompt):
+    """sha256 over everything that determines the answer."""
+    payload = {
+        "model": model,
+        "temperature": temperature,
+        "schema": schema.model_json_schema() if schema else None,
+        "prompt": _prompt_payload(prompt)
+    }
+    blob = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class MemoizedRunnable:
+    """
+    Content-addressed cache in front of an LLM runnable. Structured calls
+    (`schema` set) store the validated pydantic JSON; raw calls store the
+    message text. Errors and empty answers are never stored.
+
+    Misses go through the "llm" single-flight group on the same key, so
+    identical prompts in flight at once make one model call (with the
+    cache off too). Streams aren't shared: each caller gets its own tokens.
+    """
+
+    def __init__(self, runnable, model, temperature, schema=None):
+        self.runnable = runnable
+        self.model = model
+        self.temperature = temperature
+        self.schema = schema
+
+    def _key(self, prompt):
+        return llm_cache_key(self.model, self.temperature, self.schema, prompt)
+
+    def _lookup(self, key):
+        if not LLM_CACHE_ENABLED:
+            return MISS
+        value = llm_cache.get(key)
+        if value is MISS:
+            return MISS
+        log.info("   > LLM cache HIT (no model call).")
+        if self.schema:
+            return self.schema.model_validate(value)
+        return AIMessage(content=value)
+
+    def _store(self, key, result):
+        if not LLM_CACHE_ENABLED or result is None:
+            return
+        if self.schema:
+            llm_cache.set(key, result.model_dump(mode="json"))
+        elif isinstance(result, str):
+            llm_cache.set(key, result)
+        elif isinstance(result.content, str) and result.content:
+            llm_cache.set(key, result.content)
+
+    def invoke(self, prompt, *args, **kwargs):
+        key = self._key(prompt)
+        cached = self._lookup(key)
+        if cached is not MISS:
+            return cached
+        return get_flight("llm").do(key, lambda: self._call(key, prompt, args, kwargs))
+
+    def _call(self, key, prompt, args, kwargs):
+        result = self.runnable.invoke(prompt, *args, **kwargs)
+        self._store(key, result)
+        return result
+
+    async def ainvoke(self, prompt, *args, **kwargs):
+        key = self._key(prompt)
+        cached = self._lookup(key)
+        if cached is not MISS:
+            return cached
+        return await get_flight("llm").ado(key, lambda: self._acall(key, prompt, args, kwargs))
+
+    async def _acall(self, key, prompt, args, kwargs):
+        result = await self.runnable.ainvoke(prompt, *args, **kwargs)
+        self._store(key, result)
+        return result
+
+    async def astream(self, prompt, *args, **kwargs):
+        """A hit comes back as one chunk; a miss is stored once fully streamed."""
+        key = self._key(prompt)
+        cached = self._lookup(key)
+        if cached is not MISS:
+            yield AIMessageChunk(content=cached.content)
+            return
+        parts = []
+        async for chunk in self.runnable.astream(prompt, *args, **kwargs):
+            if isinstance(chunk.content, str):
+                parts.append(chunk.content)
+            yield chunk
+        self._store(key, "".join(parts))
@@ -39,3 +39,13 @@ class GuardrailOutcome(BaseModel):
         ...,
         description="A friendly response to the user. If valid, say 'Processing...'. If incomplete, ask for the missing info."
     )
+
+
+class GuardrailExtraction(GuardrailOutcome):
+    """The classification of the user's query plus the trip details in it."""
+    origin: Optional[str] = Field(
+        None, description="The starting city or location of the trip, if mentioned.")
+    destination: Optional[str] = Field(
+        None, description="The final city or destination of the trip, if mentioned.")
+    duration_days: Optional[int] = Field(
+        None, description="The duration of the trip in days, if mentioned.")
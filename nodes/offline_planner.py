@@ -0,0 +1,353 @@
+# nodes/offline_planner.py
+"""
+LLM-free ranking and itinerary engine. Ranks candidates with the local
+pre-ranking model, schedules them into days (an orienteering problem:
+collect the most score within each day's hours, then order each day as a
+short tour) and renders the plan as Markdown from templates.
+
+PLANNER_MODE picks who plans:
+  "llm"      always Gemini (old behaviour)
+  "offline"  always this module
+  "auto"     Gemini, unless its rate limiter says the wait would be too
+             long; any LLM failure also falls back to this module
+"""
+import os
+import re
+import math
+from contextlib import contextmanager
+from .geo import haversine_km
+from .prerank import score_place, target_count, compress_kinds
+from .ratelimit import get_limiter
+from .retry import remaining_budget, request_budget
+from .telemetry import log
+
+# --- Planner Settings ---
+PLANNER_MODE = os.getenv("PLANNER_MODE", "auto")
+# "auto": skip the LLM when a call would queue this long on the limiter...
+PLANNER_AUTO_MAX_WAIT_S = float(os.getenv("PLANNER_AUTO_MAX_WAIT_S", "10"))
+# ...and give each LLM step at most this long (retries included).
+PLANNER_LLM_BUDGET_S = float(os.getenv("PLANNER_LLM_BUDGET_S", "45"))
+
+# Day shape, in hours of the day.
+DAY_START_H = 8.5
+DAY_END_H = 18.0
+DEPART_H = 7.5
+CHECK_IN_H = 0.5
+# Even on long drives, leave room for a couple of short stops.
+MIN_STOPOVER_HOURS = 1.5
+# Places within this many km of the end of the route count as "at the destination".
+DESTINATION_ZONE_KM = 15.0
+# Local driving between sights: road distance ~1.3x straight line, ~30 km/h.
+ROAD_FACTOR = 1.3
+LOCAL_SPEED_KMH = 30.0
+DETOUR_SPEED_KMH = 40.0
+
+# Typical visit length in hours; a place takes the longest of its matches.
+VISIT_HOURS = {
+    "national_park": 3.0,
+    "natural.protected_area": 3.0,
+    "beach": 2.0,
+    "entertainment.zoo": 2.0,
+    "entertainment.museum": 1.5,
+    "leisure.park": 1.25,
+    "heritage.unesco": 2.0,
+    "tourism.sights.archaeological_site": 1.5,
+    "tourism.sights.fort": 1.5,
+    "tourism.sights.place_of_worship": 1.0,
+    "tourism.attraction.viewpoint": 0.75,
+    "natural.water": 1.0,
+    "natural.mountain": 2.0,
+}
+DEFAULT_VISIT_HOURS = 1.0
+
+TIPS = {
+    "place_of_worship": "Dress modestly (shoulders and knees covered) and leave your shoes at the entrance.",
+    "viewpoint": "Go early, before the mist and the crowds roll in.",
+    "beach": "Sea conditions change with the monsoon; swim only where the locals do.",
+    "national_park": "Book a jeep in advance and bring water and a hat.",
+    "museum": "Allow time for the guide; the stories are half the visit.",
+    "water": "Paths get slippery after rain, so wear proper shoes.",
+    "mountain": "Start early and carry water; it's cooler on the way up in the morning.",
+}
+DEFAULT_TIP = "Don't forget your camera."
+
+EVENING_IDEAS = [
+    "Enjoy a rice-and-curry dinner at a local restaurant.",
+    "Take a relaxed walk around town and try some street food.",
+    "Unwind at the hotel and rest up for tomorrow.",
+]
+
+
+@contextmanager
+def llm_step_budget():
+    """Caps one LLM step at PLANNER_LLM_BUDGET_S in "auto" mode."""
+    if PLANNER_MODE != "auto":
+        yield
+        return
+    remaining = remaining_budget()
+    seconds = PLANNER_LLM_BUDGET_S if remaining is None else min(remaining, PLANNER_LLM_BUDGET_S)
+    with request_budget(seconds):
+        yield
+
+
+def should_plan_offline():
+    """True when this step should skip the LLM altogether."""
+    if PLANNER_MODE == "offline":
+        return True
+    if PLANNER_MODE != "auto":
+        return False
+    wait = get_limiter("gemini").expected_wait()
+    remaining = remaining_budget()
+    if wait > PLANNER_AUTO_MAX_WAIT_S or (remaining is not None and wait >= remaining):
+        log.info(f"   > Gemini limiter wait is {wait:.1f}s; planning offline instead.")
+        return True
+    return False
+
+
+def fallback_enabled():
+    return PLANNER_MODE == "auto"
+
+
+# --- Helpers ---
+
+def _categories(place):
+    return [c.strip() for c in (place.get("kinds") or "").split(",") if c.strip()]
+
+
+def visit_hours(place):
+    matches = [hours for category in _categories(place) for prefix, hours in VISIT_HOURS.items()
+               if category == prefix or category.startswith(prefix + ".")]
+    return max(matches, default=DEFAULT_VISIT_HOURS)
+
+
+def _tip(place):
+    for category in _categories(place):
+        for segment in category.split("."):
+            if segment in TIPS:
+                return TIPS[segment]
+    return DEFAULT_TIP
+
+
+def _kind_label(place):
+    label = compress_kinds(place.get("kinds"), max_terms=1)
+    return "Sight" if label == "N/A" else label.capitalize()
+
+
+def parse_duration_hours(text):
+    """"3h 10m" (or "3 hours, 10 minutes") -> 3.17; None if unparseable."""
+    if not text:
+        return None
+    hours = re.search(r"(\d+)\s*h", text)
+    minutes = re.search(r"(\d+)\s*m", text)
+    if not hours and not minutes:
+        return None
+    return (int(hours.group(1)) if hours else 0) + (int(minutes.group(1)) if minutes else 0) / 60
+
+
+def _clock(hours):
+    hours = min(hours, 23.99)
+    return f"{int(hours):02d}:{int(round((hours % 1) * 60)) % 60:02d}"
+
+
+def _travel_hours(a, b):
+    if a is None or b is None:
+        return 0.5
+    return haversine_km(a[0], a[1], b[0], b[1]) * ROAD_FACTOR / LOCAL_SPEED_KMH
+
+
+def _position(place):
+    if place.get("lat") is None or place.get("lon") is None:
+        return None
+    return (place["lat"], place["lon"])
+
+
+def _is_en_route(place, route_km_total):
+    if place.get("route_km") is not None and route_km_total:
+        return place["route_km"] < route_km_total - DESTINATION_ZONE_KM
+    return str(place.get("location_context", "")).startswith("Stopover")
+
+
+# --- Ranking ---
+
+def rank_offline(attractions, days, destination=None):
+    """[{"name", "reasoning"}] for the best target_count(days) places."""
+    ranked = sorted(attractions, key=score_place, reverse=True)[:target_count(days)]
+    result = []
+    for place in ranked:
+        distance = place.get("distance_to_route_km")
+        if str(place.get("location_context", "")).startswith("Stopover"):
+            where = "right on the route" if distance is not None and distance < 1 else \
+                f"{distance:.1f} km off the route" if distance is not None else "along the way"
+            fit = "a good stop to break up the Day 1 drive"
+        else:
+            where = f"in {destination}" if destination else "at the destination"
+            fit = "worth a visit while you're there"
+        result.append({
+            "name": place["name"],
+            "reasoning": f"{_kind_label(place)} {where} (~{visit_hours(place):g}h); {fit}."
+        })
+    return result
+
+
+# --- Scheduling ---
+
+def _two_opt(start, stops):
+    """Shortens a closed tour start -> stops -> start by reversing segments."""
+    def length(order):
+        points = [start] + [_position(p) for p in order] + [start]
+        return sum(_travel_hours(a, b) for a, b in zip(points, points[1:]))
+
+    best = list(stops)
+    improved = True
+    while improved and len(best) > 2:
+        improved = False
+        for i in range(len(best) - 1):
+            for j in range(i + 2, len(best) + 1):
+                candidate = best[:i] + best[i:j][::-1] + best[j:]
+                if length(candidate) < length(best) - 1e-9:
+                    best, improved = candidate, True
+    return best
+
+
+def _fill_day(candidates, base, start_h, end_h, max_stops):
+    """
+    Greedy orienteering from `base`: repeatedly add the place with the best
+    score per hour (travel + visit) that still lets us get back by end_h.
+    Chosen places are removed from `candidates`.
+    Returns [(place, arrival_h)] in visiting order.
+    """
+    chosen = []
+    position, clock = base, start_h
+    while candidates and len(chosen) < max_stops:
+        best, best_ratio = None, 0.0
+        for place in candidates:
+            travel = _travel_hours(position, _position(place))
+            finish = clock + travel + visit_hours(place)
+            if finish + _travel_hours(_position(place), base) > end_h:
+                continue
+            ratio = place["_score"] / (travel + visit_hours(place))
+            if ratio > best_ratio:
+                best, best_ratio = place, ratio
+        if best is None:
+            break
+        candidates.remove(best)
+        chosen.append(best)
+        clock += _travel_hours(position, _position(best)) + visit_hours(best)
+        position = _position(best)
+
+    # Re-walk the chosen places in the shortest order found.
+    schedule, position, clock = [], base, start_h
+    for place in _two_opt(base, chosen):
+        clock += _travel_hours(position, _position(place))
+        schedule.append((place, clock))
+        clock += visit_hours(place)
+        position = _position(place)
+    return schedule
+
+
+def schedule_trip(places, days, drive_hours, destination_coords, route_km_total):
+    """
+    Splits `places` into days. Day 1 is the drive with en-route stops in
+    route order, then whatever fits after arrival; later days are tours
+    from the destination. Returns (day_plans, leftovers, arrival_h).
+    """
+    days = max(1, days or 1)
+    drive_hours = drive_hours or 0.0
+    pool = [{**p, "_score": max(score_place(p), 1e-6)} for p in places]
+    en_route = [p for p in pool if _is_en_route(p, route_km_total)]
+    local = [p for p in pool if not _is_en_route(p, route_km_total)]
+
+    # Day 1: best en-route stops (by score per hour incl. detour) that fit.
+    budget = max(MIN_STOPOVER_HOURS, DAY_END_H - DEPART_H - drive_hours - CHECK_IN_H)
+
+    def stop_cost(p):
+        return visit_hours(p) + 2 * (p.get("distance_to_route_km") or 0) / DETOUR_SPEED_KMH
+
+    stops, used = [], 0.0
+    for place in sorted(en_route, key=lambda p: p["_score"] / stop_cost(p), reverse=True):
+        if used + stop_cost(place) <= budget:
+            stops.append(place)
+            used += stop_cost(place)
+    stops.sort(key=lambda p: p.get("route_km") or 0)
+
+    day_one, spent = [], 0.0
+    for place in stops:
+        fraction = (place.get("route_km") or 0) / route_km_total if route_km_total else 0.5
+        arrival = DEPART_H + drive_hours * min(fraction, 1.0) + spent
+        day_one.append((place, arrival))
+        spent += stop_cost(place)
+    arrival_h = DEPART_H + drive_hours + spent
+
+    # Spread the destination's sights over the days instead of front-loading.
+    day_plans = [day_one + _fill_day(local, destination_coords, arrival_h + CHECK_IN_H,
+                                     DAY_END_H, math.ceil(len(local) / days))]
+    for day in range(1, days):
+        day_plans.append(_fill_day(local, destination_coords, DAY_START_H, DAY_END_H,
+                                   math.ceil(len(local) / (days - day))))
+
+    stop_ids = {id(p) for p in stops}
+    leftovers = sorted([p for p in en_route if id(p) not in stop_ids] + local,
+                       key=lambda p: p["_score"], reverse=True)
+    return day_plans, leftovers, arrival_h
+
+
+# --- Rendering ---
+
+def _bullet(place, arrival):
+    return (f"- **{_clock(arrival)}** {place['name']}: {_kind_label(place).lower()}, "
+            f"about {visit_hours(place):g}h. {_tip(place)}")
+
+
+def render_itinerary(origin, destination, days, drive_str, day_plans, arrival_h, leftovers):
+    days = max(1, days or 1)
+    lines = [f"# {days}-Day Trip: {origin} to {destination}", ""]
+
+    lines += ["## Day 1: The Journey Begins",
+              f"- **{_clock(DEPART_H)}** Set off from {origin}"
+              + (f" ({drive_str} of driving in total)." if drive_str else ".")]
+    arrived = False
+    for place, arrival in day_plans[0]:
+        if not arrived and arrival >= arrival_h:
+            lines.append(f"- **{_clock(arrival_h)}** Arrive in {destination} and check in.")
+            arrived = True
+        lines.append(_bullet(place, arrival))
+    if not arrived:
+        lines.append(f"- **{_clock(arrival_h)}** Arrive in {destination} and check in.")
+    lines += [f"- **Evening:** {EVENING_IDEAS[0]}", ""]
+
+    for day in range(2, days + 1):
+        plan = day_plans[day - 1]
+        lines.append(f"## Day {day}: Exploring {destination}")
+        if not plan:
+            lines.append("- **Morning:** A slow start: enjoy a Sri Lankan breakfast of hoppers and tea.")
+            lines.append("- **Afternoon:** Wander the local market and pick up some spices.")
+        for place, arrival in plan:
+            lines.append(_bullet(place, arrival))
+        lines += [f"- **Evening:** {EVENING_IDEAS[(day - 1) % len(EVENING_IDEAS)]}", ""]
+
+    if leftovers:
+        lines.append("### If You Have Extra Time")
+        lines += [f"- {p['name']} ({_kind_label(p).lower()})" for p in leftovers[:5]]
+        lines.append("")
+    return "\n".join(lines)
+
+
+def build_itinerary_offline(state):
+    """Markdown itinerary for the ranked (or, failing that, all) attractions."""
+    attractions = state.get("attractions") or []
+    by_name = {p["name"]: p for p in attractions}
+    ranked = state.get("ranked_attractions")
+    if ranked:
+        places = [by_name.get(r["name"], {"name": r["name"]}) for r in ranked]
+    else:
+        places = sorted(attractions, key=score_place, reverse=True)
+        places = places[:target_count(state.get("trip_duration_days"))]
+
+    days = state.get("trip_duration_days") or 1
+    day_plans, leftovers, arrival_h = schedule_trip(
+        places, days,
+        parse_duration_hours(state.get("route_duration_str")),
+        state.get("destination_coords"),
+        state.get("route_distance_km"))
+    return render_itinerary(state.get("origin_name"), state.get("destination_name"), days,
+                            state.get("route_duration_str"), day_plans, arrival_h, leftovers)
@@ -0,0 +1,110 @@
+# nodes/plan_cache.py
+import os
+from .graph_state import GraphState
+from .cache import TTLCache, MISS, CACHE_DB_PATH
+from .preclassifier import canonical_place
+from .itinerary_builder import ITINERARY_ERROR_MESSAGE
+from .route_store import put_route, encoded_route
+from . import polyline
+from .telemetry import log
+
+# --- Plan Cache Settings ---
+# Finished plans keyed on the canonical (origin, destination, days) after
+# extraction, so paraphrases of the same trip share one entry. A hit skips
+# geocoding, routing, attractions, ranking and the itinerary LLM call.
+# Requests with bypass_cache=True always plan afresh (and refresh the entry).
+PLAN_CACHE_ENABLED = os.getenv("PLAN_CACHE", "1") == "1"
+PLAN_CACHE_TTL_S = float(os.getenv("PLAN_CACHE_TTL_S", str(24 * 3600)))
+
+plan_cache = TTLCache(
+    "plan",
+    maxsize=int(os.getenv("PLAN_CACHE_SIZE", "256")),
+    ttl=PLAN_CACHE_TTL_S,
+    db_path=(CACHE_DB_PATH or None) if os.getenv("PLAN_CACHE_PERSIST", "1") == "1" else None
+)
+
+# State copied into / out of a cache entry.
+CACHED_KEYS = ["ranked_attractions", "final_itinerary", "route_distance_km", "route_duration_str"]
+# The route geometry is kept too (so hits can still draw the map), but
+# simplified to this tolerance in metres to keep entries small.
+PLAN_CACHE_ROUTE_TOLERANCE_M = float(os.getenv("PLAN_CACHE_ROUTE_TOLERANCE_M", "5"))
+
+
+def plan_cache_key(origin, destination, days):
+    return f"{canonical_place(origin)}|{canonical_place(destination)}|{days or 1}"
+
+
+def plan_cache_stats():
+    """Hits, misses, size and hit rate of the plan cache."""
+    stats = plan_cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    return stats
+
+
+def _usable(state):
+    return (PLAN_CACHE_ENABLED and not state.get("bypass_cache")
+            and state.get("origin_name") and state.get("destination_name"))
+
+
+def check_plan_cache_node(state: GraphState):
+    """
+    Node 1b: Returns a stored plan for this trip, if there is one.
+    """
+    log.info("--- 1b. EXECUTING: check_plan_cache_node ---")
+    if not _usable(state):
+        log.info("   > Plan cache bypassed.")
+        return {"plan_cache_hit": False}
+
+    key = plan_cache_key(state["origin_name"], state["destination_name"],
+                         state.get("trip_duration_days"))
+    entry = plan_cache.get(key)
+    stats = plan_cache_stats()
+    if entry is MISS:
+        log.info(f"   > Plan cache MISS for {key} (hit rate {stats['hit_rate']:.0%})")
+        return {"plan_cache_hit": False}
+
+    log.info(f"   > Plan cache HIT for {key} (hit rate {stats['hit_rate']:.0%})")
+    update = {k: entry.get(k) for k in CACHED_KEYS}
+    if entry.get("route_polyline"):
+        update["route_handle"] = put_route(polyline.decode_array(entry["route_polyline"]))
+    return {**update, "plan_cache_hit": True}
+
+
+def store_plan_node(state: GraphState):
+    """
+    Node 7: Saves a successfully built plan for later paraphrases.
+    """
+    log.info("--- 7. EXECUTING: store_plan_node ---")
+    if not PLAN_CACHE_ENABLED or not state.get("origin_name") or not state.get("destination_name"):
+        return {}
+    # Failed rankings leave ranked_attractions unset; failed itineraries
+    # carry the error text. Neither is worth serving again.
+    if state.get("ranked_attractions") is None or \
+            state.get("final_itinerary") in (None, ITINERARY_ERROR_MESSAGE):
+        log.info("   > Plan incomplete, not caching.")
+        return {}
+    # The offline planner stands in while Gemini is down or backed up; its
+    # template plan must not outlive the outage for PLAN_CACHE_TTL_S.
+    if state.get("planned_offline"):
+        log.info("   > Plan built offline, not caching.")
+        return {}
+
+    key = plan_cache_key(state["origin_name"], state["destination_name"],
+                         state.get("trip_duration_days"))
+    entry = {k: state.get(k) for k in CACHED_KEYS}
+    route = encoded_route(state.get("route_handle"), tolerance_m=PLAN_CACHE_ROUTE_TOLERANCE_M)
+    entry["route_polyline"] = route["polyline"] if route else None
+    plan_cache.set(key, entry)
+    log.info(f"   > Plan cached as {key}")
+    return {}
+
+
+async def acheck_plan_cache_node(state: GraphState):
+    """Node 1b (async): cache lookups are local, so this just delegates."""
+    return check_plan_cache_node(state)
+
+
+async def astore_plan_node(state: GraphState):
+    """Node 7 (async): see store_plan_node."""
+    return store_plan_node(state)
@@ -0,0 +1,307 @@
+# nodes/poi_index.py
+"""
+Offline POI index: a directory of memory-mappable NumPy arrays, sorted by
+grid cell so that any cell's POIs are one contiguous slice.
+
+Layout of an index directory:
+    meta.json         cell size, POI count and the category vocabulary
+    cell.npy          int64 cell id per POI (sorted)
+    lat.npy, lon.npy  float32 coordinates
+    category.npy      int32 index into meta["categories"]
+    name_offsets.npy  int64 byte offsets into names.bin (count + 1)
+    names.bin         UTF-8 names, back to back
+
+Build one from a GeoJSON or CSV export:
+    python -m nodes.poi_index build export.geojson --out data/poi_index
+"""
+import os
+import csv
+import sys
+import json
+import math
+import argparse
+import numpy as np
+from .geo import EARTH_RADIUS_KM, KM_PER_DEG_LAT
+
+INDEX_VERSION = 1
+DEFAULT_CELL_DEG = 0.05  # ~5.5 km
+
+
+def _cell_grid(cell_deg):
+    """Number of columns in the global grid for a given cell size."""
+    return int(math.ceil(360.0 / cell_deg))
+
+
+def _cell_rows_cols(lat, lon, cell_deg):
+    rows = np.floor((np.asarray(lat, dtype=np.float64) + 90.0) / cell_deg).astype(np.int64)
+    cols = np.floor((np.asarray(lon, dtype=np.float64) + 180.0) / cell_deg).astype(np.int64)
+    return rows, cols
+
+
+def _expand_ranges(row0, row1, col0, col1):
+    """
+    Vectorized expansion of inclusive per-item row/col ranges into
+    (item, row, col) triples, one per covered cell.
+    """
+    n_rows = row1 - row0 + 1
+    n_cols = col1 - col0 + 1
+    counts = n_rows * n_cols
+    item = np.repeat(np.arange(len(counts)), counts)
+    starts = np.cumsum(counts) - counts
+    offset = np.arange(counts.sum()) - np.repeat(starts, counts)
+    width = n_cols[item]
+    return item, row0[item] + offset // width, col0[item] + offset % width
+
+
+def _gather_slices(starts, ends):
+    """Concatenates arange(start, end) for every pair, vectorized."""
+    lengths = ends - starts
+    keep = lengths > 0
+    starts, lengths = starts[keep], lengths[keep]
+    if len(lengths) == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+
+
+def _bucket_key(rows, cols):
+    """Packs signed row/col bucket numbers into one sortable int64."""
+    return (rows << 32) + (cols + (1 << 31))
+
+
+def haversine_many(lat, lon, lats, lons):
+    """Distance in km from one point to arrays of points."""
+    phi1 = math.radians(lat)
+    phi2 = np.radians(lats)
+    dphi = phi2 - phi1
+    dlmb = np.radians(lons) - math.radians(lon)
+    a = np.sin(dphi / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class POIIndex:
+    """Read-only view over an index directory (arrays are memory-mapped)."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.cell_deg = self.meta["cell_deg"]
+        self.categories = self.meta["categories"]
+        self.n_cols = _cell_grid(self.cell_deg)
+
+        def load(name):
+            return np.load(os.path.join(path, name), mmap_mode="r")
+
+        self.cell = load("cell.npy")
+        self.lat = load("lat.npy")
+        self.lon = load("lon.npy")
+        self.category = load("category.npy")
+        self.name_offsets = load("name_offsets.npy")
+        self.names = np.memmap(os.path.join(path, "names.bin"), dtype=np.uint8, mode="r") \
+            if self.name_offsets[-1] > 0 else np.empty(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.cell)
+
+    def name(self, i):
+        start, end = int(self.name_offsets[i]), int(self.name_offsets[i + 1])
+        return bytes(self.names[start:end]).decode("utf-8")
+
+    def _candidates(self, row0, row1, col0, col1):
+        """POI indices in the given cell ranges (one contiguous slice per cell)."""
+        _, rows, cols = _expand_ranges(row0, row1, col0, col1)
+        ids = np.unique(rows * self.n_cols + cols)
+        starts = np.searchsorted(self.cell, ids, side="left")
+        ends = np.searchsorted(self.cell, ids, side="right")
+        return _gather_slices(starts, ends)
+
+    def query_radius(self, lat, lon, radius_km, limit=None):
+        """POI indices within radius_km of a point, nearest first."""
+        dlat = radius_km / KM_PER_DEG_LAT
+        dlon = radius_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        r0, c0 = _cell_rows_cols([lat - dlat], [lon - dlon], self.cell_deg)
+        r1, c1 = _cell_rows_cols([lat + dlat], [lon + dlon], self.cell_deg)
+        idx = self._candidates(r0, r1, c0, c1)
+        if len(idx) == 0:
+            return idx, np.empty(0)
+
+        dist = haversine_many(lat, lon, self.lat[idx], self.lon[idx])
+        keep = dist <= radius_km
+        idx, dist = idx[keep], dist[keep]
+        order = np.argsort(dist, kind="stable")[:limit]
+        return idx[order], dist[order]
+
+    def query_corridor(self, path_lonlat, corridor_km):
+        """
+        POI indices within corridor_km of a [[lon, lat], ...] polyline and
+        their distance to it. Candidates come from the index cells under
+        each segment's padded bbox; exact distances are then computed only
+        against segments that share a corridor-sized grid cell.
+        """
+        path = np.asarray(path_lonlat, dtype=np.float64)
+        if len(path) == 1:
+            return self.query_radius(path[0, 1], path[0, 0], corridor_km)
+        lon_a, lat_a = path[:-1, 0], path[:-1, 1]
+        lon_b, lat_b = path[1:, 0], path[1:, 1]
+
+        mid_lat = float(path[:, 1].mean())
+        dlat = corridor_km / KM_PER_DEG_LAT
+        dlon = corridor_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(mid_lat)), 1e-6))
+        r0, c0 = _cell_rows_cols(np.minimum(lat_a, lat_b) - dlat,
+                                 np.minimum(lon_a, lon_b) - dlon, self.cell_deg)
+        r1, c1 = _cell_rows_cols(np.maximum(lat_a, lat_b) + dlat,
+                                 np.maximum(lon_a, lon_b) + dlon, self.cell_deg)
+        idx = self._candidates(r0, r1, c0, c1)
+        if len(idx) == 0:
+            return idx, np.empty(0)
+
+        # Project to km and bucket segments into a corridor_km grid; each
+        # segment is registered in every bucket its padded bbox touches.
+        kx = KM_PER_DEG_LAT * math.cos(math.radians(mid_lat))
+        ax, ay = lon_a * kx, lat_a * KM_PER_DEG_LAT
+        bx, by = lon_b * kx, lat_b * KM_PER_DEG_LAT
+        g = max(corridor_km, 1e-3)
+        seg, brow, bcol = _expand_ranges(
+            np.floor((np.minimum(ay, by) - g) / g).astype(np.int64),
+            np.floor((np.maximum(ay, by) + g) / g).astype(np.int64),
+            np.floor((np.minimum(ax, bx) - g) / g).astype(np.int64),
+            np.floor((np.maximum(ax, bx) + g) / g).astype(np.int64))
+        bucket_key = _bucket_key(brow, bcol)
+        order = np.argsort(bucket_key, kind="stable")
+        bucket_key, seg = bucket_key[order], seg[order]
+
+        px = self.lon[idx].astype(np.float64) * kx
+        py = self.lat[idx].astype(np.float64) * KM_PER_DEG_LAT
+        pkey = _bucket_key(np.floor(py / g).astype(np.int64), np.floor(px / g).astype(np.int64))
+        starts = np.searchsorted(bucket_key, pkey, side="left")
+        ends = np.searchsorted(bucket_key, pkey, side="right")
+        pair_seg = seg[_gather_slices(starts, ends)]
+        pair_pt = np.repeat(np.arange(len(idx)), np.maximum(ends - starts, 0))
+        if len(pair_pt) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        sx, sy = ax[pair_seg], ay[pair_seg]
+        dx, dy = bx[pair_seg] - sx, by[pair_seg] - sy
+        qx, qy = px[pair_pt], py[pair_pt]
+        t = np.clip(((qx - sx) * dx + (qy - sy) * dy) / np.maximum(dx * dx + dy * dy, 1e-12), 0, 1)
+        d = np.hypot(qx - (sx + t * dx), qy - (sy + t * dy))
+
+        best = np.full(len(idx), np.inf)
+        np.minimum.at(best, pair_pt, d)
+        keep = best <= corridor_km
+        return idx[keep], best[keep]
+
+    def features(self, indices):
+        """Geoapify-shaped features for the given POI indices."""
+        features = []
+        for i in indices:
+            props = {
+                "name": self.name(i),
+                "lat": float(self.lat[i]),
+                "lon": float(self.lon[i])
+            }
+            categories = self.categories[int(self.category[i])]
+            if categories:
+                props["categories"] = categories.split(",")
+            features.append({"properties": props})
+        return features
+
+
+# --- Building ---
+
+def _read_geojson(path):
+    with open(path) as f:
+        data = json.load(f)
+    for feature in data.get("features", []):
+        geometry = feature.get("geometry") or {}
+        props = feature.get("properties") or {}
+        if geometry.get("type") != "Point":
+            continue
+        lon, lat = geometry["coordinates"][:2]
+        categories = props.get("categories", [])
+        if isinstance(categories, str):
+            categories = [c.strip() for c in categories.split(",")]
+        yield props.get("name"), lat, lon, categories
+
+
+def _read_csv(path):
+    """CSV with name, lat, lon and an optional ';'-separated categories column."""
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            categories = [c.strip() for c in (row.get("categories") or "").split(";") if c.strip()]
+            yield row.get("name"), float(row["lat"]), float(row["lon"]), categories
+
+
+def build_index(records, out_dir, cell_deg=DEFAULT_CELL_DEG):
+    """Writes an index directory from (name, lat, lon, categories) records."""
+    names, lats, lons, category_ids = [], [], [], []
+    vocabulary = {}
+    for name, lat, lon, categories in records:
+        if not name:
+            continue
+        key = ",".join(categories)
+        names.append(name)
+        lats.append(lat)
+        lons.append(lon)
+        category_ids.append(vocabulary.setdefault(key, len(vocabulary)))
+
+    lat = np.asarray(lats, dtype=np.float64)
+    lon = np.asarray(lons, dtype=np.float64)
+    rows, cols = _cell_rows_cols(lat, lon, cell_deg)
+    cell = rows * _cell_grid(cell_deg) + cols
+    order = np.argsort(cell, kind="stable")
+
+    encoded = [names[i].encode("utf-8") for i in order]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "cell.npy"), cell[order])
+    np.save(os.path.join(out_dir, "lat.npy"), lat[order].astype(np.float32))
+    np.save(os.path.join(out_dir, "lon.npy"), lon[order].astype(np.float32))
+    np.save(os.path.join(out_dir, "category.npy"),
+            np.asarray(category_ids, dtype=np.int32)[order])
+    np.save(os.path.join(out_dir, "name_offsets.npy"), offsets)
+    with open(os.path.join(out_dir, "names.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump({
+            "version": INDEX_VERSION,
+            "cell_deg": cell_deg,
+            "count": len(encoded),
+            "categories": list(vocabulary)
+        }, f)
+    return len(encoded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query an offline POI index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Build an index from a GeoJSON or CSV export.")
+    build.add_argument("source")
+    build.add_argument("--out", required=True)
+    build.add_argument("--cell-deg", type=float, default=DEFAULT_CELL_DEG)
+
+    query = sub.add_parser("query", help="List POIs around a point.")
+    query.add_argument("index")
+    query.add_argument("lat", type=float)
+    query.add_argument("lon", type=float)
+    query.add_argument("--radius-km", type=float, default=10)
+    query.add_argument("--limit", type=int, default=15)
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        reader = _read_csv if args.source.lower().endswith(".csv") else _read_geojson
+        count = build_index(reader(args.source), args.out, cell_deg=args.cell_deg)
+        print(f"Indexed {count} POIs into {args.out}")
+    else:
+        index = POIIndex(args.index)
+        idx, dist = index.query_radius(args.lat, args.lon, args.radius_km, limit=args.limit)
+        for i, d in zip(idx, dist):
+            print(f"{d:6.2f} km  {index.name(i)}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+# nodes/polyline.py
+"""
+Google encoded polyline format, used to store route geometry compactly and
+to send it to the frontend. Coordinates go in and come out in ORS order:
+[lon, lat]. Encoding and decoding are vectorized with NumPy; a 40k-point
+route takes milliseconds rather than a Python loop per character.
+"""
+import numpy as np
+
+PRECISION = 5
+
+# Zig-zagged deltas below 2**35 (any lat/lon delta at precision <= 7)
+# fit in seven 5-bit chunks.
+_MAX_CHUNKS = 7
+_SHIFTS = np.arange(_MAX_CHUNKS, dtype=np.int64) * 5
+
+
+def encode(coords, precision=PRECISION):
+    """[[lon, lat], ...] (or an (N, 2) array) -> encoded polyline string."""
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    if len(coords) == 0:
+        return ""
+    # Rounded before differencing, so errors don't accumulate along the line.
+    ints = np.round(coords[:, ::-1] * 10 ** precision).astype(np.int64)  # lat, lon
+    deltas = np.diff(ints, axis=0, prepend=0).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    chunks = (values[:, None] >> _SHIFTS) & 0x1f
+    # Chunks needed per value: one, plus one for every further 5 bits.
+    n_chunks = np.ones(len(values), dtype=np.int64)
+    for k in range(1, _MAX_CHUNKS):
+        n_chunks += values >= (1 << (5 * k))
+    used = _SHIFTS[None, :] // 5 < n_chunks[:, None]
+    more = _SHIFTS[None, :] // 5 < (n_chunks[:, None] - 1)
+    chars = (chunks | (more * 0x20)) + 63
+    return chars[used].astype(np.uint8).tobytes().decode("ascii")
+
+
+def decode_array(encoded, precision=PRECISION):
+    """Encoded polyline string -> (N, 2) float64 array of [lon, lat]."""
+    if not encoded:
+        return np.empty((0, 2))
+    b = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    last = b < 0x20
+    # Value index of every chunk, and the chunk's position within its value.
+    value_id = np.concatenate([[0], np.cumsum(last)[:-1]])
+    starts = np.flatnonzero(np.concatenate([[True], last[:-1]]))
+    position = np.arange(len(b)) - starts[value_id]
+    result = np.zeros(int(last.sum()), dtype=np.int64)
+    np.add.at(result, value_id, (b & 0x1f) << (5 * position))
+
+    deltas = np.where(result & 1, ~(result >> 1), result >> 1)
+    latlon = np.cumsum(deltas.reshape(-1, 2), axis=0) / float(10 ** precision)
+    return latlon[:, ::-1].copy()
+
+
+def decode(encoded, precision=PRECISION):
+    """Encoded polyline string -> [[lon, lat], ...]."""
+    return decode_array(encoded, precision).tolist()
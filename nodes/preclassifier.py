@@ -0,0 +1,210 @@
+# nodes/preclassifier.py
+"""
+Cheap local pre-classifier that runs before the guardrail LLM.
+It only answers the obvious cases (plain greetings, and queries naming two
+known Sri Lankan places in a clear direction plus a day count) and returns
+None for everything else, which then goes to the LLM as usual.
+"""
+import re
+
+# Canonical place name -> extra spellings users type.
+GAZETTEER = {
+    "Colombo": ["cmb"],
+    "Kandy": ["nuwara", "mahanuwara"],
+    "Galle": [],
+    "Ella": [],
+    "Nuwara Eliya": ["nuwaraeliya", "nuwara-eliya", "little england"],
+    "Sigiriya": ["sigirya", "sigiriya rock"],
+    "Dambulla": [],
+    "Anuradhapura": ["anuradapura"],
+    "Polonnaruwa": ["polonaruwa", "polonnaruva"],
+    "Trincomalee": ["trinco", "trincomale"],
+    "Jaffna": [],
+    "Negombo": [],
+    "Bentota": [],
+    "Mirissa": [],
+    "Unawatuna": [],
+    "Hikkaduwa": [],
+    "Arugam Bay": ["arugambay", "arugam"],
+    "Yala": ["yala national park"],
+    "Tissamaharama": ["tissa"],
+    "Kataragama": [],
+    "Matara": [],
+    "Hambantota": [],
+    "Tangalle": ["tangalla"],
+    "Weligama": [],
+    "Ahangama": [],
+    "Koggala": [],
+    "Batticaloa": ["batti"],
+    "Pasikudah": ["pasikuda", "passikudah"],
+    "Nilaveli": [],
+    "Kurunegala": [],
+    "Ratnapura": ["rathnapura"],
+    "Badulla": [],
+    "Haputale": [],
+    "Bandarawela": [],
+    "Kitulgala": [],
+    "Habarana": [],
+    "Pinnawala": [],
+    "Kegalle": [],
+    "Matale": [],
+    "Peradeniya": [],
+    "Hatton": [],
+    "Horton Plains": [],
+    "Adam's Peak": ["adams peak", "sri pada", "sripada"],
+    "Udawalawe": ["udawalawa"],
+    "Wilpattu": [],
+    "Minneriya": [],
+    "Puttalam": [],
+    "Kalpitiya": [],
+    "Mannar": [],
+    "Vavuniya": [],
+    "Kilinochchi": [],
+    "Mullaitivu": [],
+    "Ampara": [],
+    "Monaragala": ["moneragala"],
+    "Kalutara": [],
+    "Beruwala": [],
+    "Wadduwa": [],
+    "Mount Lavinia": ["mt lavinia", "mt. lavinia"],
+    "Dehiwala": [],
+    "Moratuwa": [],
+    "Katunayake": ["bia", "colombo airport"],
+}
+
+_ALIASES = {}
+for _canonical, _extra in GAZETTEER.items():
+    for _alias in [_canonical, *_extra]:
+        _ALIASES[_alias.lower().replace("'", "")] = _canonical
+
+# Longest aliases first so "nuwara eliya" wins over "nuwara".
+_PLACE_RE = re.compile(
+    r"\b(" + "|".join(re.escape(a) for a in sorted(_ALIASES, key=len, reverse=True)) + r")\b")
+
+_NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "fourteen": 14
+}
+_DAYS_RE = re.compile(
+    r"\b(\d{1,2}|" + "|".join(_NUMBER_WORDS) + r")\s*-?\s*(day|days|night|nights)\b")
+_WEEK_RE = re.compile(r"\b(a|one|1)\s*-?\s*week\b")
+_WEEKEND_RE = re.compile(r"\bweekend\b")
+_DAY_TRIP_RE = re.compile(r"\bday\s*-?\s*trip\b")
+
+_GREETING_RE = re.compile(
+    r"^(hi|hello|hey|hiya|yo|greetings|ayubowan|vanakkam|good (morning|afternoon|evening|day))"
+    r"( there| again| friend)?$")
+
+# Words that mark the direction between two places.
+_FORWARD = {"to", "till", "until", "towards", "->", "→", "-", "–"}
+
+GREETING_MESSAGE = (
+    "Hello, and welcome! I'm your Sri Lanka travel planner, ready to put together "
+    "a trip for you. Just tell me where you're starting from, where you'd like to go, "
+    "and how many days you have, for example: 'Plan a 3-day trip from Colombo to Ella'."
+)
+
+
+def _normalize(query):
+    text = query.lower().replace("'", "").replace("’", "")
+    return " ".join(text.split())
+
+
+def resolve_place(name):
+    """Canonical gazetteer name for a place, or None if it isn't listed."""
+    if not name:
+        return None
+    return _ALIASES.get(_normalize(name).strip(" .,!?"))
+
+
+def canonical_place(name):
+    """Gazetteer name if known, else the lower-cased, space-normalized name."""
+    return resolve_place(name) or " ".join(name.lower().split())
+
+
+def guess_route(query):
+    """(origin, destination) from a raw query when unambiguous, else None."""
+    return extract_route(_normalize(query))
+
+
+def extract_days(text):
+    """Trip length in days from a normalized query, or None."""
+    match = _DAYS_RE.search(text)
+    if match:
+        value, unit = match.groups()
+        days = int(value) if value.isdigit() else _NUMBER_WORDS[value]
+        # "3 nights" means a 4-day trip.
+        return days + 1 if unit.startswith("night") else days
+    if _WEEK_RE.search(text):
+        return 7
+    if _WEEKEND_RE.search(text):
+        return 2
+    if _DAY_TRIP_RE.search(text):
+        return 1
+    return None
+
+
+def _word_before(text, index):
+    words = text[:index].split()
+    return words[-1] if words else ""
+
+
+def extract_route(text):
+    """
+    (origin, destination) when the query names exactly two known places in
+    an unambiguous direction, otherwise None.
+    """
+    matches = []
+    for match in _PLACE_RE.finditer(text):
+        place = _ALIASES[match.group(1)]
+        if not matches or matches[-1][0] != place:
+            matches.append((place, match.start(), match.end()))
+    if len({m[0] for m in matches}) != 2 or len(matches) != 2:
+        return None
+
+    (first, first_start, first_end), (second, second_start, _) = matches
+    before_first = _word_before(text, first_start)
+    before_second = _word_before(text, second_start)
+    between = set(text[first_end:second_start].split())
+
+    # "to Kandy from Colombo"
+    if before_second == "from" and before_first in ("to", "visit", "visiting"):
+        return second, first
+    # "from Colombo to Kandy", "Colombo -> Kandy", "colombo to kandy"
+    if before_first == "from" or between & _FORWARD or "→" in text[first_end:second_start]:
+        return first, second
+    return None
+
+
+def preclassify(query):
+    """
+    Returns a guardrail-shaped dict for obvious queries, or None:
+      {"decision", "feedback_message", "origin", "destination", "duration_days"}
+    """
+    text = _normalize(query)
+    bare = text.strip(" .,!?:)(")
+
+    if _GREETING_RE.match(bare):
+        return {
+            "decision": "greeting",
+            "feedback_message": GREETING_MESSAGE,
+            "origin": None,
+            "destination": None,
+            "duration_days": None
+        }
+
+    route = extract_route(text)
+    days = extract_days(text)
+    if route and days:
+        origin, destination = route
+        return {
+            "decision": "valid",
+            "feedback_message": (
+                f"That sounds like a fantastic trip! Let me plan your {days}-day journey "
+                f"from {origin} to {destination} and find the best spots along the way..."),
+            "origin": origin,
+            "destination": destination,
+            "duration_days": days
+        }
+
+    return None
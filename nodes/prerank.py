@@ -0,0 +1,158 @@
+# nodes/prerank.py
+"""
+Deterministic local scoring that runs before the LLM judge, so the ranking
+prompt only carries a short list of plausible candidates instead of every
+place Geoapify returned.
+"""
+import os
+import re
+import math
+
+# --- Pre-ranking Settings ---
+# Off by default: on the curated references in benchmarks/fixtures/prerank/
+# the shortlist keeps only ~60% of a one-day trip's picks. Opt in with
+# PRERANK=1 once `python -m benchmarks.bench_prerank --record` shows the
+# LLM's own picks survive it.
+PRERANK_ENABLED = os.getenv("PRERANK", "0") == "1"
+# Shortlist size = PRERANK_FACTOR x the upper end of the LLM's target count,
+# so the judge still has real choices to make. PRERANK_TOP_K pins it instead.
+PRERANK_FACTOR = float(os.getenv("PRERANK_FACTOR", "1.5"))
+PRERANK_TOP_K = int(os.getenv("PRERANK_TOP_K", "0"))
+# Places this far off the route score about 1/e of an on-route place.
+PRERANK_DISTANCE_SCALE_KM = float(os.getenv("PRERANK_DISTANCE_SCALE_KM", "5"))
+# At least this share of the shortlist is kept for stopovers (if any exist).
+PRERANK_STOPOVER_SHARE = float(os.getenv("PRERANK_STOPOVER_SHARE", "0.3"))
+
+# Longest matching prefix wins; the best category of a place is its weight.
+CATEGORY_WEIGHTS = {
+    "heritage": 1.2,
+    "tourism.sights": 1.0,
+    "tourism.sights.archaeological_site": 1.2,
+    "tourism.sights.ruines": 1.2,
+    "tourism.sights.fort": 1.1,
+    "tourism.sights.place_of_worship": 1.0,
+    "tourism.sights.memorial": 0.6,
+    "tourism.attraction": 0.9,
+    "tourism.attraction.viewpoint": 1.1,
+    "tourism.attraction.artwork": 0.5,
+    "tourism.attraction.fountain": 0.3,
+    "tourism.attraction.clock": 0.3,
+    "tourism.information": 0.1,
+    "tourism": 0.6,
+    "natural": 1.0,
+    "national_park": 1.2,
+    "beach": 1.0,
+    "leisure.park": 0.7,
+    "leisure.park.garden": 0.9,
+    "entertainment.museum": 0.9,
+    "entertainment.zoo": 0.9,
+    "entertainment.culture": 0.7,
+    "religion.place_of_worship": 0.9,
+    "accommodation": 0.15,
+    "catering": 0.1,
+    "commercial": 0.05,
+    "service": 0.05,
+    "public_transport": 0.05,
+    "office": 0.05,
+}
+
+# Generic infrastructure the ranking prompt tells the LLM to ignore anyway.
+NOISE_WORDS = ("guest house", "guesthouse", "bus stand", "bus station", "bank", "atm",
+               "supermarket", "pharmacy", "filling station", "tourist information")
+_NOISE_RE = re.compile(r"\b(" + "|".join(NOISE_WORDS) + r")\b")
+NOISE_PENALTY = 0.2
+
+# Upper end of the ranking prompt's target counts, by trip length.
+TARGET_COUNTS = ((1, 7), (3, 15))
+LONG_TRIP_TARGET = 20
+
+
+def target_count(days):
+    """How many attractions the LLM is asked to pick for a trip this long."""
+    days = days or 1
+    for max_days, count in TARGET_COUNTS:
+        if days <= max_days:
+            return count
+    return LONG_TRIP_TARGET
+
+
+def shortlist_size(days):
+    if PRERANK_TOP_K > 0:
+        return PRERANK_TOP_K
+    return math.ceil(PRERANK_FACTOR * target_count(days))
+
+
+def _categories(place):
+    kinds = (place.get("kinds") or "").split(",")
+    return [c.strip() for c in kinds if c.strip() and c.strip() != "N/A"]
+
+
+def category_weight(categories):
+    best = None
+    for category in categories:
+        prefix = category
+        while prefix:
+            if prefix in CATEGORY_WEIGHTS:
+                weight = CATEGORY_WEIGHTS[prefix]
+                best = weight if best is None else max(best, weight)
+                break
+            prefix = prefix.rpartition(".")[0]
+    return 0.5 if best is None else best
+
+
+def compress_kinds(kinds, max_terms=3):
+    """
+    "tourism, tourism.sights, tourism.sights.place_of_worship.temple" ->
+    "temple": drops categories implied by a more specific one and keeps
+    only the leaf names.
+    """
+    categories = [c.strip() for c in (kinds or "").split(",") if c.strip()]
+    specific = [c for c in categories
+                if not any(o != c and o.startswith(c + ".") for o in categories)]
+    leaves = []
+    for category in specific:
+        leaf = category.rpartition(".")[2].replace("_", " ")
+        if leaf not in leaves:
+            leaves.append(leaf)
+    return ", ".join(leaves[:max_terms]) or "N/A"
+
+
+def score_place(place):
+    """Higher is better. Pure function of the place dict."""
+    score = category_weight(_categories(place))
+
+    distance = place.get("distance_to_route_km")
+    if distance is not None:
+        score *= 0.5 + 0.5 * math.exp(-distance / PRERANK_DISTANCE_SCALE_KM)
+
+    # Popularity proxy: returned by several search points, richly tagged.
+    mentions = place.get("mentions") or 1
+    score *= 1 + 0.15 * min(mentions - 1, 3) + 0.05 * min(len(_categories(place)), 4)
+
+    if _NOISE_RE.search(place.get("name", "").lower()):
+        score *= NOISE_PENALTY
+    return score
+
+
+def _is_stopover(place):
+    return str(place.get("location_context", "")).startswith("Stopover")
+
+
+def prerank(attractions, days):
+    """
+    The top places for the LLM judge, best first, with compressed kinds.
+    Keeps a share of the slots for stopovers so long drives get broken up.
+    """
+    k = shortlist_size(days)
+    scored = sorted(attractions, key=score_place, reverse=True)
+    if len(scored) <= k:
+        chosen = scored
+    else:
+        stopovers = [p for p in scored if _is_stopover(p)]
+        reserved = stopovers[:int(k * PRERANK_STOPOVER_SHARE)]
+        reserved_ids = {id(p) for p in reserved}
+        rest = [p for p in scored if id(p) not in reserved_ids][:k - len(reserved)]
+        chosen_ids = reserved_ids | {id(p) for p in rest}
+        chosen = [p for p in scored if id(p) in chosen_ids]
+
+    return [{**p, "kinds": compress_kinds(p.get("kinds"))} for p in chosen]
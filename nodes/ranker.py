@@ -1,16 +1,14 @@
 # nodes/ranker.py
 import json
-import traceback
 from .graph_state import GraphState
-from .tools import ranking_llm
+from . import tools
+from .prerank import prerank, PRERANK_ENABLED
+from .offline_planner import rank_offline, should_plan_offline, fallback_enabled, llm_step_budget
+from .telemetry import log
 
 
-def rank_attractions_node(state: GraphState):
-    """
-    Node 5: Ranks attractions based on query, duration, AND drive time.
-    """
-    print("--- 5. EXECUTING: rank_attractions_node (LLM Judge) ---")
-
+def _build_prompt(state, use_prerank=PRERANK_ENABLED):
+    """Returns the ranking prompt, or None if there is nothing to rank."""
     original_query = state.get("original_query")
     attractions = state.get("attractions")
 
@@ -21,8 +19,14 @@ def rank_attractions_node(state: GraphState):
     destination_name = state.get("destination_name")
 
     if not original_query or not attractions:
-        print("   > ERROR: Missing query or attractions list. Skipping ranking.")
-        return {}
+        log.error("   > ERROR: Missing query or attractions list. Skipping ranking.")
+        return None
+
+    # Only the locally best candidates go to the LLM (see nodes/prerank.py)
+    if use_prerank:
+        shortlist = prerank(attractions, duration)
+        log.info(f"   > Pre-ranked {len(attractions)} candidates down to {len(shortlist)}.")
+        attractions = shortlist
 
     # Create the list for the LLM
     attraction_list_str = "\n".join(
@@ -30,7 +34,7 @@ def rank_attractions_node(state: GraphState):
     )
 
     # --- UPDATED PROMPT (TUNED FOR VOLUME) ---
-    prompt = f"""
+    return f"""
     You are an elite travel itinerary planner for Sri Lanka.
     Your goal is to curate a FULL, realistic itinerary. Do not leave the user with empty days.
 
@@ -73,22 +77,70 @@ def rank_attractions_node(state: GraphState):
     """
     # --- END PROMPT ---
 
+
+def _handle_response(response, state):
+    duration = state.get("trip_duration_days") or 1
+    ranked_list = [
+        {"name": a.name, "reasoning": a.reasoning}
+        for a in response.top_attractions
+    ]
+
+    log.info(
+        f"   > Successfully ranked {len(ranked_list)} attractions for a {duration}-day trip.")
+
+    return {
+        "ranked_attractions": ranked_list
+    }
+
+
+def _rank_offline(state):
+    ranked_list = rank_offline(state["attractions"], state.get("trip_duration_days"),
+                               state.get("destination_name"))
+    log.info(f"   > Ranked {len(ranked_list)} attractions offline (no LLM).")
+    return {"ranked_attractions": ranked_list, "planned_offline": True}
+
+
+def rank_attractions_node(state: GraphState):
+    """
+    Node 5: Ranks attractions based on query, duration, AND drive time.
+    """
+    log.info("--- 5. EXECUTING: rank_attractions_node (LLM Judge) ---")
+
+    prompt = _build_prompt(state)
+    if prompt is None:
+        return {}
+    if should_plan_offline():
+        return _rank_offline(state)
+
     try:
-        response = ranking_llm.invoke(prompt)
+        with llm_step_budget():
+            return _handle_response(tools.ranking_llm.invoke(prompt), state)
+
+    except Exception as e:
+        log.exception("   > ERROR: LLM ranking failed:")
+        if fallback_enabled():
+            return _rank_offline(state)
+        return {}
 
-        ranked_list = [
-            {"name": a.name, "reasoning": a.reasoning}
-            for a in response.top_attractions
-        ]
 
-        print(
-            f"   > Successfully ranked {len(ranked_list)} attractions for a {duration}-day trip.")
+async def arank_attractions_node(state: GraphState):
+    """
+    Node 5 (async): same as rank_attractions_node, awaiting the LLM.
+    """
+    log.info("--- 5. EXECUTING: rank_attractions_node (LLM Judge, ASYNC) ---")
 
-        return {
-            "ranked_attractions": ranked_list
-        }
+    prompt = _build_prompt(state)
+    if prompt is None:
+        return {}
+    if should_plan_offline():
+        return _rank_offline(state)
+
+    try:
+        with llm_step_budget():
+            return _handle_response(await tools.ranking_llm.ainvoke(prompt), state)
 
     except Exception as e:
-        print(f"   > ERROR: LLM ranking failed:")
-        print(traceback.format_exc())
+        log.exception("   > ERROR: LLM ranking failed:")
+        if fallback_enabled():
+            return _rank_offline(state)
         return {}
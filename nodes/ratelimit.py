@@ -0,0 +1,150 @@
+# nodes/ratelimit.py
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+from .cache import CACHE_DIR
+from .retry import remaining_budget, budget_exceeded
+from .telemetry import log
+
+# --- Provider Limits ---
+# (tokens per second, burst). Override per provider with
+# RATE_LIMIT_<NAME>="<rate>,<burst>", e.g. RATE_LIMIT_GEMINI="0.25,5".
+DEFAULT_LIMITS = {
+    "gemini": (0.25, 5),      # 15 requests/minute
+    "nominatim": (1.0, 1),    # Nominatim usage policy: max 1 request/second
+    "ors": (0.66, 5),         # 40 directions requests/minute
+    "geoapify": (5.0, 10),
+}
+
+# "memory" limits each process on its own; "sqlite" shares one budget
+# between every process (e.g. uvicorn workers) using the same file.
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", os.path.join(CACHE_DIR, "ratelimit.sqlite"))
+
+
+class TokenBucket:
+    """
+    In-process token bucket. Callers reserve a token up front and then
+    wait out their place in line, so waiting is fair and works the same
+    for threads (acquire) and coroutines (aacquire).
+    """
+
+    def __init__(self, name, rate, capacity):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _reserve(self):
+        """Takes one token (possibly going into debt) and returns the wait."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def _release(self):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+    def expected_wait(self):
+        """How long a caller arriving now would wait, without reserving."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (1 - self._tokens) / self.rate)
+
+    def _checked_reserve(self):
+        wait = self._reserve()
+        remaining = remaining_budget()
+        if remaining is not None and wait > remaining:
+            self._release()
+            raise budget_exceeded(
+                f"Rate limit for '{self.name}' needs {wait:.1f}s, more than the time left.",
+                self.name)
+        if wait > 0:
+            log.info(f"   > ⏳ Rate limiter '{self.name}': waiting {wait:.2f}s")
+        return wait
+
+    def acquire(self):
+        wait = self._checked_reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        wait = self._checked_reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """Token bucket whose state lives in SQLite, shared across processes."""
+
+    def __init__(self, name, rate, capacity, db_path=RATE_LIMIT_DB_PATH):
+        super().__init__(name, rate, capacity)
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=10,
+                                   isolation_level=None)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+
+    def _update(self, change):
+        """Atomically refills, applies `change` and returns the new level."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._db.execute(
+                    "SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+                tokens, updated = row if row else (float(self.capacity), now)
+                tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+                tokens = min(self.capacity, tokens + change)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                    (self.name, tokens, now))
+                self._db.execute("COMMIT")
+                return tokens
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _reserve(self):
+        return max(0.0, -self._update(-1) / self.rate)
+
+    def _release(self):
+        self._update(+1)
+
+    def expected_wait(self):
+        return max(0.0, (1 - self._update(0)) / self.rate)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _configured_limit(name):
+    override = os.getenv(f"RATE_LIMIT_{name.upper()}")
+    if override:
+        rate, _, burst = override.partition(",")
+        return float(rate), int(burst or 1)
+    return DEFAULT_LIMITS.get(name, (1.0, 1))
+
+
+def get_limiter(name):
+    """The shared limiter for a provider, created on first use."""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            rate, burst = _configured_limit(name)
+            if RATE_LIMIT_BACKEND == "sqlite":
+                limiter = SQLiteTokenBucket(name, rate, burst)
+            else:
+                limiter = TokenBucket(name, rate, burst)
+            _limiters[name] = limiter
+        return limiter
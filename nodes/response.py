@@ -0,0 +1,33 @@
+# nodes/response.py
+"""What a finished graph state looks like to API clients (and batch output)."""
+import asyncio
+from .route_store import encoded_route
+
+# Heavy data stripped from responses to reduce payload size for the frontend
+HEAVY_KEYS = ["route_handle", "attractions",
+              "stopover_search", "destination_search"]
+
+
+def public_state(state):
+    return {k: v for k, v in state.items() if k not in HEAVY_KEYS}
+
+
+def route_options(request):
+    """
+    Keyword arguments for encoded_route(), or None if no route was asked
+    for. `request` is a TripRequest or a dict with the same fields.
+    """
+    get = request.get if isinstance(request, dict) else lambda k: getattr(request, k, None)
+    if not get("include_route"):
+        return None
+    return {"tolerance_m": get("route_tolerance_m"), "zoom": get("route_zoom")}
+
+
+async def build_response(state, request):
+    """public_state() plus the encoded route when the request asked for it."""
+    response = public_state(state)
+    options = route_options(request)
+    if options is not None:
+        response["route"] = await asyncio.to_thread(
+            encoded_route, state.get("route_handle"), **options)
+    return response
@@ -0,0 +1,272 @@
+# nodes/retry.py
+import os
+import time
+import random
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from .telemetry import record_retry, record_give_up, log
+
+# --- Retry Settings ---
+# Exponential backoff with full jitter: attempt n waits a random time in
+# [0, min(RETRY_MAX_DELAY_S, RETRY_BASE_DELAY_S * 2**n)], or whatever the
+# provider's Retry-After says. Every trip also gets REQUEST_BUDGET_S in
+# total; a retry that would overrun it fails straight away instead.
+RETRY_MAX_RETRIES = int(os.getenv("RETRY_MAX_RETRIES", "3"))
+RETRY_BASE_DELAY_S = float(os.getenv("RETRY_BASE_DELAY_S", "2"))
+RETRY_MAX_DELAY_S = float(os.getenv("RETRY_MAX_DELAY_S", "30"))
+REQUEST_BUDGET_S = float(os.getenv("REQUEST_BUDGET_S", "120"))
+
+# Rate limits (429) and "Model Overloaded" (503).
+RETRYABLE_STATUS = {429, 503}
+
+_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+_stats_lock = threading.Lock()
+_stats = {
+    "retries": 0,
+    "backoff_seconds": 0.0,
+    "gave_up": 0,
+    "budget_exhausted": 0
+}
+
+
+class BudgetExceeded(Exception):
+    """The trip's total time budget ran out before the call could succeed."""
+
+
+class SharedDeadline:
+    """
+    The deadline of a call several trips wait on (nodes/singleflight.py):
+    the latest of the waiters' deadlines, or unbounded if any waiter is.
+    """
+
+    def __init__(self, deadline):
+        self.at = deadline
+        self._lock = threading.Lock()
+
+    def extend(self, deadline):
+        with self._lock:
+            if self.at is not None:
+                self.at = None if deadline is None else max(self.at, deadline)
+
+
+@contextmanager
+def request_budget(seconds=REQUEST_BUDGET_S):
+    """Sets the time budget for everything called inside the block."""
+    with use_deadline(time.monotonic() + seconds):
+        yield
+
+
+@contextmanager
+def use_deadline(deadline):
+    """Runs the block under `deadline` (monotonic time, a SharedDeadline or None)."""
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline():
+    """The current trip's deadline in monotonic time, or None if unbounded."""
+    deadline = _deadline.get()
+    return deadline.at if isinstance(deadline, SharedDeadline) else deadline
+
+
+def remaining_budget():
+    """Seconds left in the current trip's budget, or None if unbounded."""
+    deadline = current_deadline()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def budget_exceeded(message, provider="unknown"):
+    """A BudgetExceeded to raise, counted like the retry wrapper's own."""
+    _record(budget_exhausted=1)
+    record_give_up(provider, "budget")
+    return BudgetExceeded(message)
+
+
+def retry_stats():
+    """Snapshot of the process-wide retry counters."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _record(**deltas):
+    with _stats_lock:
+        for key, value in deltas.items():
+            _stats[key] += value
+
+
+def _error_chain(exc):
+    """The exception plus everything it was raised from."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__ or exc.__context__
+
+
+def status_code(exc):
+    """
+    HTTP status carried by an exception (or one it wraps), if any.
+    Covers google-genai / google-api-core errors (.code), httpx and
+    requests errors (.response.status_code) and plain .status_code.
+    """
+    for e in _error_chain(exc):
+        for value in (getattr(e, "status_code", None), getattr(e, "code", None),
+                      getattr(getattr(e, "response", None), "status_code", None)):
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def _parse_retry_after(value):
+    value = str(value).strip()
+    if value.endswith("s"):  # google RetryInfo style, e.g. "21s" or "1.5s"
+        value = value[:-1]
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:  # HTTP-date form
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _find_retry_delay(details):
+    if isinstance(details, dict):
+        if "retryDelay" in details:
+            return details["retryDelay"]
+        details = list(details.values())
+    if isinstance(details, list):
+        for item in details:
+            found = _find_retry_delay(item)
+            if found is not None:
+                return found
+    return None
+
+
+def retry_after(exc):
+    """Seconds the provider asked us to wait (Retry-After / RetryInfo), if any."""
+    for e in _error_chain(exc):
+        headers = getattr(getattr(e, "response", None), "headers", None)
+        if headers is not None:
+            value = headers.get("Retry-After")
+            if value is not None:
+                return _parse_retry_after(value)
+        delay = _find_retry_delay(getattr(e, "details", None))
+        if delay is not None:
+            return _parse_retry_after(delay)
+    return None
+
+
+def backoff_delay(attempt, hinted=None):
+    """Delay before retry number `attempt` (0-based)."""
+    if hinted is not None:
+        # Honor the provider, plus a little jitter so waiters don't stampede.
+        return hinted + random.uniform(0, RETRY_BASE_DELAY_S)
+    return random.uniform(0, min(RETRY_MAX_DELAY_S, RETRY_BASE_DELAY_S * (2 ** attempt)))
+
+
+def _check_budget(provider):
+    remaining = remaining_budget()
+    if remaining is not None and remaining <= 0:
+        raise budget_exceeded("Request time budget exhausted.", provider)
+    return remaining
+
+
+# --- The Retry Wrapper (Crash Prevention) ---
+
+
+class RetryRunnable:
+    def __init__(self, runnable, max_retries=RETRY_MAX_RETRIES, limiter=None):
+        self.runnable = runnable
+        self.max_retries = max_retries
+        # Optional rate limiter (nodes.ratelimit) paid before every attempt.
+        self.limiter = limiter
+        self.provider = limiter.name if limiter else "unknown"
+
+    def _next_delay(self, e, retries):
+        """Returns how long to wait before retrying `e`, or raises it."""
+        if status_code(e) not in RETRYABLE_STATUS:
+            raise e
+        if retries >= self.max_retries:
+            log.error(f"   > ❌ Max retries ({self.max_retries}) exceeded.")
+            _record(gave_up=1)
+            record_give_up(self.provider, "max_retries")
+            raise e
+
+        wait_time = backoff_delay(retries, retry_after(e))
+        remaining = remaining_budget()
+        if remaining is not None and wait_time >= remaining:
+            log.error(f"   > ❌ Retry needs {wait_time:.1f}s but only {max(remaining, 0):.1f}s of budget left.")
+            raise budget_exceeded("Request time budget exhausted while rate limited.",
+                                  self.provider) from e
+
+        log.warning(f"   > ⚠️ Rate Limit hit ({status_code(e)}). Waiting {wait_time:.1f}s...")
+        _record(retries=1, backoff_seconds=wait_time)
+        record_retry(self.provider, wait_time)
+        return wait_time
+
+    def invoke(self, *args, **kwargs):
+        retries = 0
+        while True:
+            _check_budget(self.provider)
+            if self.limiter:
+                self.limiter.acquire()
+            try:
+                return self.runnable.invoke(*args, **kwargs)
+            except Exception as e:
+                time.sleep(self._next_delay(e, retries))
+                retries += 1
+
+    async def ainvoke(self, *args, **kwargs):
+        """Same as invoke(), but never blocks the event loop."""
+        retries = 0
+        while True:
+            # Like invoke(): no limiter token for a request already out of
+            # time. The wait for one counts too, so the call gets what is left.
+            remaining = _check_budget(self.provider)
+            if self.limiter:
+                await self.limiter.aacquire()
+                remaining = _check_budget(self.provider)
+            try:
+                return await asyncio.wait_for(
+                    self.runnable.ainvoke(*args, **kwargs), timeout=remaining)
+            except asyncio.TimeoutError as e:
+                if remaining is None:
+                    raise
+                raise budget_exceeded("Request time budget exhausted during the call.",
+                                      self.provider) from e
+            except Exception as e:
+                await asyncio.sleep(self._next_delay(e, retries))
+                retries += 1
+
+    async def astream(self, *args, **kwargs):
+        """
+        Streams chunks from the runnable. Failures before the first chunk
+        are retried like ainvoke(); once output has started they propagate.
+        """
+        retries = 0
+        while True:
+            _check_budget(self.provider)
+            if self.limiter:
+                await self.limiter.aacquire()
+            started = False
+            try:
+                async for chunk in self.runnable.astream(*args, **kwargs):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started:
+                    raise
+                await asyncio.sleep(self._next_delay(e, retries))
+                retries += 1
@@ -0,0 +1,139 @@
+# nodes/route_store.py
+"""
+Process-local store for route geometry. The route is held once, as an
+(N, 2) float32 array of [lon, lat], and the graph state only carries the
+handle returned by put_route(). Nodes that need the line ask for it (or
+for samples of it) by handle instead of copying lists of lists around.
+"""
+import os
+import time
+import uuid
+import threading
+import numpy as np
+from . import polyline
+from .geo import simplify_route, tolerance_for_zoom
+from .telemetry import log, register_collector
+
+# --- Route Store Settings ---
+# A handle lives until release_route(), however many trips are in flight:
+# there is no size cap that could evict a route a running trip still
+# needs. Entries outlive a request only by accident (a crashed stream, a
+# discarded speculation); those are swept once they are this old.
+ROUTE_STORE_TTL_S = float(os.getenv("ROUTE_STORE_TTL_S", "600"))
+
+# Responses that ask for the route without a tolerance or zoom get this
+# (metres); ~10 m is invisible on a city-level map.
+ROUTE_DEFAULT_TOLERANCE_M = float(os.getenv("ROUTE_DEFAULT_TOLERANCE_M", "10"))
+MAX_ZOOM = 22
+
+_routes = {}  # handle -> [stored_at, path, references]
+_lock = threading.Lock()
+_next_sweep = 0.0
+
+
+def _sweep(now):
+    """Drops leaked entries (called with the lock held)."""
+    global _next_sweep
+    if now < _next_sweep:
+        return
+    _next_sweep = now + ROUTE_STORE_TTL_S / 10
+    leaked = [handle for handle, (stored_at, _, _) in _routes.items()
+              if now - stored_at > ROUTE_STORE_TTL_S]
+    for handle in leaked:
+        del _routes[handle]
+    if leaked:
+        log.warning(f"   > WARNING: Swept {len(leaked)} route(s) never released.")
+
+
+def put_route(path_coords):
+    """Stores [[lon, lat], ...] (or an array of them) and returns its handle."""
+    path = np.ascontiguousarray(path_coords, dtype=np.float32).reshape(-1, 2)
+    path.flags.writeable = False  # shared by every reader of the handle
+    handle = f"route-{uuid.uuid4().hex[:16]}"
+    now = time.monotonic()
+    with _lock:
+        _sweep(now)
+        _routes[handle] = [now, path, 1]
+    return handle
+
+
+def get_route(handle):
+    """The (N, 2) float32 [lon, lat] array, or None if unknown or released."""
+    if not handle:
+        return None
+    with _lock:
+        entry = _routes.get(handle)
+    return None if entry is None else entry[1]
+
+
+def retain_route(handle):
+    """
+    Another reference to a stored route, for a second request sharing it
+    (see nodes/trip_flight.py); each reference is released on its own.
+    Returns the handle, or None if it is unknown.
+    """
+    if not handle:
+        return None
+    with _lock:
+        entry = _routes.get(handle)
+        if entry is None:
+            return None
+        entry[2] += 1
+        return handle
+
+
+def release_route(handle):
+    """Frees the geometry once the last request holding it is done."""
+    if handle:
+        with _lock:
+            entry = _routes.get(handle)
+            if entry is not None:
+                entry[2] -= 1
+                if entry[2] <= 0:
+                    del _routes[handle]
+
+
+def route_store_size():
+    with _lock:
+        return len(_routes)
+
+
+def route_geojson(handle):
+    """GeoJSON LineString for the stored route, built on demand."""
+    path = get_route(handle)
+    if path is None:
+        return None
+    return {"type": "LineString", "coordinates": path.astype(np.float64).round(5).tolist()}
+
+
+def encoded_route(handle, tolerance_m=None, zoom=None):
+    """
+    The stored route simplified (Douglas-Peucker) and encoded as a Google
+    polyline, for clients that draw the map. `zoom` picks a one-pixel
+    tolerance for that Web Mercator zoom level; `tolerance_m` wins if both
+    are given. None if the route is unknown or expired.
+    """
+    path = get_route(handle)
+    if path is None:
+        return None
+    if tolerance_m is None and zoom is not None:
+        zoom = min(max(zoom, 0), MAX_ZOOM)
+        tolerance_m = tolerance_for_zoom(zoom, float(path[:, 1].mean()))
+    if tolerance_m is None:
+        tolerance_m = ROUTE_DEFAULT_TOLERANCE_M
+
+    simplified = path[simplify_route(path, tolerance_m)]
+    return {
+        "polyline": polyline.encode(simplified),
+        "precision": polyline.PRECISION,
+        "points": len(simplified),
+        "original_points": len(path),
+        "tolerance_m": round(tolerance_m, 2)
+    }
+
+
+@register_collector
+def _route_store_metrics():
+    return ["# HELP tour_route_store_entries Route geometries held for trips in flight.",
+            "# TYPE tour_route_store_entries gauge",
+            f"tour_route_store_entries {route_store_size()}"]
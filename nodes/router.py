@@ -1,8 +1,35 @@
 # nodes/router.py
+import os
+import asyncio
 import openrouteservice
-import traceback
 from .graph_state import GraphState
-from .tools import ors_client
+from . import tools
+from .cache import TTLCache, MISS, CACHE_DB_PATH
+from . import polyline
+from .ratelimit import get_limiter
+from .route_store import put_route
+from .singleflight import get_flight
+from .telemetry import external_call, log
+
+ROUTE_PROFILE = "driving-car"
+
+# --- Route Cache ---
+# Keyed on endpoints rounded to ROUTE_CACHE_PRECISION decimals (3 ~= 100 m)
+# plus the profile. For profiles listed in ROUTE_SYMMETRIC_PROFILES, A->B
+# and B->A share one entry and the stored geometry is reversed on the way
+# out. None are by default: one-way streets and turn restrictions make a
+# driving route differ by direction, so only opt in where that is fine.
+ROUTE_CACHE_PRECISION = int(os.getenv("ROUTE_CACHE_PRECISION", "3"))
+ROUTE_CACHE_TTL_S = float(os.getenv("ROUTE_CACHE_TTL_S", str(7 * 24 * 3600)))
+SYMMETRIC_PROFILES = {
+    p.strip() for p in os.getenv("ROUTE_SYMMETRIC_PROFILES", "").split(",") if p.strip()}
+
+route_cache = TTLCache(
+    "route",
+    maxsize=int(os.getenv("ROUTE_CACHE_SIZE", "256")),
+    ttl=ROUTE_CACHE_TTL_S,
+    db_path=(CACHE_DB_PATH or None) if os.getenv("ROUTE_CACHE_PERSIST", "1") == "1" else None
+)
 
 
 def _format_duration(seconds: int) -> str:
@@ -12,63 +39,137 @@ def _format_duration(seconds: int) -> str:
     return f"{hours}h {minutes}m"
 
 
+def _route_cache_key(origin, destination, profile):
+    """
+    Returns (key, reversed). `reversed` is True when the entry is stored
+    in the destination -> origin direction.
+    """
+    a = (round(origin[0], ROUTE_CACHE_PRECISION), round(origin[1], ROUTE_CACHE_PRECISION))
+    b = (round(destination[0], ROUTE_CACHE_PRECISION),
+         round(destination[1], ROUTE_CACHE_PRECISION))
+    is_reversed = profile in SYMMETRIC_PROFILES and b < a
+    if is_reversed:
+        a, b = b, a
+    return f"{profile}:{a[0]},{a[1]}:{b[0]},{b[1]}", is_reversed
+
+
+def fetch_route(origin, destination, profile=ROUTE_PROFILE):
+    """
+    Returns (distance_meters, duration_seconds, path_coords) for a pair of
+    (lat, lon) points, using the route cache before calling ORS.
+    """
+    key, is_reversed = _route_cache_key(origin, destination, profile)
+    cached = route_cache.get(key)
+    if cached is not MISS:
+        log.info("   > Route cache hit, skipping OpenRouteService.")
+        distance, duration = cached["distance"], cached["duration"]
+        stored_coords = polyline.decode_array(cached["polyline"])
+    else:
+        # Concurrent trips over the same road (either way round, for
+        # symmetric profiles) share one ORS call.
+        distance, duration, stored_coords = get_flight("route").do(
+            key, lambda: _fetch_route_live(origin, destination, profile, key, is_reversed))
+
+    # Stored coords run in the cache key's direction.
+    path_coords = stored_coords[::-1] if is_reversed else stored_coords
+    return distance, duration, path_coords
+
+
+def _fetch_route_live(origin, destination, profile, key, is_reversed):
+    """Calls ORS and caches the route; the path comes back in cache order."""
+    # Nominatim (lat, lon) -> ORS (lon, lat)
+    coords = [
+        (origin[1], origin[0]),
+        (destination[1], destination[0])
+    ]
+
+    route_request = {
+        'coordinates': coords,
+        'profile': profile,
+        'preference': 'recommended',
+        'format': 'geojson'
+    }
+
+    get_limiter("ors").acquire()
+    log.info("   > Sending request to OpenRouteService...")
+    with external_call("ors"):
+        route_response = tools.ors_client.directions(**route_request)
+
+    feature = route_response['features'][0]
+    summary = feature['properties']['summary']
+
+    # Extract the full list of path coordinates [[lon, lat], ...]
+    path_coords = feature['geometry']['coordinates']
+
+    stored_coords = path_coords[::-1] if is_reversed else path_coords
+    route_cache.set(key, {
+        "distance": summary['distance'],
+        "duration": summary['duration'],
+        "polyline": polyline.encode(stored_coords)
+    })
+
+    return summary['distance'], summary['duration'], stored_coords
+
+
+def _route_update(distance_meters, duration_seconds, path_coords):
+    """Turns a fetched route into the state update shared by both nodes."""
+    duration_seconds = int(duration_seconds)
+
+    distance_km = round(distance_meters / 1000, 1)
+    duration_str = _format_duration(duration_seconds)
+
+    log.info(f"   > Route found: {distance_km} km, {duration_str}")
+
+    return {
+        "route_distance_km": distance_km,
+        "route_duration_str": duration_str,
+        # The geometry itself lives in the route store, not in the state.
+        "route_handle": put_route(path_coords)
+    }
+
+
 def get_route_node(state: GraphState):
     """
-    Node 3: Fetches the route AND saves the path coordinates.
+    Node 3: Fetches the route and stores its path (see route_store.py).
+    """
+    log.info("--- 3. EXECUTING: get_route_node ---")
+    origin = state.get("origin_coords")
+    destination = state.get("destination_coords")
+
+    if not origin or not destination:
+        log.error("   > ERROR: Missing coordinates. Skipping routing.")
+        return {}
+
+    try:
+        return _route_update(*fetch_route(origin, destination))
+
+    except openrouteservice.exceptions.ApiError as e:
+        log.error(f"   > ERROR: ORS API returned an error: {e}")
+    except Exception as e:
+        log.exception("   > ERROR: A completely unexpected error occurred.")
+
+    return {}
+
+
+async def aget_route_node(state: GraphState):
+    """
+    Node 3 (async): same as get_route_node, with the blocking ORS client
+    run off the event loop.
     """
-    print("--- 3. EXECUTING: get_route_node ---")
+    log.info("--- 3. EXECUTING: get_route_node (ASYNC) ---")
     origin = state.get("origin_coords")
     destination = state.get("destination_coords")
 
     if not origin or not destination:
-        print("   > ERROR: Missing coordinates. Skipping routing.")
+        log.error("   > ERROR: Missing coordinates. Skipping routing.")
         return {}
 
     try:
-        # Nominatim (lat, lon) -> ORS (lon, lat)
-        coords = [
-            (origin[1], origin[0]),
-            (destination[1], destination[0])
-        ]
-
-        route_request = {
-            'coordinates': coords,
-            'profile': 'driving-car',
-            'preference': 'recommended',
-            'format': 'geojson'
-        }
-
-        print("   > Sending request to OpenRouteService...")
-        route_response = ors_client.directions(**route_request)
-
-        feature = route_response['features'][0]
-        summary = feature['properties']['summary']
-        geometry = feature['geometry']
-
-        # --- THIS IS THE CHANGE ---
-        # Extract the full list of path coordinates [[lon, lat], ...]
-        path_coords = geometry['coordinates']
-        # --- END OF CHANGE ---
-
-        distance_meters = summary['distance']
-        duration_seconds = int(summary['duration'])
-
-        distance_km = round(distance_meters / 1000, 1)
-        duration_str = _format_duration(duration_seconds)
-
-        print(f"   > Route found: {distance_km} km, {duration_str}")
-
-        return {
-            "route_distance_km": distance_km,
-            "route_duration_str": duration_str,
-            "route_geojson": geometry,
-            "route_path_coords": path_coords  # <-- Save the path to the state
-        }
+        return _route_update(*await asyncio.to_thread(fetch_route, origin, destination))
 
     except openrouteservice.exceptions.ApiError as e:
-        print(f"   > ERROR: ORS API returned an error: {e}")
+        log.error(f"   > ERROR: ORS API returned an error: {e}")
     except Exception as e:
-        print(f"   > ERROR: A completely unexpected error occurred.")
-        print(traceback.format_exc())
+        log.exception("   > ERROR: A completely unexpected error occurred.")
 
     return {}
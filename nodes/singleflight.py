@@ -0,0 +1,193 @@
+# nodes/singleflight.py
+"""
+Collapses concurrent identical calls into one. The first caller for a key
+runs the call; everyone who asks for the same key while it is in flight
+waits for that result (or exception) instead of calling the provider
+again. Nothing is remembered afterwards: that is the caches' job, this
+only covers the window before the first answer lands in them.
+
+Used for geocodes, routes, attraction tiles, LLM prompts and whole trips
+(nodes/trip_flight.py), so a batch of trips (or a burst of identical ones)
+sends each distinct request once. Threads share flights through do(),
+coroutines on one event loop through ado().
+
+An async flight is refcounted: one waiter giving up (cancelled, timed
+out, client gone) doesn't stop the call for the others, but once every
+waiter has left the call itself is cancelled, so nobody's quota is spent
+on an answer no one will read.
+
+A shared call runs under the latest deadline of the trips waiting on it
+(nodes/retry.py), not just its first caller's, so one nearly expired
+trip can't fail it for the others. Each waiter still gives up when its
+own budget runs out.
+"""
+import asyncio
+import threading
+from .retry import SharedDeadline, use_deadline, current_deadline, remaining_budget, \
+    budget_exceeded
+from .telemetry import register_collector
+
+
+class _Flight:
+    def __init__(self, deadline):
+        self.done = threading.Event()
+        self.deadline = deadline
+        self.result = None
+        self.error = None
+
+
+class _AsyncFlight:
+    def __init__(self, task, deadline, release):
+        self.task = task
+        self.deadline = deadline
+        self.release = release
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.coalesced = 0
+        self.abandoned = 0
+        self._lock = threading.Lock()
+        self._flights = {}   # key -> _Flight (threads)
+        self._tasks = {}     # key -> _AsyncFlight (coroutines)
+
+    def do(self, key, fn):
+        """Runs fn() unless an identical call is already in flight."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight(SharedDeadline(current_deadline()))
+                self.calls += 1
+            else:
+                flight.deadline.extend(current_deadline())
+                self.coalesced += 1
+
+        if not leader:
+            remaining = remaining_budget()
+            if not flight.done.wait(None if remaining is None else max(remaining, 0)):
+                raise budget_exceeded("Request time budget exhausted waiting for a shared call.",
+                                      self.name)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            with use_deadline(flight.deadline):
+                flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def ado(self, key, coro_fn, share=None, release=None):
+        """
+        Awaits coro_fn() unless an identical call is already in flight.
+
+        For results holding a resource: each waiter gets share(result)
+        instead of the result itself, and release(result) runs once the
+        last waiter has its share.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flight = self._tasks.get(key)
+            if flight is not None and flight.task.get_loop() is not loop:
+                flight = None  # another loop's flight: can't be awaited here
+            if flight is None:
+                deadline = SharedDeadline(current_deadline())
+                flight = _AsyncFlight(loop.create_task(_run_until(deadline, coro_fn)),
+                                      deadline, release)
+                self._tasks[key] = flight
+                flight.task.add_done_callback(lambda t, key=key: self._forget(key, t))
+                self.calls += 1
+            else:
+                flight.deadline.extend(current_deadline())
+                self.coalesced += 1
+            flight.waiters += 1
+        remaining = remaining_budget()
+        try:
+            # Shielded, so one waiter giving up doesn't cancel everyone's call.
+            result = await asyncio.wait_for(asyncio.shield(flight.task),
+                                            None if remaining is None else max(remaining, 0))
+            return share(result) if share else result
+        except asyncio.TimeoutError:
+            if remaining is None or flight.task.done():
+                raise  # the call's own timeout, not this waiter's budget
+            raise budget_exceeded("Request time budget exhausted waiting for a shared call.",
+                                  self.name) from None
+        finally:
+            self._leave(key, flight)
+
+    def _leave(self, key, flight):
+        with self._lock:
+            flight.waiters -= 1
+            last = flight.waiters == 0
+            abandoned = last and not flight.task.done()
+            if abandoned:
+                self.abandoned += 1
+            if last and self._tasks.get(key) is flight:
+                # Callers arriving from now on start afresh rather than
+                # join a call that is being cancelled (or released).
+                del self._tasks[key]
+        if abandoned:
+            flight.task.cancel()
+        elif last and flight.release and not flight.task.cancelled() \
+                and flight.task.exception() is None:
+            flight.release(flight.task.result())
+
+    def _forget(self, key, task):
+        with self._lock:
+            flight = self._tasks.get(key)
+            if flight is not None and flight.task is task:
+                del self._tasks[key]
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced,
+                    "abandoned": self.abandoned}
+
+
+async def _run_until(deadline, coro_fn):
+    with use_deadline(deadline):
+        return await coro_fn()
+
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+def get_flight(name):
+    """The process-wide SingleFlight group for a provider, created on first use."""
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = SingleFlight(name)
+        return _groups[name]
+
+
+def singleflight_stats():
+    """Calls made and calls coalesced, per group."""
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.stats() for group in groups}
+
+
+@register_collector
+def _singleflight_metrics():
+    lines = ["# HELP tour_singleflight_calls_total Calls by whether they ran or joined one in flight.",
+             "# TYPE tour_singleflight_calls_total counter"]
+    groups = singleflight_stats()
+    for name, stats in groups.items():
+        lines.append(f'tour_singleflight_calls_total{{group="{name}",result="leader"}} {stats["calls"]}')
+        lines.append(f'tour_singleflight_calls_total{{group="{name}",result="coalesced"}} {stats["coalesced"]}')
+    lines += ["# HELP tour_singleflight_abandoned_total Calls cancelled because every waiter left.",
+              "# TYPE tour_singleflight_abandoned_total counter"]
+    for name, stats in groups.items():
+        lines.append(f'tour_singleflight_abandoned_total{{group="{name}"}} {stats["abandoned"]}')
+    return lines
@@ -0,0 +1,210 @@
+# nodes/speculation.py
+"""
+Speculative pipeline: while the guardrail LLM is still deciding, guess the
+origin and destination locally (nodes/preclassifier.py) and start
+geocoding, routing and the destination attraction search in the
+background. The graph nodes adopt a speculative result only if the real
+extraction agrees; otherwise, or if the verdict isn't "valid", the work is
+cancelled and discarded.
+
+Scoped like request_budget(): everything awaited inside
+
+    with speculate(query):
+        await app_graph.ainvoke(...)
+
+can see the speculation through a contextvar. Only the async nodes use it.
+"""
+import os
+import time
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+from .preclassifier import guess_route, canonical_place
+from .route_store import release_route
+from .telemetry import log
+
+# --- Speculation Settings ---
+SPECULATIVE_ENABLED = os.getenv("SPECULATIVE", "0") == "1"
+
+# External calls each stage makes when it runs (cache hits aside): used to
+# report the quota that discarded speculation cost.
+STAGE_CALLS = {"geocode": 2, "route": 1, "destination": 1}
+
+_current = contextvars.ContextVar("speculation", default=None)
+
+_stats_lock = threading.Lock()
+_stats = {
+    "started": 0,
+    "adopted_stages": 0,
+    "discarded_stages": 0,
+    "latency_saved_s": 0.0,
+    "wasted_calls": 0,
+    "wasted_work_s": 0.0
+}
+
+
+def speculation_stats():
+    """Snapshot of the process-wide speculation counters."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _record(**deltas):
+    with _stats_lock:
+        for key, value in deltas.items():
+            _stats[key] += value
+
+
+class _Stage:
+    def __init__(self, name):
+        self.name = name
+        self.task = None
+        self.started_at = None
+        self.finished_at = None
+        self.settled = False  # adopted or discarded
+
+
+class Speculation:
+    """The background stages for one request."""
+
+    def __init__(self, origin, destination):
+        from .geocoder import ageocode_locations_node
+        from .router import aget_route_node
+        from .attractions import aget_destination_attractions_node
+
+        self.origin = origin
+        self.destination = destination
+        self.stages = {name: _Stage(name) for name in STAGE_CALLS}
+
+        async def geocode():
+            return await ageocode_locations_node(
+                {"origin_name": origin, "destination_name": destination})
+
+        async def route():
+            coords = await self.stages["geocode"].task
+            return await aget_route_node(coords)
+
+        async def destination_places():
+            coords = await self.stages["geocode"].task
+            return await aget_destination_attractions_node(coords)
+
+        for name, coro in (("geocode", geocode), ("route", route),
+                           ("destination", destination_places)):
+            self.stages[name].task = asyncio.create_task(self._timed(self.stages[name], coro))
+
+    async def _timed(self, stage, coro):
+        if stage.name != "geocode":
+            await asyncio.shield(self.stages["geocode"].task)
+        stage.started_at = time.monotonic()
+        try:
+            return await coro()
+        finally:
+            stage.finished_at = time.monotonic()
+
+    def _matches(self, stage, state):
+        for key, guess in (("origin_name", self.origin), ("destination_name", self.destination)):
+            if canonical_place(state.get(key) or "") != canonical_place(guess):
+                return False
+        if stage == "geocode":
+            return True
+        # Downstream stages only count if they started from the same coordinates.
+        geocode = self.stages["geocode"].task
+        if not geocode.done() or geocode.cancelled() or geocode.exception():
+            return False
+        coords = geocode.result()
+        return all(_same_coords(coords.get(k), state.get(k))
+                   for k in ("origin_coords", "destination_coords"))
+
+    async def adopt(self, stage_name, state):
+        """The stage's state update if it agrees with `state`, else None."""
+        stage = self.stages[stage_name]
+        if stage.settled:
+            return None
+        if not self._matches(stage_name, state):
+            log.info(f"   > Speculation: '{stage_name}' disagrees with the extraction, discarding.")
+            self.discard()
+            return None
+
+        requested_at = time.monotonic()
+        try:
+            # Shielded: if the node itself is cancelled, the stage keeps
+            # running until the speculation is discarded.
+            update = await asyncio.shield(stage.task)
+        except asyncio.CancelledError:
+            if not stage.task.cancelled():
+                raise  # we were cancelled, not the stage
+            return None
+        except Exception:
+            stage.settled = True
+            return None
+        waited = time.monotonic() - requested_at
+        saved = max(0.0, (stage.finished_at - stage.started_at) - waited)
+        stage.settled = True
+        _record(adopted_stages=1, latency_saved_s=saved)
+        log.info(f"   > Speculation: adopted '{stage_name}' (saved {saved:.2f}s).")
+        return update
+
+    def discard(self):
+        """Cancels and writes off every stage that wasn't adopted."""
+        now = time.monotonic()
+        for stage in self.stages.values():
+            if stage.settled:
+                continue
+            stage.settled = True
+            stage.task.cancel()
+            _release(stage)
+            _record(discarded_stages=1)
+            if stage.started_at is not None:
+                _record(wasted_calls=STAGE_CALLS[stage.name],
+                        wasted_work_s=(stage.finished_at or now) - stage.started_at)
+
+
+def _release(stage):
+    """Frees the route geometry of a finished stage nobody adopted."""
+    task = stage.task
+    if task.done() and not task.cancelled() and task.exception() is None:
+        release_route((task.result() or {}).get("route_handle"))
+
+
+def _same_coords(a, b):
+    if a is None or b is None:
+        return a is b
+    return tuple(a) == tuple(b)
+
+
+@contextmanager
+def speculate(query, enabled=None):
+    """
+    Starts speculative work for `query` (must be called inside a running
+    event loop) and discards whatever wasn't adopted when the block exits.
+    """
+    enabled = SPECULATIVE_ENABLED if enabled is None else enabled
+    route = guess_route(query) if enabled else None
+    if route is None:
+        yield None
+        return
+
+    log.info(f"   > Speculation: starting {route[0]} -> {route[1]} before the guardrail verdict.")
+    speculation = Speculation(*route)
+    _record(started=1)
+    token = _current.set(speculation)
+    try:
+        yield speculation
+    finally:
+        _current.reset(token)
+        speculation.discard()
+
+
+def adopting(stage_name, afunc):
+    """Wraps an async node so it adopts the matching speculative stage, if any."""
+    async def wrapper(state):
+        speculation = _current.get()
+        if speculation is not None:
+            update = await speculation.adopt(stage_name, state)
+            if update is not None:
+                return update
+        return await afunc(state)
+
+    wrapper.__name__ = afunc.__name__
+    return wrapper
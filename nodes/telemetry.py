@@ -0,0 +1,306 @@
+# nodes/telemetry.py
+"""
+Logs, traces and metrics for the trip planner.
+
+- Logging: everything the nodes used to print() goes through the
+  "tour_agent" logger. LOG_FORMAT=text (default) looks exactly like the
+  old prints; LOG_FORMAT=json writes one JSON object per line with the
+  trip's trace ID and the node that logged it.
+- Tracing: `with trace():` gives everything inside it (threads started
+  with asyncio.to_thread included) one trace ID, like request_budget().
+- Metrics: small in-process counters and histograms, rendered in the
+  Prometheus text format by render_metrics() for GET /metrics. Graph
+  nodes are timed by traced_node(), external calls by external_call(),
+  Gemini calls (and their token usage) by the LLM callback in tools.py.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import inspect
+import logging
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+# --- Logging Settings ---
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+_node = contextvars.ContextVar("node", default=None)
+
+
+# --- Tracing ---
+
+def new_trace_id():
+    return uuid.uuid4().hex[:16]
+
+
+@contextmanager
+def trace(trace_id=None):
+    """Tags logs and metrics of everything inside the block with one trace ID."""
+    trace_id = trace_id or new_trace_id()
+    token = _trace_id.set(trace_id)
+    try:
+        yield trace_id
+    finally:
+        _trace_id.reset(token)
+
+
+def current_trace_id():
+    return _trace_id.get()
+
+
+def current_node():
+    return _node.get() or "none"
+
+
+# --- Logging ---
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is at the time, like print() did."""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            # The text format's "   > " indent means nothing here.
+            "msg": record.getMessage().lstrip(" >"),
+            "trace_id": _trace_id.get(),
+            "node": _node.get(),
+            "logger": record.name
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+log = logging.getLogger("tour_agent")
+if not log.handlers:
+    _handler = _StdoutHandler()
+    _handler.setFormatter(_JsonFormatter() if LOG_FORMAT == "json"
+                          else logging.Formatter("%(message)s"))
+    log.addHandler(_handler)
+    log.setLevel(LOG_LEVEL)
+    log.propagate = False
+
+
+# --- Metrics ---
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _register(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labels, key)} {value}")
+        return lines
+
+
+# Seconds; spans a cache hit (ms) to a slow Gemini call with retries.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _register(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket"
+                                 f"{_label_str(self.labels, key, [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket"
+                             f"{_label_str(self.labels, key, [('le', '+Inf')])} {series[-1]}")
+                lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{_label_str(self.labels, key)} {series[-1]}")
+        return lines
+
+
+_metrics = []
+_collectors = []
+_registry_lock = threading.Lock()
+
+
+def _register(metric):
+    with _registry_lock:
+        _metrics.append(metric)
+
+
+def register_collector(fn):
+    """fn() -> Prometheus text lines, called on every scrape."""
+    with _registry_lock:
+        _collectors.append(fn)
+    return fn
+
+
+def render_metrics():
+    """Every metric and collector, in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics, collectors = list(_metrics), list(_collectors)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    for collector in collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+NODE_SECONDS = Histogram("tour_node_duration_seconds", "Graph node run time.", ["node"])
+NODE_ERRORS = Counter("tour_node_errors_total", "Graph node runs that raised.", ["node"])
+CALL_SECONDS = Histogram("tour_external_call_duration_seconds",
+                         "External API call time (after any rate-limit wait).",
+                         ["provider", "node"])
+CALLS = Counter("tour_external_calls_total", "External API calls by outcome.",
+                ["provider", "node", "outcome"])
+CACHE_LOOKUPS = Counter("tour_cache_lookups_total", "Cache lookups by result.",
+                        ["cache", "node", "result"])
+RETRIES = Counter("tour_retries_total", "Retried external calls.", ["provider", "node"])
+RETRY_BACKOFF_SECONDS = Histogram("tour_retry_backoff_seconds", "Time waited before a retry.",
+                                  ["provider"], buckets=(0.5, 1, 2, 5, 10, 20, 30, 60))
+RETRY_GIVE_UPS = Counter("tour_retry_give_ups_total",
+                         "Calls failed for good: out of retries or out of budget.",
+                         ["provider", "reason"])
+LLM_TOKENS = Counter("tour_llm_tokens_total", "Gemini tokens used.", ["model", "node", "kind"])
+TRIP_SECONDS = Histogram("tour_trip_duration_seconds", "End-to-end trip planning time.",
+                         ["endpoint", "outcome"])
+
+
+# --- Instrumentation ---
+
+def traced_node(name, fn):
+    """
+    Wraps a sync or async node function: sets the current node for logs and
+    metrics, and records its duration and errors. The wrapper keeps fn's
+    signature, so RunnableLambda still passes `config` when fn takes it.
+    """
+    if fn is None:
+        return None
+
+    def finish(started, failed):
+        elapsed = time.perf_counter() - started
+        NODE_SECONDS.observe(elapsed, node=name)
+        if failed:
+            NODE_ERRORS.inc(node=name)
+        log.debug("node finished", extra={"fields": {
+            "event": "node", "duration_s": round(elapsed, 4), "ok": not failed}})
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def awrapper(*args, **kwargs):
+            token, started, failed = _node.set(name), time.perf_counter(), True
+            try:
+                result = await fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                finish(started, failed)
+                _node.reset(token)
+        return awrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token, started, failed = _node.set(name), time.perf_counter(), True
+        try:
+            result = fn(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            finish(started, failed)
+            _node.reset(token)
+    return wrapper
+
+
+@contextmanager
+def external_call(provider):
+    """Times one call to an external service and counts its outcome."""
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        record_call(provider, time.perf_counter() - started, ok)
+
+
+def record_call(provider, elapsed, ok):
+    node = current_node()
+    CALL_SECONDS.observe(elapsed, provider=provider, node=node)
+    CALLS.inc(provider=provider, node=node, outcome="ok" if ok else "error")
+    log.debug("external call", extra={"fields": {
+        "event": "call", "provider": provider, "duration_s": round(elapsed, 4), "ok": ok}})
+
+
+def record_cache_lookup(cache, hit):
+    CACHE_LOOKUPS.inc(cache=cache, node=current_node(), result="hit" if hit else "miss")
+
+
+def record_retry(provider, backoff_s):
+    RETRIES.inc(provider=provider, node=current_node())
+    RETRY_BACKOFF_SECONDS.observe(backoff_s, provider=provider)
+
+
+def record_give_up(provider, reason):
+    """reason: "max_retries" or "budget"."""
+    RETRY_GIVE_UPS.inc(provider=provider, reason=reason)
+
+
+def record_tokens(model, usage):
+    """usage: LangChain usage_metadata ({"input_tokens": ..., "output_tokens": ...})."""
+    node = current_node()
+    for kind in ("input", "output"):
+        count = (usage or {}).get(f"{kind}_tokens")
+        if count:
+            LLM_TOKENS.inc(count, model=model, node=node, kind=kind)
+
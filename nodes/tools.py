@@ -1,11 +1,16 @@
 # nodes/tools.py
 import os
 import time
-import openrouteservice
+import threading
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-from geopy.geocoders import Nominatim
-from .models import ExtractedLocations, RankedAttractionsList, GuardrailOutcome
+from langchain_core.callbacks import BaseCallbackHandler
+from .models import ExtractedLocations, RankedAttractionsList, GuardrailOutcome, \
+    GuardrailExtraction
+from .retry import RetryRunnable
+from .ratelimit import get_limiter
+from .llm_cache import MemoizedRunnable
+from .telemetry import log, record_call, record_tokens
+from .http_pool import get_session, geopy_adapter_factory, request_timeout
 
 # --- Load API Keys ---
 load_dotenv()
@@ -13,65 +18,142 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 ORS_API_KEY = os.getenv("ORS_API_KEY")
 GEOAPIFY_API_KEY = os.getenv("GEOAPIFY_API_KEY")
 
-# --- 1. The Retry Wrapper (Crash Prevention) ---
+# --- Provider Endpoints ---
+# Unset means the public services. Point them elsewhere (e.g. the replay
+# server in benchmarks/replay.py) to run against stand-ins.
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL") or None
+NOMINATIM_DOMAIN = os.getenv("NOMINATIM_DOMAIN", "nominatim.openstreetmap.org")
+NOMINATIM_SCHEME = os.getenv("NOMINATIM_SCHEME", "https")
+ORS_BASE_URL = os.getenv("ORS_BASE_URL", "https://api.openrouteservice.org")
+NOMINATIM_TIMEOUT_S = float(os.getenv("NOMINATIM_TIMEOUT_S", "5"))
+ORS_TIMEOUT_S = float(os.getenv("ORS_TIMEOUT_S", "60"))
 
+# --- 1. The LLM Wrapper ---
+# Retries (backoff, Retry-After, time budget) live in nodes/retry.py;
+# every attempt also takes a token from the shared "gemini" rate limiter.
+# Repeated prompts are answered by the memoization layer (nodes/llm_cache.py)
+# before any of that happens.
 
-class RetryRunnable:
-    def __init__(self, runnable):
-        self.runnable = runnable
 
-    def invoke(self, *args, **kwargs):
-        retries = 0
-        max_retries = 3
-        while True:
-            try:
-                return self.runnable.invoke(*args, **kwargs)
-            except Exception as e:
-                error_str = str(e)
-                # Catch Rate Limits (429) and "Model Overloaded" (503)
-                if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str or "503" in error_str:
-                    retries += 1
-                    if retries > max_retries:
-                        print(f"   > ❌ Max retries ({max_retries}) exceeded.")
-                        raise e
+class LLMTelemetry(BaseCallbackHandler):
+    """Times every Gemini call and counts its tokens (see nodes/telemetry.py)."""
+    # Inline, so the handler sees the calling node's contextvars.
+    run_inline = True
 
-                    wait_time = 20 + (retries * 15)
-                    print(f"   > ⚠️ Rate Limit hit. Waiting {wait_time}s...")
-                    time.sleep(wait_time)
-                else:
-                    raise e
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self._started = {}
 
-# --- 2. The LLM Wrapper ---
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, ok=True)
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                record_tokens(self.model_name, getattr(message, "usage_metadata", None))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, ok=False)
+
+    def _finish(self, run_id, ok):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            record_call("gemini", time.perf_counter() - started, ok)
 
 
 class RateLimitAwareLLM:
-    def __init__(self, model_name, api_key):
+    def __init__(self, model_name, api_key, temperature=0):
+        # The Gemini SDK is slow to import; only pay for it once it's needed.
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        self.model_name = model_name
+        self.temperature = temperature
         self.llm = ChatGoogleGenerativeAI(
             model=model_name,
             google_api_key=api_key,
-            temperature=0,
-            request_timeout=60
+            temperature=temperature,
+            request_timeout=60,
+            base_url=GEMINI_BASE_URL,
+            callbacks=[LLMTelemetry(model_name)]
         )
 
     @property
     def robust_llm(self):
-        return RetryRunnable(self.llm)
+        runnable = RetryRunnable(self.llm, limiter=get_limiter("gemini"))
+        return MemoizedRunnable(runnable, self.model_name, self.temperature)
 
     def with_structured_output(self, schema):
         base_runnable = self.llm.with_structured_output(schema)
-        return RetryRunnable(base_runnable)
+        runnable = RetryRunnable(base_runnable, limiter=get_limiter("gemini"))
+        return MemoizedRunnable(runnable, self.model_name, self.temperature, schema=schema)
+
 
+# --- 2. Provider Registry ---
+# Nothing is built at import time: each client below is constructed on
+# first use (or by warm_up()) and then kept as a plain module attribute.
+# Nodes read them as `tools.<name>` when they run, never with
+# `from .tools import <name>`, which would build them at import again.
+# Tests and benchmarks swap one out by assigning `tools.<name> = ...`.
 
-# --- 3. Initialize Tools ---
 # CORRECT MODEL NAME: gemini-1.5-flash
 # (There is no 2.5 yet!)
-wrapper = RateLimitAwareLLM("gemini-2.5-flash-lite", GOOGLE_API_KEY)
+GEMINI_MODEL = "gemini-2.5-flash-lite"
+
+
+def _geolocator():
+    from geopy.geocoders import Nominatim
+    # Keeps its connections alive in a pool from nodes/http_pool.py.
+    return Nominatim(user_agent="sri_lanka_travel_agent_pro_v1",
+                     domain=NOMINATIM_DOMAIN, scheme=NOMINATIM_SCHEME,
+                     timeout=NOMINATIM_TIMEOUT_S,
+                     adapter_factory=geopy_adapter_factory("nominatim"))
+
+
+def _ors_client():
+    import openrouteservice
+    client = openrouteservice.Client(key=ORS_API_KEY, base_url=ORS_BASE_URL,
+                                     timeout=request_timeout(ORS_TIMEOUT_S))
+    # The client has no session argument; swap in the shared one. This is
+    # private API, hence the pin in requirements.txt. If it ever goes away
+    # the client keeps its own session rather than ignoring ours silently.
+    if hasattr(client, "_session"):
+        client._session = get_session("ors")
+    else:
+        log.warning("   > openrouteservice.Client has no _session; ORS calls bypass the shared pool.")
+    return client
+
+
+_FACTORIES = {
+    "wrapper": lambda: RateLimitAwareLLM(GEMINI_MODEL, GOOGLE_API_KEY),
+    "llm": lambda: _provider("wrapper").robust_llm,
+    "structured_llm": lambda: _provider("wrapper").with_structured_output(ExtractedLocations),
+    "ranking_llm": lambda: _provider("wrapper").with_structured_output(RankedAttractionsList),
+    "guardrail_llm": lambda: _provider("wrapper").with_structured_output(GuardrailOutcome),
+    # Guardrail and extraction in one round trip (GUARDRAIL_MODE=combined).
+    "combined_guardrail_llm":
+        lambda: _provider("wrapper").with_structured_output(GuardrailExtraction),
+    "geolocator": _geolocator,
+    "ors_client": _ors_client
+}
+_registry_lock = threading.RLock()
+
+
+def _provider(name):
+    with _registry_lock:
+        if name not in globals():
+            globals()[name] = _FACTORIES[name]()
+        return globals()[name]
+
+
+def __getattr__(name):
+    # Only called for names not yet in the module, i.e. not built yet.
+    if name in _FACTORIES:
+        return _provider(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-llm = wrapper.robust_llm
-structured_llm = wrapper.with_structured_output(ExtractedLocations)
-ranking_llm = wrapper.with_structured_output(RankedAttractionsList)
-guardrail_llm = wrapper.with_structured_output(GuardrailOutcome)
 
-# --- Other Tools ---
-geolocator = Nominatim(user_agent="sri_lanka_travel_agent_pro_v1")
-ors_client = openrouteservice.Client(key=ORS_API_KEY)
+def warm_up(names=None):
+    """Builds the given providers (default: all) now rather than on first use."""
+    for name in names or _FACTORIES:
+        _provider(name)
@@ -0,0 +1,63 @@
+# nodes/trip_flight.py
+"""
+Single-flight for whole trips. When a popular trip is asked for by many
+clients at once, the identical requests share one graph run (the "trip"
+group in nodes/singleflight.py) instead of each running the pipeline
+and spending its own Gemini and Geoapify quota. The plan cache only
+helps once the first of them has finished; this covers the time before.
+
+The shared run has its own speculation and runs until the latest of its
+callers' deadlines, so the request that started it can go away without
+taking the run down for the others; it is cancelled only when every
+caller has left. Each caller gets its own copy
+of the final state holding a reference to the one shared route handle
+(nodes/route_store.py), to release as usual.
+"""
+import os
+from .route_store import retain_route, release_route
+from .singleflight import get_flight
+from .speculation import speculate
+from .telemetry import log
+
+# --- Trip Single-Flight Settings ---
+TRIP_SINGLEFLIGHT_ENABLED = os.getenv("TRIP_SINGLEFLIGHT", "1") == "1"
+
+
+def trip_key(inputs):
+    """Same query (case and spacing aside) and same bypass_cache: same trip."""
+    query = " ".join(inputs["original_query"].lower().split())
+    return f"{bool(inputs.get('bypass_cache'))}|{query}"
+
+
+async def plan_shared(graph, inputs, speculative=False):
+    """
+    The final state of graph.ainvoke(inputs), run once for all identical
+    trips in flight. `speculative` lets the run start speculative work
+    (nodes/speculation.py, if SPECULATIVE=1) when this call starts it.
+    """
+    if not TRIP_SINGLEFLIGHT_ENABLED:
+        return await _run(graph, inputs, speculative)
+
+    started = []
+
+    def start():
+        started.append(True)
+        return _run(graph, inputs, speculative)
+
+    # The run's own reference to the route is dropped once every caller
+    # has taken theirs.
+    state = await get_flight("trip").ado(
+        trip_key(inputs), start, share=_share,
+        release=lambda state: release_route(state.get("route_handle")))
+    if not started:
+        log.info("   > Trip single-flight: shared an identical trip already in flight.")
+    return state
+
+
+def _share(state):
+    return {**state, "route_handle": retain_route(state.get("route_handle"))}
+
+
+async def _run(graph, inputs, speculative):
+    with speculate(inputs["original_query"], enabled=None if speculative else False):
+        return await graph.ainvoke(inputs)
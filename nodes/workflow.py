@@ -0,0 +1,165 @@
+# nodes/workflow.py
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import StateGraph, START, END
+
+from .graph_state import GraphState
+from .guardrail import input_guardrail_node, ainput_guardrail_node, GUARDRAIL_MODE
+from .extractor import extract_locations_node, aextract_locations_node
+from .geocoder import geocode_locations_node, ageocode_locations_node
+from .router import get_route_node, aget_route_node
+from .attractions import get_destination_attractions_node, aget_destination_attractions_node, \
+    get_stopover_attractions_node, aget_stopover_attractions_node, \
+    merge_attractions_node, amerge_attractions_node
+from .ranker import rank_attractions_node, arank_attractions_node
+from .itinerary_builder import build_itinerary_node, abuild_itinerary_node
+from .speculation import adopting
+from .telemetry import traced_node
+from .plan_cache import check_plan_cache_node, acheck_plan_cache_node, \
+    store_plan_node, astore_plan_node
+
+
+def _node(func, afunc):
+    """
+    A graph node that runs `func` under invoke() and `afunc` under ainvoke(),
+    timed and labelled as func's name in logs and metrics.
+    """
+    name = func.__name__
+    return RunnableLambda(traced_node(name, func), afunc=traced_node(name, afunc), name=name)
+
+
+def _sequence(name, steps):
+    """
+    One graph node running (func, afunc) `steps` back to back, each seeing
+    the previous updates. LangGraph moves all branches in lockstep, so a
+    chain inside a branch must be a single node to not wait on its sibling.
+    """
+    steps = [(traced_node(func.__name__, func), traced_node(func.__name__, afunc))
+             for func, afunc in steps]
+
+    def func(state):
+        update = {}
+        for step, _ in steps:
+            update.update(step({**state, **update}) or {})
+        return update
+
+    async def afunc(state):
+        update = {}
+        for _, astep in steps:
+            update.update(await astep({**state, **update}) or {})
+        return update
+
+    return RunnableLambda(func, afunc=afunc, name=name)
+
+
+def gate_node(state: GraphState):
+    """Join point for the parallel guardrail and extraction branches."""
+    return {}
+
+
+async def agate_node(state: GraphState):
+    return {}
+
+
+# --- Conditional Logic ---
+def decide_next_step(state: GraphState):
+    decision = state.get("guardrail_decision")
+    if decision != "valid":
+        return END
+    # The pre-classifier or combined guardrail may have extracted already.
+    if state.get("origin_name") and state.get("destination_name"):
+        return "check_plan_cache"
+    return "extract_locations"
+
+
+def decide_after_gate(state: GraphState):
+    if state.get("guardrail_decision") != "valid":
+        return END
+    return "check_plan_cache"
+
+
+def decide_after_cache(state: GraphState):
+    if state.get("plan_cache_hit"):
+        return END
+    return "geocode_locations"
+
+
+def build_graph():
+    """
+    Builds and compiles the trip planner graph.
+
+    With GUARDRAIL_MODE=separate the guardrail and extraction LLM calls
+    run in parallel and meet at a gate; in combined mode the guardrail
+    extracts too, and extraction only runs if it came back empty. After
+    geocoding, the destination search runs alongside the route + stopover
+    search, and the two are merged before ranking.
+
+    Only the separate mode gains from the branches (about 0.6 s a trip in
+    benchmarks/bench_branches.py). In the default combined mode there is
+    a single LLM call before geocoding. The destination search already
+    overlapped the stopovers in the old attractions fan-out, and both
+    still wait for geocoding, so the critical path is unchanged.
+    """
+    workflow = StateGraph(GraphState)
+
+    # Add Nodes
+    workflow.add_node("guardrail", _node(input_guardrail_node, ainput_guardrail_node))
+    workflow.add_node("extract_locations", _node(extract_locations_node, aextract_locations_node))
+    workflow.add_node("check_plan_cache", _node(check_plan_cache_node, acheck_plan_cache_node))
+    workflow.add_node("geocode_locations", _node(geocode_locations_node, adopting("geocode", ageocode_locations_node)))
+    workflow.add_node("get_route_and_stopovers", _sequence("get_route_and_stopovers", [
+        (get_route_node, adopting("route", aget_route_node)),
+        (get_stopover_attractions_node, aget_stopover_attractions_node)
+    ]))
+    workflow.add_node("get_destination_attractions",
+                      _node(get_destination_attractions_node,
+                            adopting("destination", aget_destination_attractions_node)))
+    workflow.add_node("merge_attractions", _node(merge_attractions_node, amerge_attractions_node))
+    workflow.add_node("rank_attractions", _node(rank_attractions_node, arank_attractions_node))
+    workflow.add_node("build_itinerary", _node(build_itinerary_node, abuild_itinerary_node))
+    workflow.add_node("store_plan", _node(store_plan_node, astore_plan_node))
+
+    # Define Flow
+    if GUARDRAIL_MODE == "separate":
+        workflow.add_node("gate", _node(gate_node, agate_node))
+        workflow.add_edge(START, "guardrail")
+        workflow.add_edge(START, "extract_locations")
+        workflow.add_edge(["guardrail", "extract_locations"], "gate")
+        workflow.add_conditional_edges(
+            "gate",
+            decide_after_gate,
+            {
+                "check_plan_cache": "check_plan_cache",
+                END: END
+            }
+        )
+    else:
+        workflow.set_entry_point("guardrail")
+        workflow.add_conditional_edges(
+            "guardrail",
+            decide_next_step,
+            {
+                "extract_locations": "extract_locations",
+                "check_plan_cache": "check_plan_cache",
+                END: END
+            }
+        )
+        workflow.add_edge("extract_locations", "check_plan_cache")
+
+    workflow.add_conditional_edges(
+        "check_plan_cache",
+        decide_after_cache,
+        {
+            "geocode_locations": "geocode_locations",
+            END: END
+        }
+    )
+    workflow.add_edge("geocode_locations", "get_route_and_stopovers")
+    workflow.add_edge("geocode_locations", "get_destination_attractions")
+    workflow.add_edge(["get_route_and_stopovers", "get_destination_attractions"],
+                      "merge_attractions")
+    workflow.add_edge("merge_attractions", "rank_attractions")
+    workflow.add_edge("rank_attractions", "build_itinerary")
+    workflow.add_edge("build_itinerary", "store_plan")
+    workflow.add_edge("store_plan", END)
+
+    return workflow.compile()
@@ -1,57 +1,66 @@
 # run_workflow.py
+"""
+Interactive:  python run_workflow.py
+Batch:        python run_workflow.py --batch trips.jsonl [--out results.jsonl]
+                                     [--concurrency 8]
+
+Batch input is one trip per line, either a JSON object shaped like the
+/plan-trip request ({"query": ..., "id": ..., "include_route": ...}) or a
+bare JSON string with just the query. Output is one JSON record per trip,
+written as each one finishes (see nodes/batch.py).
+"""
+import sys
+import json
+import time
 import pprint
-from langgraph.graph import StateGraph, END
-
-from nodes.graph_state import GraphState
-from nodes.guardrail import input_guardrail_node
-from nodes.extractor import extract_locations_node
-from nodes.geocoder import geocode_locations_node
-from nodes.router import get_route_node
-from nodes.attractions import get_attractions_node
-from nodes.ranker import rank_attractions_node
-from nodes.itinerary_builder import build_itinerary_node # <-- 1. Import
-
-# --- Conditional Logic ---
-def decide_next_step(state: GraphState):
-    decision = state.get("guardrail_decision")
-    if decision == "valid":
-        return "extract_locations"
-    else:
-        return END
-
-# --- Build Graph ---
-workflow = StateGraph(GraphState)
-
-workflow.add_node("guardrail", input_guardrail_node)
-workflow.add_node("extract_locations", extract_locations_node)
-workflow.add_node("geocode_locations", geocode_locations_node)
-workflow.add_node("get_route", get_route_node)
-workflow.add_node("get_attractions", get_attractions_node)
-workflow.add_node("rank_attractions", rank_attractions_node)
-workflow.add_node("build_itinerary", build_itinerary_node) # <-- 2. Add Node
-
-workflow.set_entry_point("guardrail")
-
-workflow.add_conditional_edges(
-    "guardrail",
-    decide_next_step,
-    {
-        "extract_locations": "extract_locations",
-        END: END
-    }
-)
-
-workflow.add_edge("extract_locations", "geocode_locations")
-workflow.add_edge("geocode_locations", "get_route")
-workflow.add_edge("get_route", "get_attractions")
-workflow.add_edge("get_attractions", "rank_attractions")
-workflow.add_edge("rank_attractions", "build_itinerary") # <-- 3. Connect to Itinerary
-workflow.add_edge("build_itinerary", END)                # <-- 4. End here
-
-app_graph = workflow.compile()
+import asyncio
+import argparse
+import contextlib
 
-# --- Run ---
-if __name__ == "__main__":
+from nodes.workflow import build_graph
+from nodes.batch import run_batch, batch_summary
+from nodes.singleflight import singleflight_stats
+from nodes.route_store import release_route
+
+
+def read_trips(lines):
+    """Batch input lines -> trip dicts. Unparseable lines become items without a query."""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            trip = json.loads(line)
+        except json.JSONDecodeError:
+            print(f"   > WARNING: line {number} is not JSON", file=sys.stderr)
+            trip = {}
+        if isinstance(trip, str):
+            trip = {"query": trip}
+        yield trip if isinstance(trip, dict) else {}
+
+
+async def run_batch_file(in_path, out_path, concurrency, stdout=sys.stdout):
+    started_at, flights_before = time.monotonic(), singleflight_stats()
+    ok = failed = 0
+    source = sys.stdin if in_path == "-" else open(in_path, encoding="utf-8")
+    sink = stdout if out_path == "-" else open(out_path, "w", encoding="utf-8")
+    try:
+        async for record in run_batch(build_graph(), read_trips(source), concurrency):
+            if record["status"] == "ok":
+                ok += 1
+            else:
+                failed += 1
+            sink.write(json.dumps(record, default=str, ensure_ascii=False) + "\n")
+            sink.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not stdout:
+            sink.close()
+    return batch_summary(ok, failed, started_at, flights_before)
+
+
+def run_interactive():
     print("--- Starting Trip Planner Workflow ---")
 
     test_query = input("Enter your travel query: ")
@@ -60,22 +69,41 @@ if __name__ == "__main__":
 
     inputs = {"original_query": test_query}
 
-    final_state = app_graph.invoke(inputs)
+    final_state = build_graph().invoke(inputs)
 
     print("\n--- FINAL STATE (Cleaned) ---")
-    
-    # Clean up for display
-    final_state.pop("route_geojson", None)
-    final_state.pop("route_path_coords", None)
+
+    # Clean up for display; the route itself is not printed.
+    release_route(final_state.pop("route_handle", None))
     final_state.pop("attractions", None)
-    
+
     # Extract and print the itinerary separately for readability
     itinerary = final_state.pop("final_itinerary", "No itinerary generated.")
-    
+
     # Print the data structure
     pprint.pprint(final_state)
-    
+
     print("\n" + "="*50)
     print("📝 GENERATED ITINERARY:")
     print("="*50)
-    print(itinerary)
\ No newline at end of file
+    print(itinerary)
+
+
+# --- Run ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", metavar="JSONL", help="plan every trip in this file ('-' for stdin)")
+    parser.add_argument("--out", default="-", help="where batch results go (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="trips planned at once (default: BATCH_CONCURRENCY)")
+    args = parser.parse_args()
+
+    if args.batch:
+        # Node progress output goes to stderr so stdout stays valid JSONL.
+        stdout = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            summary = asyncio.run(run_batch_file(args.batch, args.out, args.concurrency, stdout))
+        print(json.dumps(summary), file=sys.stderr)
+    else:
+        run_interactive()